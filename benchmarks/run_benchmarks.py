@@ -0,0 +1,467 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Measure the throughput of the environment using synthetic B3 files: the rows
+parsed by second, the book updates by second, the latency of Env.step, the
+iteration over the NeutrinoSide, the cost of the candles and indicators and
+the episodes by minute of each example agent. The results are saved as a JSON
+file that can be compared to the one created by other commit
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import traceback
+import zipfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..'))
+
+import neutrinogym.neutrino as neutrino
+from neutrinogym import make
+from neutrinogym.qcore import AgentWrapper
+from neutrinogym.lob import parser_data
+from neutrinogym.lob.perf import CLOCK
+from benchmarks import synthetic_data
+
+
+'''
+Begin help functions
+'''
+
+# day and instruments replayed by default
+BENCH_DATE = '20210222'
+BENCH_INSTRUMENTS = ['DOLH21']
+# agents from the examples folder used to measure whole episodes. The same
+# ones available in examples/simulation.py
+DEMO_AGENTS = ['DemoDummy', 'DemoBook', 'DemoTrades', 'DemoCandles',
+               'DemoOrders']
+# percentiles of the latency of Env.step
+PERCENTILES = (50, 90, 99)
+
+
+def get_git_sha():
+    '''
+    Return the hash of the current commit, or an empty string
+    '''
+    try:
+        s_sha = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.STDOUT)
+        return s_sha.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def get_machine_info():
+    '''
+    Return a dictionary describing where the benchmarks were run
+    '''
+    return {'sha': get_git_sha(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpus': multiprocessing.cpu_count()}
+
+
+def make_demo_agent(s_agent, l_instruments):
+    '''
+    Return an agent from the examples folder, ready to be used by resetAgent
+
+    :param s_agent: string. name of the class in the examples folder
+    :param l_instruments: list. instruments traded by the agent
+    '''
+    # the examples import the API as neutrino when not in python 3.6
+    sys.modules.setdefault('neutrino', neutrino)
+    examples = importlib.import_module('examples')
+    agent = getattr(examples, s_agent)()
+    agent.i_id = 11
+    agent._instr_from_conf = l_instruments
+    agent._disable_bid = True
+    agent._disable_ask = True
+    agent._done = False
+    agent._last_setoffline = 0
+    agent._msg_offline = ''
+    agent.brain = None
+    return AgentWrapper(agent)
+
+
+def _time_rows(func, l_files):
+    '''
+    Return the number of rows parsed and the seconds spent by func
+
+    :param func: callable. Return the number of rows parsed from a file
+    :param l_files: list. paths to the zipped files
+    '''
+    i_rows = 0
+    f_start = CLOCK()
+    for s_file in l_files:
+        i_rows += func(s_file)
+    return i_rows, CLOCK() - f_start
+
+
+def _parse_by_line(s_file):
+    '''
+    Parse all rows of the file using the LineParser. Return the number of rows
+
+    :param s_file: string. path to the zipped file
+    '''
+    s_type = os.path.basename(s_file).split('_')[1]
+    obj_parser = parser_data.LineParser(s_type)
+    i_rows = 0
+    with zipfile.ZipFile(s_file, 'r') as archive:
+        fr = archive.open(archive.infolist()[0])
+        for row in fr:
+            obj_parser(row)
+            i_rows += 1
+        fr.close()
+    return i_rows
+
+
+def _parse_by_chunk(s_file):
+    '''
+    Parse all rows of the file using the BookChunkParser. Return the number
+    of rows
+
+    :param s_file: string. path to the zipped file
+    '''
+    s_type = os.path.basename(s_file).split('_')[1]
+    return len(parser_data.BookChunkParser(s_type).parse_file(s_file))
+
+
+def _get_latency_stats(l_times):
+    '''
+    Return the percentiles of the latencies passed, in microseconds
+
+    :param l_times: list. latencies in seconds
+    '''
+    if not l_times:
+        return {}
+    na_us = np.array(l_times) * 1e6
+    d_rtn = dict(('p{}'.format(i_perc), float(np.percentile(na_us, i_perc)))
+                 for i_perc in PERCENTILES)
+    d_rtn['mean'] = float(na_us.mean())
+    d_rtn['max'] = float(na_us.max())
+    return d_rtn
+
+
+def _iterate_side(neutrino_side, b_cold):
+    '''
+    Iterate over all orders of the NeutrinoSide passed. Return the number of
+    orders and the seconds spent
+
+    :param neutrino_side: NeutrinoSide object.
+    :param b_cold: boolean. Drop the list of orders cached by the side
+    '''
+    if b_cold:
+        neutrino_side._i_seq = None
+    f_start = CLOCK()
+    i_orders = 0
+    for _ in neutrino_side:
+        i_orders += 1
+    return i_orders, CLOCK() - f_start
+
+'''
+End help functions
+'''
+
+
+def bench_parsers(l_files):
+    '''
+    Return the rows parsed by second by the LineParser and the
+    BookChunkParser
+
+    :param l_files: list. paths to the zipped files
+    '''
+    d_rtn = {}
+    for s_name, func in [('line', _parse_by_line), ('chunk', _parse_by_chunk)]:
+        i_rows, f_time = _time_rows(func, l_files)
+        d_rtn[s_name] = {'rows': i_rows,
+                         'seconds': f_time,
+                         'rows_per_s': i_rows / f_time if f_time else 0.}
+    return d_rtn
+
+
+def bench_neutrino_side(env, l_instruments, i_repeat=20):
+    '''
+    Return the microseconds to iterate over all orders of each NeutrinoSide,
+    rebuilding the list of orders (cold) or using the one cached (warm)
+
+    :param env: Env object. The environment with the books to iterate
+    :param l_instruments: list. instruments to use
+    :param i_repeat*: integer. Number of iterations of each side
+    '''
+    d_rtn = {}
+    for s_instr in l_instruments:
+        book_obj = env.get_order_book(s_instr)
+        for s_side in ['bid', 'ask']:
+            neutrino_side = getattr(book_obj, 'neutrino_' + s_side)
+            d_aux = {}
+            for s_mode in ['cold', 'warm']:
+                f_time = 0.
+                for _ in range(i_repeat):
+                    i_orders, f_aux = _iterate_side(neutrino_side,
+                                                    s_mode == 'cold')
+                    f_time += f_aux
+                f_iter = f_time / i_repeat
+                d_aux[s_mode] = {
+                    'us_per_iteration': f_iter * 1e6,
+                    'orders_per_s': i_orders / f_iter if f_iter else 0.}
+            d_aux['orders'] = i_orders
+            d_rtn['{}:{}'.format(s_instr, s_side.upper())] = d_aux
+    return d_rtn
+
+
+def _bench_episode_job(s_agent, d_env_params):
+    '''
+    Call bench_episode in a worker process. Return the traceback as the error
+    of the results if the episode fails
+
+    :param s_agent: string. name of the class in the examples folder
+    :param d_env_params: dictionary. Parameters of Env.setParameters
+    '''
+    try:
+        return bench_episode(s_agent, d_env_params)
+    except Exception:
+        return {'error': traceback.format_exc()}
+
+
+def bench_episode(s_agent, d_env_params):
+    '''
+    Run a whole episode with the example agent passed, timing each step.
+    Return a dictionary with the stats of the episode
+
+    :param s_agent: string. name of the class in the examples folder
+    :param d_env_params: dictionary. Parameters of Env.setParameters
+    '''
+    env = make('LevelTwo')
+    env.setParameters(**d_env_params)
+    agent = make_demo_agent(s_agent, d_env_params['instruments'])
+    f_start = CLOCK()
+    observation = env.reset()
+    env.resetAgent(agent, hold_pos=False)
+    l_step = []
+    l_callback = []
+    b_done = False
+    while not b_done:
+        f_aux = CLOCK()
+        actions = env.callBack(agent, observation)
+        f_aux2 = CLOCK()
+        try:
+            observation, _, b_done, _ = env.step(actions)
+        except StopIteration:
+            b_done = True
+        f_aux3 = CLOCK()
+        l_callback.append(f_aux2 - f_aux)
+        l_step.append(f_aux3 - f_aux2)
+    f_wall = CLOCK() - f_start
+    d_perf = env.get_perf_stats()
+    d_stages = d_perf['stages']
+    d_book = d_stages.get('book_update', {})
+    d_ta = d_stages.get('indicators', {})
+    d_rtn = {'steps': len(l_step),
+             'seconds': f_wall,
+             'episodes_per_min': 60. / f_wall if f_wall else 0.,
+             'steps_per_s': len(l_step) / f_wall if f_wall else 0.,
+             'step_latency_us': _get_latency_stats(l_step),
+             'callback_latency_us': _get_latency_stats(l_callback),
+             'rows_per_s': d_perf['rows_per_s'],
+             'book_updates': d_book.get('count', 0),
+             'us_per_book_update': d_book.get('us_per_event', 0.),
+             'indicator_updates': d_ta.get('count', 0),
+             'us_per_indicator_update': d_ta.get('us_per_event', 0.),
+             'stages': dict((s_stage, {'count': d_aux['count'],
+                                       'us_per_event': d_aux['us_per_event'],
+                                       'total_s': d_aux['total_s']})
+                            for s_stage, d_aux in d_stages.items()),
+             'neutrino_side': bench_neutrino_side(
+                 env, d_env_params['instruments'])}
+    env.close()
+    return d_rtn
+
+
+def run_benchmarks(s_folder=None, i_seed=0, l_agents=None, d_flow=None,
+                   s_starttime='09:30:00', s_endtime='10:00:00',
+                   d_env_params=None):
+    '''
+    Create the synthetic files and run all the benchmarks. Each episode runs
+    in a new process, so the agents do not share the state of the API.
+    Return a dictionary with the results
+
+    :param s_folder*: string. root of the data folder. Use a temporary folder
+        if None, that is removed at the end
+    :param i_seed*: integer. seed of the synthetic data and of the Env
+    :param l_agents*: list. names of the example agents. Use all if None
+    :param d_flow*: dictionary. parameters of the synthetic order flow
+    :param s_starttime*: string. time to start each episode (HH:mm:ss). The
+        agent orders are just crossed after the opening auction (09:20)
+    :param s_endtime*: string. time to close each episode (HH:mm:ss)
+    :param d_env_params*: dictionary. other parameters of Env.setParameters
+    '''
+    l_agents = l_agents or DEMO_AGENTS
+    b_remove = s_folder is None
+    if b_remove:
+        s_folder = tempfile.mkdtemp(prefix='neutrino_bench_')
+    try:
+        # create the data and the folder used by the logger
+        l_files = synthetic_data.make_synthetic_day(
+            s_folder, BENCH_DATE, BENCH_INSTRUMENTS, i_seed, d_flow)
+        s_log = os.path.join(s_folder, 'log')
+        if not os.path.isdir(s_log):
+            os.makedirs(s_log)
+        d_params = {'init': BENCH_DATE,
+                    'end': BENCH_DATE,
+                    'datafolder': s_folder,
+                    'instruments': BENCH_INSTRUMENTS,
+                    'starttime': s_starttime,
+                    'endtime': s_endtime,
+                    'logfolder': s_folder,
+                    'b_randstart': False,
+                    'i_seed': i_seed,
+                    'b_perf_stats': True}
+        d_params.update(d_env_params or {})
+        d_rtn = {'machine': get_machine_info(),
+                 'config': {'seed': i_seed,
+                            'date': BENCH_DATE,
+                            'instruments': BENCH_INSTRUMENTS,
+                            'flow': synthetic_data.get_conf(d_flow),
+                            'env_params': dict(
+                                (k, v) for k, v in d_params.items()
+                                if k not in ['datafolder', 'logfolder'])},
+                 'parsers': bench_parsers(l_files),
+                 'episodes': {}}
+        for s_agent in l_agents:
+            pool = multiprocessing.Pool(1)
+            try:
+                d_rtn['episodes'][s_agent] = pool.apply(
+                    _bench_episode_job, (s_agent, d_params))
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        if b_remove:
+            shutil.rmtree(s_folder, ignore_errors=True)
+    return d_rtn
+
+
+def get_metrics(d_results):
+    '''
+    Return a flat dictionary with the main metrics of the results passed, in
+    which higher is better for the ones ending in _per_s or _per_min and
+    lower is better for the others
+
+    :param d_results: dictionary. output of run_benchmarks
+    '''
+    d_rtn = {}
+    for s_name, d_aux in d_results['parsers'].items():
+        d_rtn['parse_{}.rows_per_s'.format(s_name)] = d_aux['rows_per_s']
+    for s_agent, d_aux in d_results['episodes'].items():
+        if 'error' in d_aux:
+            continue
+        for s_key in ['episodes_per_min', 'steps_per_s', 'rows_per_s',
+                      'us_per_book_update', 'us_per_indicator_update']:
+            d_rtn['{}.{}'.format(s_agent, s_key)] = d_aux[s_key]
+        for s_key, f_val in d_aux['step_latency_us'].items():
+            d_rtn['{}.step_{}_us'.format(s_agent, s_key)] = f_val
+        for s_side, d_side in d_aux['neutrino_side'].items():
+            for s_mode in ['cold', 'warm']:
+                s_key = '{}.neutrino_side.{}.{}_us'.format(s_agent, s_side,
+                                                           s_mode)
+                d_rtn[s_key] = d_side[s_mode]['us_per_iteration']
+    return d_rtn
+
+
+def compare_results(d_base, d_new):
+    '''
+    Return a string comparing the main metrics of two results. The change is
+    shown as the speedup of the new results: above 1 is faster
+
+    :param d_base: dictionary. results of the baseline commit
+    :param d_new: dictionary. results of the new commit
+    '''
+    d_metrics1 = get_metrics(d_base)
+    d_metrics2 = get_metrics(d_new)
+    s_line = '{:<55} {:>14} {:>14} {:>8}'
+    l_rtn = ['{} -> {}'.format(d_base['machine']['sha'] or 'base',
+                               d_new['machine']['sha'] or 'new'),
+             s_line.format('metric', 'base', 'new', 'speedup')]
+    for s_key in sorted(set(d_metrics1) & set(d_metrics2)):
+        f_base, f_new = d_metrics1[s_key], d_metrics2[s_key]
+        f_speedup = float('nan')
+        if s_key.endswith('_per_s') or s_key.endswith('_per_min'):
+            if f_base:
+                f_speedup = f_new / f_base
+        elif f_new:
+            f_speedup = f_base / f_new
+        l_rtn.append(s_line.format(s_key, '{:,.2f}'.format(f_base),
+                                   '{:,.2f}'.format(f_new),
+                                   '{:.2f}'.format(f_speedup)))
+    return '\n'.join(l_rtn)
+
+
+if __name__ == '__main__':
+    s_txt = '''\
+            Run the benchmarks of the environment using synthetic data
+            --------------------------------------------
+            The results are saved in a JSON file. Use --compare to check
+            them against the results of other commit
+            '''
+    obj_formatter = argparse.RawDescriptionHelpFormatter
+    parser = argparse.ArgumentParser(formatter_class=obj_formatter,
+                                     description=textwrap.dedent(s_txt))
+
+    s_help = 'File to save the results'
+    parser.add_argument('-o', '--output', default='bench_results.json',
+                        type=str, help=s_help)
+
+    s_help = 'Seed of the synthetic data and of the environment'
+    parser.add_argument('-s', '--seed', default=0, type=int, help=s_help)
+
+    s_help = 'Agents to run, separated by comma'
+    parser.add_argument('-a', '--agents', default=','.join(DEMO_AGENTS),
+                        type=str, help=s_help)
+
+    s_help = 'Time to close each episode (HH:mm:ss)'
+    parser.add_argument('-e', '--endtime', default='10:00:00', type=str,
+                        help=s_help)
+
+    s_help = 'Folder to keep the synthetic data. Temporary if not set'
+    parser.add_argument('-d', '--datafolder', default=None, type=str,
+                        help=s_help)
+
+    s_help = 'JSON file of a previous run to compare with'
+    parser.add_argument('-c', '--compare', default=None, type=str,
+                        help=s_help)
+
+    args = parser.parse_args()
+
+    d_results = run_benchmarks(s_folder=args.datafolder,
+                               i_seed=args.seed,
+                               l_agents=args.agents.split(','),
+                               s_endtime=args.endtime)
+    with open(args.output, 'w') as fw:
+        json.dump(d_results, fw, indent=2, sort_keys=True)
+    print('Results saved at {}'.format(args.output))
+    for s_agent, d_aux in d_results['episodes'].items():
+        if 'error' in d_aux:
+            print('{} failed:\n{}'.format(s_agent, d_aux['error']))
+
+    if args.compare:
+        with open(args.compare, 'r') as fr:
+            d_base = json.load(fr)
+        print(compare_results(d_base, d_results))
@@ -0,0 +1,470 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Generate synthetic order book files in the same layout of the OFER_CPA and
+OFER_VDA files from B3, already split by instrument as parser_data.extract_data
+does. The order flow is random, but reproducible from a seed, so the files can
+be used to benchmark the environment without shipping real market data
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import datetime
+import os
+import zipfile
+import numpy as np
+
+
+'''
+Begin help functions
+'''
+
+# default parameters of the order flow of each instrument
+DEFAULT_CONF = {'f_order_rate': 5.,  # events by second
+                'f_cancel_ratio': .35,  # fraction of the events
+                'f_replace_ratio': .15,
+                'f_trade_ratio': .1,
+                'f_price': 5000.,  # initial mid price
+                't_price_range': (4900., 5100.),  # range of the mid price
+                'f_tick': .5,
+                'i_levels': 10,  # max distance of new orders to the mid
+                'i_lot': 5,  # minimum quantity of the orders
+                'i_max_lots': 10,
+                'i_prior_orders': 50,  # orders resting from the prior day
+                's_start': '09:00:00',
+                's_end': '16:00:00'}
+
+# members used to send the orders and names of the files by side
+MEMBERS = (3, 8, 13, 27, 72, 85, 107, 120, 308)
+FILE_NAMES = {'BID': 'OFER_CPA', 'ASK': 'OFER_VDA'}
+
+# codes of the new B3 layout, as in the parser_data.LineParser
+SIDE_CODE = {'BID': '1', 'ASK': '2'}
+EXEC_NEW, EXEC_CANCEL, EXEC_REPLACE, EXEC_TRADE = '0', '4', '5', 'F'
+STATUS_NEW, STATUS_PARTIAL, STATUS_FILLED = '0', '1', '2'
+STATUS_CANCELED, STATUS_REPLACED = '4', '5'
+AGR_NEUTRAL, AGR_AGRESSOR, AGR_PASSIVE = '0', '1', '2'
+
+
+def get_conf(d_conf=None):
+    '''
+    Return the default parameters of the order flow updated by the ones
+    passed
+
+    :param d_conf*: dictionary. parameters to change in DEFAULT_CONF
+    '''
+    d_rtn = dict(DEFAULT_CONF)
+    if d_conf:
+        d_rtn.update(d_conf)
+    return d_rtn
+
+
+def get_seconds(s_time):
+    '''
+    Return the seconds of the day from a string in the format HH:MM:SS
+
+    :param s_time: string. time to convert
+    '''
+    return sum([float(s)*60**(2-i) for i, s in enumerate(s_time.split(':'))])
+
+
+def format_time(f_time, i_digits=7):
+    '''
+    Return the seconds of the day passed in the format HH:MM:SS.NNNNNNN. The
+    priority times of the B3 files have 7 decimals and the entry times, 6
+
+    :param f_time: float. seconds of the day
+    :param i_digits*: integer. number of decimals
+    '''
+    i_unit = 10 ** i_digits
+    i_frac = int(round(f_time * i_unit))
+    i_sec, i_frac = divmod(i_frac, i_unit)
+    i_min, i_sec = divmod(i_sec, 60)
+    i_hour, i_min = divmod(i_min, 60)
+    return '{:02d}:{:02d}:{:02d}.{:0{}d}'.format(i_hour, i_min, i_sec, i_frac,
+                                                 i_digits)
+
+
+def get_prior_date(s_date):
+    '''
+    Return the business day before the date passed, in the format YYYY-MM-DD
+
+    :param s_date: string. date in the format YYYYMMDD
+    '''
+    dt_date = datetime.datetime.strptime(s_date, '%Y%m%d')
+    dt_date -= datetime.timedelta(days=1)
+    while dt_date.weekday() > 4:
+        dt_date -= datetime.timedelta(days=1)
+    return dt_date.strftime('%Y-%m-%d')
+
+'''
+End help functions
+'''
+
+
+class SyntheticOrderFlow(object):
+    '''
+    Simulate the order flow of a single instrument in a day and keep the
+    rows of each side in the B3 layout. New orders are placed around a mid
+    price that follows a random walk. Cancels and replaces pick a random
+    resting order, and trades hit the first order of the best price level,
+    writing a passive row in the side of the resting order and an agressor
+    row in the other side
+    '''
+    def __init__(self, s_instrument, s_date, d_conf, random_state):
+        '''
+        Initialize a SyntheticOrderFlow object
+
+        :param s_instrument: string. symbol of the instrument
+        :param s_date: string. session date in the format YYYYMMDD
+        :param d_conf: dictionary. parameters of the order flow (get_conf)
+        :param random_state: numpy RandomState. source of random numbers
+        '''
+        self.s_instrument = s_instrument
+        self.s_session = '{}-{}-{}'.format(s_date[:4], s_date[4:6], s_date[6:])
+        self.s_prior = get_prior_date(s_date)
+        self.d_conf = d_conf
+        self.rng = random_state
+        f_tick = d_conf['f_tick']
+        self.f_tick = f_tick
+        self.i_min = int(round(d_conf['t_price_range'][0] / f_tick))
+        self.i_max = int(round(d_conf['t_price_range'][1] / f_tick))
+        self.i_mid = int(round(d_conf['f_price'] / f_tick))
+        self.i_mid = min(max(self.i_mid, self.i_min), self.i_max)
+        self.i_count = 0
+        self.d_rows = {'BID': [], 'ASK': []}
+        # orders resting in the book, by id, and the ids of each price level
+        # in order of arrival. Prior-day orders are not in the levels
+        self.d_orders = {}
+        self.d_levels = {'BID': {}, 'ASK': {}}
+        # ids of the orders from today, to pick one at random in O(1)
+        self.l_live = []
+        self.d_live_idx = {}
+
+    def _next_ids(self):
+        '''
+        Return a new sequential order number, secondary order id and
+        priority indicator
+        '''
+        self.i_count += 1
+        return (7000000000000 + self.i_count,
+                100000000000 + self.i_count,
+                1000000000 + self.i_count)
+
+    def _write(self, d_order, f_time, s_exec, s_status, s_agr, i_traded):
+        '''
+        Include a row related to the order passed in the file of its side
+
+        :param d_order: dictionary. order data
+        :param f_time: float. time of the event, in seconds
+        :param s_exec: string. execution type code
+        :param s_status: string. order status code
+        :param s_agr: string. agressor indicator code
+        :param i_traded: integer. quantity traded by the order until now
+        '''
+        s_ptime = format_time(f_time)
+        if d_order['date'] != self.s_session:
+            s_ptime = d_order['entry'].split(' ')[1] + '0'
+        l_row = [self.s_session,
+                 '{:<20}'.format(self.s_instrument),
+                 SIDE_CODE[d_order['side']],
+                 str(d_order['seq']),
+                 str(d_order['sec']),
+                 s_exec,
+                 s_ptime,
+                 str(d_order['prio']),
+                 '{:.6f}'.format(d_order['price'] * self.f_tick),
+                 str(d_order['qty']),
+                 str(i_traded),
+                 d_order['date'],
+                 d_order['entry'],
+                 s_status,
+                 s_agr,
+                 str(d_order['member'])]
+        self.d_rows[d_order['side']].append(';'.join(l_row) + '\n')
+
+    def _create(self, s_side, i_price, f_time, s_date=None):
+        '''
+        Return a new order, not yet included in the book
+
+        :param s_side: string. BID or ASK
+        :param i_price: integer. price in ticks
+        :param f_time: float. time of the entry, in seconds
+        :param s_date*: string. order date. Use the session date if None
+        '''
+        i_seq, i_sec, i_prio = self._next_ids()
+        i_qty = self.d_conf['i_lot'] * self.rng.randint(
+            1, self.d_conf['i_max_lots'] + 1)
+        s_date = s_date or self.s_session
+        return {'side': s_side,
+                'seq': i_seq,
+                'sec': i_sec,
+                'prio': i_prio,
+                'price': i_price,
+                'qty': i_qty,
+                'traded': 0,
+                'date': s_date,
+                'entry': '{} {}'.format(s_date, format_time(f_time, 6)),
+                'member': MEMBERS[self.rng.randint(len(MEMBERS))]}
+
+    def _add_live(self, d_order):
+        '''
+        Include an order from today in the book
+
+        :param d_order: dictionary. order data
+        '''
+        i_seq = d_order['seq']
+        self.d_orders[i_seq] = d_order
+        d_side = self.d_levels[d_order['side']]
+        d_side.setdefault(d_order['price'], []).append(i_seq)
+        self.d_live_idx[i_seq] = len(self.l_live)
+        self.l_live.append(i_seq)
+
+    def _remove_live(self, d_order):
+        '''
+        Exclude an order from today from the book
+
+        :param d_order: dictionary. order data
+        '''
+        i_seq = d_order['seq']
+        self.d_orders.pop(i_seq)
+        d_side = self.d_levels[d_order['side']]
+        l_level = d_side[d_order['price']]
+        l_level.remove(i_seq)
+        if not l_level:
+            d_side.pop(d_order['price'])
+        # swap with the last id to remove it in O(1)
+        i_idx = self.d_live_idx.pop(i_seq)
+        i_last = self.l_live.pop()
+        if i_last != i_seq:
+            self.l_live[i_idx] = i_last
+            self.d_live_idx[i_last] = i_idx
+
+    def _best(self, s_side):
+        '''
+        Return the best price of the side passed, in ticks, or None
+
+        :param s_side: string. BID or ASK
+        '''
+        d_side = self.d_levels[s_side]
+        if not d_side:
+            return None
+        if s_side == 'BID':
+            return max(d_side)
+        return min(d_side)
+
+    def prior_day_orders(self, f_start):
+        '''
+        Include the orders resting from the prior day. They are placed outside
+        the price range of the mid price, so they are never hit
+
+        :param f_start: float. time to write the rows, in seconds
+        '''
+        i_out = self.d_conf['i_levels'] * 2
+        for _ in range(self.d_conf['i_prior_orders']):
+            f_entry = get_seconds('09:00:00') + self.rng.rand() * 7 * 3600
+            s_side = 'BID' if self.rng.rand() < .5 else 'ASK'
+            if s_side == 'BID':
+                i_price = self.i_min - self.d_conf['i_levels'] - 1
+            else:
+                i_price = self.i_max + self.d_conf['i_levels'] + 1
+            i_offset = self.rng.randint(i_out)
+            i_price += -i_offset if s_side == 'BID' else i_offset
+            d_order = self._create(s_side, i_price, f_entry, self.s_prior)
+            self._write(d_order, f_start, EXEC_NEW, STATUS_NEW, AGR_NEUTRAL, 0)
+
+    def new_order(self, f_time):
+        '''
+        Include a new order around the mid price, without crossing the book
+
+        :param f_time: float. time of the event, in seconds
+        '''
+        s_side = 'BID' if self.rng.rand() < .5 else 'ASK'
+        i_offset = min(self.rng.geometric(.35) - 1, self.d_conf['i_levels'])
+        if s_side == 'BID':
+            i_price = self.i_mid - 1 - i_offset
+            i_best = self._best('ASK')
+            if i_best is not None:
+                i_price = min(i_price, i_best - 1)
+        else:
+            i_price = self.i_mid + 1 + i_offset
+            i_best = self._best('BID')
+            if i_best is not None:
+                i_price = max(i_price, i_best + 1)
+        d_order = self._create(s_side, i_price, f_time)
+        self._add_live(d_order)
+        self._write(d_order, f_time, EXEC_NEW, STATUS_NEW, AGR_NEUTRAL, 0)
+
+    def cancel_order(self, f_time):
+        '''
+        Cancel a random order from today
+
+        :param f_time: float. time of the event, in seconds
+        '''
+        if not self.l_live:
+            return self.new_order(f_time)
+        i_seq = self.l_live[self.rng.randint(len(self.l_live))]
+        d_order = self.d_orders[i_seq]
+        self._remove_live(d_order)
+        self._write(d_order, f_time, EXEC_CANCEL, STATUS_CANCELED,
+                    AGR_NEUTRAL, d_order['traded'])
+
+    def replace_order(self, f_time):
+        '''
+        Change the quantity of a random order from today
+
+        :param f_time: float. time of the event, in seconds
+        '''
+        if not self.l_live:
+            return self.new_order(f_time)
+        i_seq = self.l_live[self.rng.randint(len(self.l_live))]
+        d_order = self.d_orders[i_seq]
+        d_order['qty'] = d_order['traded'] + self.d_conf['i_lot'] * (
+            self.rng.randint(1, self.d_conf['i_max_lots'] + 1))
+        self._write(d_order, f_time, EXEC_REPLACE, STATUS_REPLACED,
+                    AGR_NEUTRAL, d_order['traded'])
+
+    def trade(self, f_time):
+        '''
+        Send an agressor order that hits the first order of the best price
+        level of a random side
+
+        :param f_time: float. time of the event, in seconds
+        '''
+        s_passive = 'BID' if self.rng.rand() < .5 else 'ASK'
+        i_best = self._best(s_passive)
+        if i_best is None:
+            return self.new_order(f_time)
+        d_passive = self.d_orders[self.d_levels[s_passive][i_best][0]]
+        i_left = d_passive['qty'] - d_passive['traded']
+        i_qty = min(i_left, self.d_conf['i_lot'] * self.rng.randint(
+            1, self.d_conf['i_max_lots'] + 1))
+        d_passive['traded'] += i_qty
+        s_status = STATUS_PARTIAL
+        if d_passive['traded'] == d_passive['qty']:
+            s_status = STATUS_FILLED
+            self._remove_live(d_passive)
+        self._write(d_passive, f_time, EXEC_TRADE, s_status, AGR_PASSIVE,
+                    d_passive['traded'])
+        # the agressor is filled at once and never rests in the book
+        s_agressor = 'ASK' if s_passive == 'BID' else 'BID'
+        d_agressor = self._create(s_agressor, i_best, f_time)
+        d_agressor['qty'] = i_qty
+        self._write(d_agressor, f_time, EXEC_TRADE, STATUS_FILLED,
+                    AGR_AGRESSOR, i_qty)
+
+    def run(self):
+        '''
+        Simulate the order flow of the whole day. Return a dictionary with
+        the rows of each side
+        '''
+        d_conf = self.d_conf
+        f_time = get_seconds(d_conf['s_start'])
+        f_end = get_seconds(d_conf['s_end'])
+        self.prior_day_orders(f_time)
+        f_cancel = d_conf['f_cancel_ratio']
+        f_replace = f_cancel + d_conf['f_replace_ratio']
+        f_trade = f_replace + d_conf['f_trade_ratio']
+        f_interval = 1. / d_conf['f_order_rate']
+        while True:
+            # keep the times increasing after rounding to microseconds
+            f_time += max(self.rng.exponential(f_interval), 1e-6)
+            if f_time >= f_end:
+                break
+            # move the mid price
+            f_rand = self.rng.rand()
+            if f_rand < .05:
+                self.i_mid = max(self.i_min, self.i_mid - 1)
+            elif f_rand < .1:
+                self.i_mid = min(self.i_max, self.i_mid + 1)
+            # choose the event
+            f_rand = self.rng.rand()
+            if f_rand < f_cancel:
+                self.cancel_order(f_time)
+            elif f_rand < f_replace:
+                self.replace_order(f_time)
+            elif f_rand < f_trade:
+                self.trade(f_time)
+            else:
+                self.new_order(f_time)
+        return self.d_rows
+
+
+def write_book_file(s_file, s_side, s_session, s_instrument, l_rows):
+    '''
+    Write the rows of one side in a zip file, between the header and the
+    trailer rows. Return the path to the file
+
+    :param s_file: string. path to the zip file
+    :param s_side: string. BID or ASK
+    :param s_session: string. session date in the format YYYY-MM-DD
+    :param s_instrument: string. symbol of the instrument
+    :param l_rows: list. rows of the file
+    '''
+    s_name = FILE_NAMES[s_side]
+    s_header = 'RH;{0};{1};{1};{2}\n'.format(s_name, s_session, len(l_rows))
+    s_trailer = 'RT;{0};{1};{1};{2}\n'.format(s_name, s_session,
+                                              len(l_rows) + 2)
+    s_data = s_header + ''.join(l_rows) + s_trailer
+    # use a fixed timestamp, so the same seed creates the same file
+    obj_info = zipfile.ZipInfo('{}.txt'.format(s_instrument),
+                               date_time=(1980, 1, 1, 0, 0, 0))
+    obj_info.compress_type = zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(s_file, mode='w') as zf:
+        zf.writestr(obj_info, s_data.encode())
+    return s_file
+
+
+def make_synthetic_day(s_folder, s_date, l_instruments, i_seed=0,
+                       d_conf=None):
+    '''
+    Create the BID and ASK files of each instrument in the day passed, in the
+    folder structure used by Env.setParameters. Return a list with the files
+    created
+
+    :param s_folder: string. root of the data folder
+    :param s_date: string. session date in the format YYYYMMDD
+    :param l_instruments: list. symbols of the instruments
+    :param i_seed*: integer. seed of the random numbers
+    :param d_conf*: dictionary. parameters to change in DEFAULT_CONF. Use a
+        dictionary by instrument to set each one apart
+    '''
+    random_state = np.random.RandomState(i_seed)
+    s_path = os.path.join(s_folder, s_date)
+    if not os.path.isdir(s_path):
+        os.makedirs(s_path)
+    l_rtn = []
+    for s_instr in l_instruments:
+        d_aux = d_conf or {}
+        if s_instr in d_aux:
+            d_aux = d_aux[s_instr]
+        obj_flow = SyntheticOrderFlow(s_instr, s_date, get_conf(d_aux),
+                                      random_state)
+        d_rows = obj_flow.run()
+        for s_side in ['BID', 'ASK']:
+            s_file = os.path.join(s_path, '{}_{}_{}_new.zip'.format(
+                s_date, s_side, s_instr))
+            l_rtn.append(write_book_file(s_file, s_side, obj_flow.s_session,
+                                         s_instr, d_rows[s_side]))
+    return l_rtn
+
+
+def make_synthetic_data(s_folder, l_dates, l_instruments, i_seed=0,
+                        d_conf=None):
+    '''
+    Create the files of all days passed. Each day uses the seed passed plus
+    its position in the list. Return a list with the files created
+
+    :param s_folder: string. root of the data folder
+    :param l_dates: list. session dates in the format YYYYMMDD
+    :param l_instruments: list. symbols of the instruments
+    :param i_seed*: integer. seed of the random numbers
+    :param d_conf*: dictionary. parameters to change in DEFAULT_CONF
+    '''
+    l_rtn = []
+    for i_day, s_date in enumerate(l_dates):
+        l_rtn += make_synthetic_day(s_folder, s_date, l_instruments,
+                                    i_seed + i_day, d_conf)
+    return l_rtn
@@ -8,4 +8,4 @@ such as string, from unintentionally hiding valid modules that occur later
 
 Created on 08/19/2016
 """
-from .matching_engine import BvmfFileMatching, NextStopTime
+from .matching_engine import BvmfFileMatching, NextStopTime, EventClock
@@ -9,12 +9,16 @@ Created on 07/05/2016
 """
 # import libraries
 from bintrees import FastRBTree
-from collections import deque
+from collections import Counter, namedtuple
+import numpy as np
 import pandas as pd
 import platform
 from . import parser_data
+from . import book_cache
+from . import price_ladder
 import zipfile
 from . import translator
+from .perf import NO_PERF
 from neutrinogym.neutrino import (TradeInfo, SecurityInfo, BookData)
 import neutrinogym.neutrino as neutrino
 
@@ -25,6 +29,12 @@ Begin help functions
 
 PYVERSION = platform.sys.version[0]
 
+# minimum number of price levels kept in the depth snapshots
+DEPTH_SIZE = 16
+
+# trades returned by TradeBuffer.trades_since(), as views of the trade tape
+TradeArrays = namedtuple('TradeArrays', 'price qty agr trade_id time')
+
 class DifferentPriceException(Exception):
     """
     DifferentPriceException is raised by the update() method in the PriceLevel
@@ -60,6 +70,31 @@ def open_file(s_fname):
     return fr, archive
 
 
+def open_data(s_fname, s_side, s_instrument, b_use_cache=False,
+              b_bulk_parse=False):
+    '''
+    Open the cache file related to the zipped file passed, if it exists and
+    b_use_cache is True. Otherwise, open the zipped file, parsing it in chunks
+    if b_bulk_parse is True. Return the object to be read by the BookSide and
+    the object to be closed at the end
+
+    :param s_fname: string. path to the zipped file
+    :param s_side: string. BID or ASK
+    :param s_instrument: string. name of the instrument of book
+    :param b_use_cache*: boolean. If should use the cache file when available
+    :param b_bulk_parse*: boolean. If should parse the zipped file in chunks
+    '''
+    if s_fname is None:
+        return None, None
+    if b_use_cache and book_cache.has_cache(s_fname):
+        fr = book_cache.BookCacheReader(s_fname, s_instrument)
+        return fr, fr
+    if b_bulk_parse:
+        fr = book_cache.ZipChunkReader(s_fname, s_side, s_instrument)
+        return fr, fr
+    return open_file(s_fname)
+
+
 def get_relative_price(best_queue, order_obj):
     '''
     Measure the relative price of the order pased, in 100th
@@ -74,6 +109,23 @@ def get_relative_price(best_queue, order_obj):
             f_relprice = best_queue[0] - order_obj['order_price']
     return int((f_relprice)*100)
 
+
+def get_stop_seconds(s_stop_time):
+    '''
+    Return the stop time passed in seconds
+
+    :param s_stop_time: string or float. Time in the format HH:MM:SS.mmm or
+        already in seconds
+    '''
+    if not isinstance(s_stop_time, str):
+        return float(s_stop_time)
+    f_stop_time = float(s_stop_time[0:2])*60**2
+    f_stop_time += float(s_stop_time[3:5])*60
+    f_stop_time += float(s_stop_time[6:8])
+    if len(s_stop_time) > 8:
+        f_stop_time += (float(s_stop_time[9:14])/1000.)
+    return f_stop_time
+
 '''
 End help functions
 '''
@@ -81,120 +133,228 @@ End help functions
 
 class TradeBuffer(object):
     '''
-    A TradeBuffer representation
+    A TradeBuffer representation. The trades are kept as a tape of numpy
+    arrays with room for two buffers. When the arrays are full, the last
+    trades are moved to their beginning, so the tape is always a contiguous
+    slice of them and can be read in bulk by trades_since()
     '''
 
     # As just passive tardes are accounted, the agressor is the opposite
-    _status_map = {'Buy Order': '-', 'Sell Order': '+'}
+    _agr_map = {'Buy Order': -1, 'Sell Order': 1}
     # account just agressors
-    # _status_map = {'Buy Order': '+', 'Sell Order': '-'}
+    # _agr_map = {'Buy Order': 1, 'Sell Order': -1}
+    _agr_status = {-1: '-', 1: '+'}
 
     def __init__(self, maxcount=512):
         '''
         Instanciate a TradeBuffer object
         '''
         self.maxcount = maxcount
-        self.l = deque([], maxlen=maxcount)
+        i_size = 2 * maxcount
+        self.na_price = np.zeros(i_size)
+        self.na_qty = np.zeros(i_size, dtype=np.int64)
+        self.na_agr = np.zeros(i_size, dtype=np.int8)
+        self.na_id = np.zeros(i_size, dtype=np.int64)
+        self.na_time = np.zeros(i_size, dtype=np.int64)
+        self.na_date = np.empty(i_size, dtype=object)
+        self.i_start = 0  # index of the first trade of the tape
+        self.i_end = 0  # index after the last trade of the tape
         self.b_erase_data = False
         self.index = 0
         self.last_trade_id = 0
 
     def erase_data_in_the_next_round(self):
         '''
-        Set data list attribute 'self.l' to be erased in the next round
+        Set the trades to be erased in the next round
         '''
         self.b_erase_data = True
 
+    def clear(self):
+        '''
+        Erase all trades of the tape. The trade ids keep increasing
+        '''
+        self.i_start = 0
+        self.i_end = 0
+        self.index = 0
+
     def unload_buffer(self):
         '''
         reset variables if required
         '''
         if self.b_erase_data:
-            self.l = deque([], maxlen=self.maxcount)
-            self.index = 0
-        self.index = len(self.l)
+            self.clear()
+        self.index = len(self)
         self.b_erase_data = False
 
     def append(self, item):
         '''
-        Include a neu item in the list attribute 'self.l'
+        Include a new trade at the end of the tape
 
         :param item: dict. matching engine msg
         '''
         if self.b_erase_data:
-            self.l = deque([], maxlen=self.maxcount)
-            self.index = 0
+            self.clear()
         if item and item['order_qty']:  # and item['action'] == 'history':
             item['trade_id'] = self.last_trade_id
+            if self.i_end == self.na_id.shape[0]:
+                i_keep = self.i_end - self.i_start
+                for na_aux in (self.na_price, self.na_qty, self.na_agr,
+                               self.na_id, self.na_time, self.na_date):
+                    na_aux[:i_keep] = na_aux[self.i_start:self.i_end]
+                self.i_start = 0
+                self.i_end = i_keep
+            idx = self.i_end
+            # NOTE: Not sure if the trade time outputted by API is like that
+            # f_time = int(d_msg['priority_seconds'] * 1000)
+            s_aux = item['priority_time']
+            # NOTE: maybe it is the correct form. Should append 0 id len < 9
+            self.na_time[idx] = int(
+                ''.join(s_aux.replace('.', '').split(':'))[:-3])
+            self.na_price[idx] = item['order_price']
+            self.na_qty[idx] = item['order_qty']
+            self.na_agr[idx] = self._agr_map[item['order_side']]
+            self.na_id[idx] = self.last_trade_id
+            self.na_date[idx] = item['order_date']
+            self.i_end += 1
+            self.i_start = max(self.i_start, self.i_end - self.maxcount)
             self.last_trade_id += 1
-            self.l.append(item)
-        self.index = len(self.l)
+        self.index = len(self)
         self.b_erase_data = False
 
+    def trades_since(self, i_trade_id=-1):
+        '''
+        Return a TradeArrays tuple with read-only views of the trades after
+        the trade id passed. They should not be kept between updates. The
+        agressor is 1 to buyers and -1 to sellers, and the time is an integer
+        as HHMMSSssss
+
+        :param i_trade_id*: integer. last trade id already processed
+        '''
+        self.b_erase_data = True
+        i_first = self.i_start
+        if self.i_end > self.i_start:
+            # the trade ids in the tape are consecutive
+            i_skip = i_trade_id + 1 - int(self.na_id[self.i_start])
+            i_first += min(max(0, i_skip), self.i_end - self.i_start)
+        l_views = []
+        for na_aux in (self.na_price, self.na_qty, self.na_agr, self.na_id,
+                       self.na_time):
+            na_view = na_aux[i_first:self.i_end]
+            na_view.flags.writeable = False
+            l_views.append(na_view)
+        return TradeArrays(*l_views)
+
     def __len__(self):
-        return len(self.l)
+        return self.i_end - self.i_start
 
     def __getitem__(self, key):
         self.b_erase_data = True
-        d_msg = self.l[key]
-        # TODO: Why there is trades with qty zero?
-        f_qty = d_msg['order_qty']
-        if not f_qty:
-            print('Trade qty None')
-            print(d_msg)
-            f_qty = 5
-        # NOTE: Not sure if the trade time outputted by API is like that
-        # f_time = int(d_msg['priority_seconds'] * 1000)
-        s_aux = d_msg['priority_time']
-        # NOTE: maybe it is the correct form. Should append 0 id len < 9
-        f_time = int(''.join(s_aux.replace('.', '').split(':'))[:-3])
-        obj_rtn = TradeInfo(d_msg['order_price'],  # price
-                            d_msg['order_qty'],  # quantity
+        i_len = self.i_end - self.i_start
+        if key < 0:
+            key += i_len
+        if key < 0 or key >= i_len:
+            raise IndexError('trade index out of range')
+        idx = self.i_start + key
+        i_time = int(self.na_time[idx])
+        i_id = int(self.na_id[idx])
+        obj_rtn = TradeInfo(float(self.na_price[idx]),  # price
+                            int(self.na_qty[idx]),  # quantity
                             'ND',  # buyer
                             'ND',  # seller
-                            d_msg['order_date'],  # date
-                            f_time,  # time
-                            # d_msg['order_status'],  # status
-                            self._status_map[d_msg['order_side']],  # status
-                            d_msg['trade_id'],  # tradeID
-                            d_msg['trade_id'],  # tradeID
-                            f_time)  # datetime
+                            self.na_date[idx],  # date
+                            i_time,  # time
+                            self._agr_status[int(self.na_agr[idx])],  # status
+                            i_id,  # tradeID
+                            i_id,  # tradeID
+                            i_time)  # datetime
         return obj_rtn
 
 
 class Order(object):
     '''
-    A representation of a single Order
+    A compact representation of a single Order. Keep just the fields used by
+    the book and by the translator, instead of a copy of the whole message
     '''
-
-    def __init__(self, d_msg):
+    # map the keys of the messages to the attributes of the object
+    _MSG_FIELDS = {'seq_order_number': 'name',
+                   'secondary_order_id': 's_sec_id',
+                   'priority_indicator': 'i_priority',
+                   'order_id': 'i_msg_id',
+                   'order_side': 's_side',
+                   'order_status': 's_status',
+                   'order_price': 'f_price',
+                   'org_total_qty_order': 'i_org_qty',
+                   'traded_qty_order': 'i_traded_qty',
+                   'total_qty_order': 'i_qty',
+                   'priority_seconds': 'f_ptime',
+                   'agent_id': 'i_agent_id',
+                   'member': 'i_member',
+                   'order_date': 's_order_date',
+                   'is_today': 'b_is_today',
+                   'instrument_symbol': 's_instrument',
+                   'action': 's_action',
+                   'idx': 's_idx',
+                   'neutrino_order': 'neutrino_order'}
+    __slots__ = ['order_id', 'sec_order_id', 'main_id', 'key'] + sorted(
+        _MSG_FIELDS.values())
+
+    def __init__(self, d_msg, key=None):
         '''
         Instantiate a Order object. Save all parameter as attributes
 
         :param d_msg: dictionary.
+        :param key*: float or integer. The key of the order price in the tree
         '''
         # keep data extract from file
-        self.d_msg = d_msg.copy()
-        f_q1 = self.d_msg['org_total_qty_order']
-        f_q2 = self.d_msg['traded_qty_order']
-        self.d_msg['total_qty_order'] = f_q1 - f_q2
-        self.order_id = int(d_msg['seq_order_number'])
-        self.sec_order_id = int(d_msg['priority_indicator'])
-        if neutrino.BOVESPA:
-            self.sec_order_id = int(d_msg['secondary_order_id'])  # Bovespa
         self.name = d_msg['seq_order_number']
+        self.s_sec_id = d_msg['secondary_order_id']
+        self.i_priority = d_msg['priority_indicator']
+        self.i_msg_id = d_msg['order_id']
+        self.s_side = d_msg['order_side']
+        self.s_status = d_msg['order_status']
+        self.f_price = d_msg['order_price']
+        self.i_org_qty = d_msg['org_total_qty_order']
+        self.i_traded_qty = d_msg['traded_qty_order']
+        self.i_qty = self.i_org_qty - self.i_traded_qty
+        self.f_ptime = d_msg['priority_seconds']
+        self.i_agent_id = d_msg['agent_id']
+        self.i_member = d_msg['member']
+        self.s_order_date = d_msg['order_date']
+        self.b_is_today = d_msg['is_today']
+        self.s_instrument = d_msg['instrument_symbol']
+        self.s_action = d_msg['action']
+        self.s_idx = d_msg['idx']
+        self.neutrino_order = d_msg.get('neutrino_order', None)
+        self.key = self.f_price if key is None else key
+        # define the ids
+        self.order_id = int(self.name)
+        self.sec_order_id = int(self.i_priority)
+        if neutrino.BOVESPA:
+            self.sec_order_id = int(self.s_sec_id)  # Bovespa
         self.main_id = self.sec_order_id
         if self.sec_order_id == 0:
             self.main_id = self.order_id
 
+    @property
+    def d_msg(self):
+        '''
+        Return a dictionary with the fields of the message kept by the order
+        '''
+        d_rtn = {}
+        for s_key, s_attr in self._MSG_FIELDS.items():
+            d_rtn[s_key] = getattr(self, s_attr)
+        if self.neutrino_order is None:
+            d_rtn.pop('neutrino_order')
+        return d_rtn
+
     def set_values(self, s_key, f_value):
         '''
-        Include new information in the order dictionary
+        Change one of the fields of the order
 
-        :param s_key: string. new key to include
+        :param s_key: string. key of the message to change
         :param f_value: float. value to include
         '''
-        self.d_msg[s_key] = f_value
+        setattr(self, self._MSG_FIELDS[s_key], f_value)
 
     def __str__(self):
         '''
@@ -239,41 +399,59 @@ class Order(object):
 
     def __getitem__(self, s_key):
         '''
-        Allow direct access to the inner dictionary of the object
+        Allow access to the fields of the order as in the original message
 
-        :param i_index: integer. index of the l_legs attribute list
+        :param s_key: string. key of the message
         '''
-        return self.d_msg[s_key]
+        return getattr(self, self._MSG_FIELDS[s_key])
+
+    def __contains__(self, s_key):
+        '''
+        Check if the field is available, as in the original message
+
+        :param s_key: string. key of the message
+        '''
+        if s_key == 'neutrino_order':
+            return self.neutrino_order is not None
+        return s_key in self._MSG_FIELDS
 
 
 class PriceLevel(object):
     '''
     A representation of a Price level in the book
     '''
-    def __init__(self, f_price):
+    def __init__(self, f_price, key=None):
         '''
         A representation of a PriceLevel object
+
+        :param f_price: float. The price of the level
+        :param key*: float or integer. The key of the level in the price tree.
+            The price itself, if not passed, or the price in ticks
         '''
         self.f_price = f_price
+        self.key = f_price if key is None else key
         self.i_qty = 0
         self.f_time = 0
         self.order_tree = FastRBTree()
 
-    def add(self, order_aux):
+    def add(self, order_aux, key=None):
         '''
         Insert the information in the tree using the info in order_aux. Return
         is should delete the Price level or not
 
         :param order_aux: Order Object. The Order message to be updated
+        :param key*: float or integer. The key of the order price in the tree
         '''
         # check if the order_aux price is the same of the self
-        s_status = order_aux['order_status']
-        self.f_time = order_aux['priority_seconds']
-        if order_aux['order_price'] != self.f_price:
+        s_status = order_aux.s_status
+        self.f_time = order_aux.f_ptime
+        if key is None:
+            key = order_aux.key
+        if key != self.key:
             raise DifferentPriceException
         elif s_status in ['New', 'Replaced', 'Partially Filled']:
             self.order_tree.insert(order_aux.main_id, order_aux)
-            self.i_qty += int(order_aux['total_qty_order'])
+            self.i_qty += int(order_aux.i_qty)
         # check if there is no object in the updated tree (should be deleted)
         return self.order_tree.count == 0
 
@@ -361,7 +539,7 @@ class BookSide(object):
         Initialize a BookSide object. Save all parameters as attributes
 
         :param s_side: string. BID or ASK
-        :param fr_data: ZipExtFile object. data to read
+        :param fr_data: ZipExtFile or ArrayBookReader object. data to read
         :param i_member*: integer. Member number to be used as a filter
         '''
         if s_side not in ['BID', 'ASK']:
@@ -369,11 +547,29 @@ class BookSide(object):
         self.i_member = i_member
         self.s_side = s_side
         self.price_tree = FastRBTree()
+        self.f_tick = None
+        self.f_inv_tick = None
         self._i_idx = 0
         self.fr_data = fr_data
-        self.parser = parser_data.LineParser(s_side)
+        if isinstance(fr_data, book_cache.ArrayBookReader):
+            self.parser = book_cache.CacheLineParser(s_side)
+        else:
+            self.parser = parser_data.LineParser(s_side)
         self.d_order_map = {}
+        # resting orders of the agents, or with a neutrino order, by price key
+        self.d_agent_orders = {}
+        # number of these orders resting in each price key
+        self.d_agent_keys = Counter()
         self.last_price = 0.
+        self.i_seq = 0  # incremented at each update of this side
+        # depth snapshot, rebuilt just once per sequence
+        self.na_depth_key = np.zeros(DEPTH_SIZE)
+        self.na_depth_price = np.zeros(DEPTH_SIZE)
+        self.na_depth_qty = np.zeros(DEPTH_SIZE, dtype=np.int64)
+        self.na_depth_orders = np.zeros(DEPTH_SIZE, dtype=np.int64)
+        self._i_depth_seq = None
+        self._i_depth_n = 0
+        self._i_depth_len = 0
         # control other statistics
         self.best_queue = (None, None)
         self.i_qty_rel = 0
@@ -402,6 +598,180 @@ class BookSide(object):
                          'Partially Filled': 0,
                          'Filled': 0}
 
+    def set_price_increment(self, f_tick):
+        '''
+        Key the price tree by integer ticks instead of float prices. Should be
+        called before the first update
+
+        :param f_tick: float. The minimum price increment of the instrument
+        '''
+        self.f_tick = f_tick
+        self.f_inv_tick = 1. / f_tick
+
+    def set_price_ladder(self, i_size=2048):
+        '''
+        Replace the price tree by a PriceLadder, an array indexed by the
+        number of ticks from the best price. Should be called after
+        set_price_increment and before the first update
+
+        :param i_size*: integer. Number of ticks covered by the array
+        '''
+        if self.f_tick is None:
+            raise InvalidTypeException('price ladder requires integer prices')
+        self.price_tree = price_ladder.PriceLadder(self.s_side == 'BID',
+                                                   i_size)
+
+    def price_key(self, f_price):
+        '''
+        Return the key of the price passed in the price tree
+
+        :param f_price: float. The price to convert
+        '''
+        if self.f_tick is None:
+            return f_price
+        return int(round(f_price * self.f_inv_tick))
+
+    def key_price(self, key):
+        '''
+        Return the price related to the key of the price tree passed
+
+        :param key: float or integer. The key to convert
+        '''
+        if self.f_tick is None:
+            return key
+        return round(key * self.f_tick, 8)
+
+    def price_range(self, f_min, f_max):
+        '''
+        Return the keys to be used with price_tree.item_slice to recover all
+        price levels between f_min and f_max, inclusive
+
+        :param f_min: float. The lower price
+        :param f_max: float. The higher price
+        '''
+        if self.f_tick is None:
+            return f_min, f_max + 0.01
+        return self.price_key(f_min), self.price_key(f_max) + 1
+
+    def _as_prices(self, t_items):
+        '''
+        Return the (key, PriceLevel) pairs passed as (price, PriceLevel)
+
+        :param t_items: list. items from the price tree
+        '''
+        if self.f_tick is None:
+            return t_items
+        return [(obj_price.f_price, obj_price) for _, obj_price in t_items]
+
+    def _update_depth(self, n):
+        '''
+        Fill the depth arrays with the n first price levels by priority,
+        growing the arrays if needed
+
+        :param n: integer. Number of price levels desired
+        '''
+        i_size = max(n, DEPTH_SIZE)
+        if i_size > len(self.na_depth_price):
+            self.na_depth_key = np.zeros(i_size)
+            self.na_depth_price = np.zeros(i_size)
+            self.na_depth_qty = np.zeros(i_size, dtype=np.int64)
+            self.na_depth_orders = np.zeros(i_size, dtype=np.int64)
+        i_len = 0
+        for key, obj_price in self.get_prices_by_priority(i_size):
+            self.na_depth_key[i_len] = key
+            self.na_depth_price[i_len] = obj_price.f_price
+            self.na_depth_qty[i_len] = obj_price.i_qty
+            self.na_depth_orders[i_len] = obj_price.order_tree.count
+            i_len += 1
+        self._i_depth_seq = self.i_seq
+        self._i_depth_n = i_size
+        self._i_depth_len = i_len
+
+    def get_depth(self, n, b_keys=False):
+        '''
+        Return the n first price levels by priority as a tuple of NumPy arrays
+        (price, qty, number of orders). The arrays are views of a snapshot
+        rebuilt just when the side has changed, so should not be modified
+
+        :param n: integer. Number of price levels desired
+        :param b_keys*: boolean. Return also the keys of the price tree
+        '''
+        if self._i_depth_seq != self.i_seq or n > self._i_depth_n:
+            self._update_depth(n)
+        i_len = min(n, self._i_depth_len)
+        t_rtn = (self.na_depth_price[:i_len],
+                 self.na_depth_qty[:i_len],
+                 self.na_depth_orders[:i_len])
+        if b_keys:
+            return (self.na_depth_key[:i_len],) + t_rtn
+        return t_rtn
+
+    def _add_to_level(self, order_obj):
+        '''
+        Insert the order passed in its price level, creating it if needed
+
+        :param order_obj: Order Object. The last order in the file
+        '''
+        key = order_obj.key
+        this_price = self.price_tree.get(key)
+        if not this_price:
+            this_price = PriceLevel(self.key_price(key), key)
+            self.price_tree.insert(key, this_price)
+        this_price.add(order_obj, key)
+
+    def restore_order(self, d_order):
+        '''
+        Insert a resting order recovered from a book snapshot, without
+        processing it as a new message
+
+        :param d_order: dict. fields of the order, as in Order.d_msg
+        '''
+        order_obj = Order(d_order, self.price_key(d_order['order_price']))
+        self._add_to_level(order_obj)
+        self.d_order_map[order_obj.order_id] = order_obj
+        self._index_agent_order(order_obj)
+        self.i_seq += 1
+
+    def _index_agent_order(self, order_obj):
+        '''
+        Include the order passed in the index of the agents' orders, if it
+        was not sent by the historical agent
+
+        :param order_obj: Order Object. order resting in the book
+        '''
+        if order_obj.i_agent_id != 10 or order_obj.neutrino_order is not None:
+            old_key = self.d_agent_orders.get(order_obj.order_id, None)
+            if old_key == order_obj.key:
+                return
+            if old_key is not None:
+                self._unindex_agent_order(order_obj.order_id)
+            self.d_agent_orders[order_obj.order_id] = order_obj.key
+            self.d_agent_keys[order_obj.key] += 1
+
+    def _unindex_agent_order(self, i_order_id):
+        '''
+        Remove the order passed from the index of the agents' orders, if it
+        is there
+
+        :param i_order_id: integer. id of the order
+        '''
+        key = self.d_agent_orders.pop(i_order_id, None)
+        if key is None:
+            return
+        self.d_agent_keys[key] -= 1
+        if not self.d_agent_keys[key]:
+            del self.d_agent_keys[key]
+
+    def has_agent_orders(self, key=None):
+        '''
+        Check if there are orders of the agents resting in this side
+
+        :param key*: float or integer. Just check the price level of this key
+        '''
+        if key is None:
+            return bool(self.d_agent_orders)
+        return key in self.d_agent_keys
+
     def set_other_side(self, obj_bookside):
         '''
         Set the other side of order book to be used if it is required
@@ -425,30 +795,33 @@ class BookSide(object):
         b_print = False
 
         # update the book information
-        order_aux = Order(d_data)
-        s_status = order_aux['order_status']
+        self.i_seq += 1
+        order_aux = Order(d_data, self.price_key(d_data['order_price']))
+        d_old = self.d_order_map.get(order_aux.order_id, None)
+        # the message returned is a copy, so the caller's dictionary is never
+        # changed by the book or by who keeps the message, as the trade tape
+        d_msg = d_data.copy()
+        d_msg['total_qty_order'] = order_aux.i_qty
+        s_status = order_aux.s_status
         b_sould_update = True
         i_rel_price = 0
         self.d_counts[s_status] += 1
         # treat Bovespa files at the begining f the day
-        if s_status != 'New':
-            try:
-                i_old_id = self.d_order_map[order_aux]['main_id']
-            except KeyError:
-                # is not securing changes, also change part. filled status
-                l_check = ['Canceled', 'Filled']
-                if not self.b_secure_changes:
-                    l_check = ['Canceled', 'Filled', 'Partially Filled']
-                # change order status when it is not found
-                if s_status in l_check:
-                    if b_print:
-                        s_msg = 'BookSide.update(): ID {} not found for ord {}. Agressor: {}'
-                        # import pdb; pdb.set_trace()
-                        print(s_msg.format(order_aux, d_data['order_id'], d_data['agressor_indicator']))
-                    b_sould_update = False
-                    s_status = 'Invalid'
-                elif s_status == 'Replaced':
-                    s_status = 'New'
+        if s_status != 'New' and d_old is None:
+            # is not securing changes, also change part. filled status
+            l_check = ['Canceled', 'Filled']
+            if not self.b_secure_changes:
+                l_check = ['Canceled', 'Filled', 'Partially Filled']
+            # change order status when it is not found
+            if s_status in l_check:
+                if b_print:
+                    s_msg = 'BookSide.update(): ID {} not found for ord {}. Agressor: {}'
+                    # import pdb; pdb.set_trace()
+                    print(s_msg.format(order_aux, d_data['order_id'], d_data['agressor_indicator']))
+                b_sould_update = False
+                s_status = 'Invalid'
+            elif s_status == 'Replaced':
+                s_status = 'New'
         # process
         if s_status == 'New':
             self.d_counts['Total'] += 1
@@ -458,14 +831,13 @@ class BookSide(object):
             b_sould_update = self._new_order(order_aux)
             # i_rel_price = get_relative_price(self.best_queue, order_aux)
         elif s_status != 'Invalid':
-            i_old_id = self.d_order_map[order_aux]['main_id']
-            f_old_pr = self.d_order_map[order_aux]['price']
-            i_old_q = self.d_order_map[order_aux]['qty']
-            # i_rel_price = self.d_order_map[order_aux]['relative_price']
+            i_old_id = d_old.main_id
+            f_old_pr = d_old.key
+            i_old_q = d_old.i_qty
             # hold the last traded price
             if s_status in ['Partially Filled', 'Filled']:
-                if order_aux['agressor_indicator'] == 'Passive':
-                    self.last_price = order_aux['order_price']
+                if d_data['agressor_indicator'] == 'Passive':
+                    self.last_price = order_aux.f_price
             # process message
             if s_status in ['Canceled', 'Expired', 'Filled']:
                 self.d_counts['Total'] += 1
@@ -473,7 +845,8 @@ class BookSide(object):
                     s_msg = 'BookSide.update(): Going to exclude ord_id {} '
                     s_msg += 'of {} '
                     print(s_msg.format(order_aux, d_data['order_id']))
-
+                if not d_msg['order_qty']:
+                    d_msg['order_qty'] = max(0, i_old_q - order_aux.i_qty)
                 b_sould_update = self._canc_expr_filled_order(order_aux,
                                                               i_old_id,
                                                               f_old_pr,
@@ -486,7 +859,9 @@ class BookSide(object):
                                                       f_old_pr,
                                                       i_old_q)
             elif s_status == 'Partially Filled':
-                if (i_old_q - order_aux.d_msg['total_qty_order']) >= 0:
+                if (i_old_q - order_aux.i_qty) >= 0:
+                    if not d_msg['order_qty']:
+                        d_msg['order_qty'] = i_old_q - order_aux.i_qty
                     b_sould_update = self._partially_filled(order_aux,
                                                             i_old_id,
                                                             f_old_pr,
@@ -496,30 +871,16 @@ class BookSide(object):
                     s_status = 'Invalid'
         # remove from order map
         if s_status not in ['New', 'Invalid']:
-            self.d_order_map.pop(order_aux)
-        # debug
-        # if order_aux.d_msg['seq_order_number'] == '7410081465859':
-        # if order_aux.d_msg['secondary_order_id'] == '7411189361089':
-        #     import pprint; pprint.pprint(order_aux.d_msg)
-        #     print()
-        # end debug
-        # update the order map
+            self.d_order_map.pop(order_aux.order_id)
+            self._unindex_agent_order(order_aux.order_id)
+        # update the order map. The order object itself keeps the price key,
+        # quantity and ids needed to process its next messages
         if b_sould_update:
-            f_qty = int(order_aux['total_qty_order'])
-            f_prior_time = d_data['priority_seconds']
-            self.d_order_map[order_aux] = {}
-            self.d_order_map[order_aux]['price'] = d_data['order_price']
-            self.d_order_map[order_aux]['sec_order'] = order_aux.sec_order_id
-            self.d_order_map[order_aux]['qty'] = f_qty
-            self.d_order_map[order_aux]['main_id'] = order_aux.main_id
-            self.d_order_map[order_aux]['priority_seconds'] = f_prior_time
-            # self.d_order_map[order_aux]['relative_price'] = i_rel_price
-            # if s_status in ['New', 'Replaced']:
-            #     self.i_qty_rel += f_qty * 1.
-            #     self.i_cum_rel += i_rel_price * 1. * f_qty
+            self.d_order_map[order_aux.order_id] = order_aux
+            self._index_agent_order(order_aux)
 
         # return that the update was done
-        return order_aux.d_msg
+        return d_msg
 
     def _canc_expr_filled_order(self, order_obj, i_old_id, f_old_pr, i_old_q):
         '''
@@ -527,14 +888,10 @@ class BookSide(object):
 
         :param order_obj: Order Object. The last order in the file
         :param i_old_id: integer. Old id of the order_obj
-        :param f_old_pr: float. Old price of the order_obj
+        :param f_old_pr: float. Old price key of the order_obj
         :param i_old_q: integer. Old qty of the order_obj
         '''
         b_break = False
-        if not order_obj.d_msg['order_qty']:
-            order_obj.d_msg['order_qty'] = i_old_q
-            order_obj.d_msg['order_qty'] -= order_obj.d_msg['total_qty_order']
-            order_obj.d_msg['order_qty'] = max(0, order_obj.d_msg['order_qty'])
         this_price = self.price_tree.get(f_old_pr)
         if this_price.delete(i_old_id, i_old_q):
             self.price_tree.remove(f_old_pr)
@@ -549,7 +906,7 @@ class BookSide(object):
 
         :param order_obj: Order Object. The last order in the file
         :param i_old_id: integer. Old id of the order_obj
-        :param f_old_pr: float. Old price of the order_obj
+        :param f_old_pr: float. Old price key of the order_obj
         :param i_old_q: integer. Old qty of the order_obj
         '''
         # remove from the old price
@@ -557,12 +914,7 @@ class BookSide(object):
         if this_price.delete(i_old_id, i_old_q):
             self.price_tree.remove(f_old_pr)
         # insert in the new price
-        f_price = order_obj['order_price']
-        if not self.price_tree.get(f_price):
-            self.price_tree.insert(f_price, PriceLevel(f_price))
-        # insert the order in the due price
-        this_price = self.price_tree.get(f_price)
-        this_price.add(order_obj)
+        self._add_to_level(order_obj)
         return True
 
     def _partially_filled(self, order_obj, i_old_id, f_old_pr, i_old_q):
@@ -571,7 +923,7 @@ class BookSide(object):
 
         :param order_obj: Order Object. The last order in the file
         :param i_old_id: integer. Old id of the order_obj
-        :param f_old_pr: float. Old price of the order_obj
+        :param f_old_pr: float. Old price key of the order_obj
         :param i_old_q: integer. Old qty of the order_obj
         '''
         # delete old price, if it is needed
@@ -579,18 +931,9 @@ class BookSide(object):
         if this_price.delete(i_old_id, i_old_q):
             self.price_tree.remove(f_old_pr)
 
-        # correct order qty, if appliable
-        if not order_obj.d_msg['order_qty']:
-            order_obj.d_msg['order_qty'] = i_old_q
-            order_obj.d_msg['order_qty'] -= order_obj.d_msg['total_qty_order']
-
         # add/modify order
         # insert in the new price
-        f_price = order_obj['order_price']
-        if not self.price_tree.get(f_price):
-            self.price_tree.insert(f_price, PriceLevel(f_price))
-        this_price = self.price_tree.get(f_price)
-        this_price.add(order_obj)
+        self._add_to_level(order_obj)
         return True
 
     def _new_order(self, order_obj):
@@ -600,25 +943,42 @@ class BookSide(object):
         :param order_obj: Order Object. The last order in the file
         '''
         # if it was already in the order map
-        if order_obj in self.d_order_map:
-            i_old_sec_id = self.d_order_map[order_obj]['main_id']
-            f_old_price = self.d_order_map[order_obj]['price']
-            i_old_qty = self.d_order_map[order_obj]['qty']
+        old_order = self.d_order_map.get(order_obj.order_id, None)
+        if old_order is not None:
+            i_old_sec_id = old_order.main_id
+            f_old_price = old_order.key
+            i_old_qty = old_order.i_qty
             this_price = self.price_tree.get(f_old_price)
             # remove from order map
-            self.d_order_map.pop(order_obj)
+            self.d_order_map.pop(order_obj.order_id)
+            self._unindex_agent_order(order_obj.order_id)
             if this_price.delete(i_old_sec_id, i_old_qty):
                 self.price_tree.remove(f_old_price)
-        # insert a empty price level if it is needed
-        f_price = order_obj['order_price']
-        if not self.price_tree.get(f_price):
-            self.price_tree.insert(f_price, PriceLevel(f_price))
-        # add the order
-        this_price = self.price_tree.get(f_price)
-        this_price.add(order_obj)
+        # insert a empty price level if it is needed and add the order
+        self._add_to_level(order_obj)
 
         return True
 
+    def treat_zero_price(self, d_aux):
+        '''
+        Return the row passed ready to be used to update the book or None if
+        it should be ignored. Rows with zero price are ignored, except when
+        replacing an order already in the book, that is then canceled
+
+        :param d_aux: dict. row from the file
+        '''
+        if d_aux['order_price'] >= 1e-6:
+            return d_aux
+        if d_aux['order_status'] == 'Replaced':
+            i_id = int(d_aux['seq_order_number'])
+            d_this_ = self.d_order_map.get(i_id, None)
+            if not isinstance(d_this_, type(None)):
+                d_aux['order_status'] = 'Canceled'
+                d_aux['execution_type'] = 'Update'
+                d_aux['order_price'] = self.key_price(d_this_.key)
+                return d_aux
+        return None
+
     def get_n_top_prices(self, n):
         '''
         Return a dataframe with the N top price levels
@@ -661,7 +1021,7 @@ class BookSide(object):
                     if not isinstance(d_this_, type(None)):
                         d_aux['order_status'] = 'Canceled'
                         d_aux['execution_type'] = 'Update'
-                        d_aux['order_price'] = d_this_['price']
+                        d_aux['order_price'] = self.key_price(d_this_.key)
                         # import pdb; pdb.set_trace()
                         return d_aux, self.parser.last_identification
                 while True:
@@ -709,7 +1069,7 @@ class BidSide(BookSide):
         '''
         Initialize a BidSide object. Save all parameters as attributes
 
-        :param fr_data: ZipExtFile object. data to read
+        :param fr_data: ZipExtFile or ArrayBookReader object. data to read
         :param i_member*: integer. Member number to be used as a filter
         :param b_secure_changes*: boolean.
         '''
@@ -718,7 +1078,8 @@ class BidSide(BookSide):
 
     def get_prices_by_priority(self, n, b_reverse=False):
         '''
-        Return the item s in pricetree sorted by priority in the order book
+        Return the item s in pricetree sorted by priority in the order book.
+        The keys are the ones used by the price tree
 
         :param n: integer. Number of price levels desired
         '''
@@ -733,7 +1094,7 @@ class BidSide(BookSide):
         :param n: integer. Number of price levels desired
         :param b_return_dataframe: boolean. If should return a dataframe
         '''
-        t_rtn = self.price_tree.nlargest(n)
+        t_rtn = self._as_prices(self.price_tree.nlargest(n))
         if not b_return_dataframe:
             return t_rtn
         df_rtn = pd.DataFrame(t_rtn)
@@ -747,7 +1108,7 @@ class BidSide(BookSide):
         :param n: integer. Number of price levels desired
         :param b_return_dataframe: boolean. If should return a dataframe
         '''
-        t_rtn = self.price_tree.nsmallest(n)
+        t_rtn = self._as_prices(self.price_tree.nsmallest(n))
         if not b_return_dataframe:
             return t_rtn
         df_rtn = pd.DataFrame(t_rtn)
@@ -763,7 +1124,7 @@ class AskSide(BookSide):
         '''
         Initialize a BidSide object. Save all parameters as attributes
 
-        :param fr_data: ZipExtFile object. data to read
+        :param fr_data: ZipExtFile or ArrayBookReader object. data to read
         :param i_member*: integer. Member number to be used as a filter
         :param b_secure_changes*: boolean.
         '''
@@ -772,7 +1133,8 @@ class AskSide(BookSide):
 
     def get_prices_by_priority(self, n, b_reverse=False):
         '''
-        Return the item s in pricetree sorted by priority in the order book
+        Return the item s in pricetree sorted by priority in the order book.
+        The keys are the ones used by the price tree
 
         :param n: integer. Number of price levels desired
         '''
@@ -787,7 +1149,7 @@ class AskSide(BookSide):
         :param n: integer. Number of price levels desired
         :param b_return_dataframe: boolean. If should return a dataframe
         '''
-        t_rtn = self.price_tree.nsmallest(n)
+        t_rtn = self._as_prices(self.price_tree.nsmallest(n))
         if not b_return_dataframe:
             return t_rtn
         df_rtn = pd.DataFrame(t_rtn)
@@ -801,7 +1163,7 @@ class AskSide(BookSide):
         :param n: integer. Number of price levels desired
         :param b_return_dataframe: boolean. If should return a dataframe
         '''
-        t_rtn = self.price_tree.nlargest(n)
+        t_rtn = self._as_prices(self.price_tree.nlargest(n))
         if not b_return_dataframe:
             return t_rtn
         df_rtn = pd.DataFrame(t_rtn)
@@ -817,34 +1179,41 @@ class NeutrinoSide(object):
     def __init__(self, book_side):
         self.this_side = book_side
         self.n = 0
+        self._i_seq = None
+        self._l_orders = []
+        # cache of the lists returned by neutrino.byPrice
+        self._t_by_price_seq = None
+        self._d_by_price = {}
+
+    def _get_orders(self):
+        '''
+        Return a list of all orders in the side, sorted by priority. The list
+        is rebuilt just when the side was updated since the last call
+        '''
+        if self._i_seq != self.this_side.i_seq:
+            l_orders = []
+            i_levels = self.this_side.price_tree.count
+            for _, obj_aux in self.this_side.get_prices_by_priority(i_levels):
+                l_orders.extend(obj_aux.order_tree.values())
+            self._l_orders = l_orders
+            self._i_seq = self.this_side.i_seq
+        return self._l_orders
 
     def __getitem__(self, key):
-        i_current = -1
-        b_c = key < 0
-        # i_current += (b_c)*1
-        for _, obj_aux in self.this_side.get_prices_by_priority(1000, b_c):
-            i_len = len(obj_aux.order_tree)
-            if (i_current + i_len + 1*b_c) >= abs(key):
-                i_index = key - i_current
-                if key < 0:
-                    i_index = i_len + key + 1
-
-                i_priority_id = list(obj_aux.order_tree)[i_index-1]
-                sim_order = obj_aux.order_tree.get(i_priority_id)
-
-                obj_data = BookData(sim_order.d_msg['order_price'],
-                                    sim_order.d_msg['total_qty_order'],
-                                    sim_order.d_msg['member'],
-                                    sim_order.d_msg['secondary_order_id'],
-                                    int(sim_order.d_msg['secondary_order_id']),
-                                    int(sim_order.main_id))
-                return obj_data
-            i_current += i_len
-
-        raise IndexNotFoundException('Index is greater than the book lenght')
+        l_orders = self._get_orders()
+        if not -len(l_orders) <= key < len(l_orders):
+            raise IndexNotFoundException('Index is greater than the book lenght')
+        sim_order = l_orders[key]
+        obj_data = BookData(sim_order.f_price,
+                            sim_order.i_qty,
+                            sim_order.i_member,
+                            sim_order.s_sec_id,
+                            int(sim_order.s_sec_id),
+                            int(sim_order.main_id))
+        return obj_data
 
     def __len__(self):
-        return (len(self.this_side))
+        return len(self._get_orders())
 
     def __iter__(self):
         self.n = 0
@@ -867,18 +1236,31 @@ class LimitOrderBook(object):
     A limit Order book representation. Keep the book sides synchronized
     '''
 
-    def __init__(self, s_fbid, s_fask, s_instrument, b_secure_changes=False):
+    def __init__(self, s_fbid, s_fask, s_instrument, b_secure_changes=False,
+                 b_use_cache=False, b_bulk_parse=False, b_int_prices=False,
+                 b_price_ladder=False, obj_perf=None):
         '''
         Initialize a LimitOrderBook object. Save all parameters as attributes
 
         :param s_instrument: string. name of the instrument of book
-        :param s_fbid: string. Path to the bid file
-        :param s_fask: string. Path to the ask file
+        :param s_fbid: string. Path to the bid file. None when the rows come
+            from an event log, through process_event()
+        :param s_fask: string. Path to the ask file. None as s_fbid
         :param b_secure_changes*: boolean. If should break with corrections
-        '''
+        :param b_use_cache*: boolean. Read from the cache files, if available
+        :param b_bulk_parse*: boolean. Parse the zipped files in chunks
+        :param b_int_prices*: boolean. Key the price trees by integer ticks
+        :param b_price_ladder*: boolean. Use a PriceLadder instead of trees
+            to keep the price levels. Implies b_int_prices
+        :param obj_perf*: PerfCounters object. Counters of the environment.
+            Nothing is counted if not set
+        '''
+        self.obj_perf = obj_perf or NO_PERF
         # open files
-        self.fr_bid, self.archive_bid = open_file(s_fbid)
-        self.fr_ask, self.archive_ask = open_file(s_fask)
+        self.fr_bid, self.archive_bid = open_data(
+            s_fbid, 'BID', s_instrument, b_use_cache, b_bulk_parse)
+        self.fr_ask, self.archive_ask = open_data(
+            s_fask, 'ASK', s_instrument, b_use_cache, b_bulk_parse)
         self.s_fbid = s_fbid
         self.s_fask = s_fask
         # save opened data files
@@ -889,11 +1271,19 @@ class LimitOrderBook(object):
         self.neutrino_bid = NeutrinoSide(self.book_bid)
         self.neutrino_ask = NeutrinoSide(self.book_ask)
         self.s_instrument = s_instrument
+        if b_int_prices or b_price_ladder:
+            f_tick = self.security().priceIncrement
+            self.book_bid.set_price_increment(f_tick)
+            self.book_ask.set_price_increment(f_tick)
+        if b_price_ladder:
+            self.book_bid.set_price_ladder()
+            self.book_ask.set_price_ladder()
         self.f_time = 0
         self.s_time = ''
         self.stop_iteration = False
         self.stop_time = None
         self.last_stop_time = None
+        self.f_next_time = None  # time of the row that reached the stop time
         self.i_last_order_id = 0
         # initiate control variables
         self.i_sec_ask = 99999999999999999999999
@@ -1013,6 +1403,101 @@ class LimitOrderBook(object):
             self.b_should_unload = False
             self.last_trades.unload_buffer()
 
+    def process_event(self, d_data):
+        '''
+        Update the book using a row already in the replay order, as the ones
+        from an event log. Return a list of relevant updates to be used by
+        external agents
+
+        :param d_data: dictionary. row from the event log
+        '''
+        this_side = self._update_map[d_data['order_side']]
+        d_data = this_side.treat_zero_price(d_data)
+        if d_data is None:
+            return []
+        l_msg = self.update(d_data)
+        self.last_priority_id = d_data['priority_indicator']
+        self.f_time = d_data['priority_seconds']
+        self.s_time = '{} {}'.format(d_data['session_date'],
+                                     d_data['priority_time'])
+        # keep the best prices in a variable
+        self.i_my_order_id += 1
+        if self.best_bid and self.best_ask:
+            self.book_bid.set_last_best_queue(self.best_bid)
+            self.book_ask.set_last_best_queue(self.best_ask)
+        return l_msg
+
+    def set_rows_read(self, i_bid, i_ask):
+        '''
+        Set the number of rows read from each side of the book. Used when the
+        rows are not read by the book itself, as when replaying an event log
+
+        :param i_bid: integer. Rows read from the bid side
+        :param i_ask: integer. Rows read from the ask side
+        '''
+        self.book_bid._i_idx = i_bid
+        self.book_ask._i_idx = i_ask
+
+    def get_state(self):
+        '''
+        Return a dictionary with the control variables of the book needed to
+        resume the replay from a snapshot. The orders are not included
+        '''
+        return {'f_time': self.f_time,
+                's_time': self.s_time,
+                'last_priority_id': self.last_priority_id,
+                'i_my_order_id': self.i_my_order_id,
+                'i_last_order_id': self.i_last_order_id,
+                'i_count_updates': self.i_count_updates,
+                'i_count_crossed_books': self.i_count_crossed_books,
+                'f_time_crossed_books': self.f_time_crossed_books,
+                'i_count_correction_by_trades':
+                    self.i_count_correction_by_trades,
+                'last_price_bid': self.book_bid.last_price,
+                'last_price_ask': self.book_ask.last_price,
+                'd_bid': self.d_bid,
+                'd_ask': self.d_ask,
+                'i_bid_reads': self.book_bid._i_idx,
+                'i_ask_reads': self.book_ask._i_idx}
+
+    def restore_state(self, d_state, l_orders):
+        '''
+        Restore the book from a snapshot created by get_state, inserting the
+        resting orders passed. Should be called right after creating the book
+
+        :param d_state: dictionary. control variables, as from get_state
+        :param l_orders: list. dictionaries with the orders of both sides
+        '''
+        for d_order in l_orders:
+            self._update_map[d_order['order_side']].restore_order(d_order)
+        self.f_time = d_state['f_time']
+        self.s_time = d_state['s_time']
+        self.last_priority_id = d_state['last_priority_id']
+        self.i_my_order_id = d_state['i_my_order_id']
+        self.i_last_order_id = d_state['i_last_order_id']
+        self.i_count_updates = d_state['i_count_updates']
+        self.i_count_crossed_books = d_state['i_count_crossed_books']
+        self.f_time_crossed_books = d_state['f_time_crossed_books']
+        self.i_count_correction_by_trades = d_state[
+            'i_count_correction_by_trades']
+        self.book_bid.last_price = d_state['last_price_bid']
+        self.book_ask.last_price = d_state['last_price_ask']
+        self.d_bid = d_state['d_bid']
+        self.d_ask = d_state['d_ask']
+        self.set_rows_read(d_state.get('i_bid_reads', 0),
+                           d_state.get('i_ask_reads', 0))
+        # update the best prices, as done by update()
+        if self.book_bid.price_tree.count and self.book_ask.price_tree.count:
+            best_bid = self.book_bid.price_tree.max_item()
+            best_ask = self.book_ask.price_tree.min_item()
+            self.obj_best_bid = best_bid[1]
+            self.best_bid = (best_bid[1].f_price, best_bid[1].i_qty)
+            self.obj_best_ask = best_ask[1]
+            self.best_ask = (best_ask[1].f_price, best_ask[1].i_qty)
+            self.book_bid.set_last_best_queue(self.best_bid)
+            self.book_ask.set_last_best_queue(self.best_ask)
+        self._has_changed = True
+
     def get_n_top_prices(self, n, b_return_dataframe=False):
         '''
         Return a dataframe with the n top prices of the current order book
@@ -1039,13 +1524,13 @@ class LimitOrderBook(object):
         :param s_side: string. The side of the book
         '''
         if s_side == 'BID':
-            obj_aux = self.book_bid.get_n_top_prices(1, False)
-            if obj_aux:
-                return obj_aux[0][0]
+            na_price = self.book_bid.get_depth(1)[0]
+            if len(na_price):
+                return float(na_price[0])
         elif s_side == 'ASK':
-            obj_aux = self.book_ask.get_n_top_prices(1, False)
-            if obj_aux:
-                return obj_aux[0][0]
+            na_price = self.book_ask.get_depth(1)[0]
+            if len(na_price):
+                return float(na_price[0])
 
     def get_orders_by_price(self, s_side, f_price=None, b_rtn_obj=False):
         '''
@@ -1061,11 +1546,13 @@ class LimitOrderBook(object):
         if s_side == 'BID':
             if not f_price:
                 f_price = self.get_best_price(s_side)
-            obj_price = self.book_bid.price_tree.get(f_price)
+            obj_price = self.book_bid.price_tree.get(
+                self.book_bid.price_key(f_price))
         elif s_side == 'ASK':
             if not f_price:
                 f_price = self.get_best_price(s_side)
-            obj_price = self.book_ask.price_tree.get(f_price)
+            obj_price = self.book_ask.price_tree.get(
+                self.book_ask.price_key(f_price))
         # return the order tree
         if obj_price:
             if b_rtn_obj:
@@ -1105,17 +1592,14 @@ class LimitOrderBook(object):
         Set a stop time to iterator. After is is reached, the time is reset to
         None
 
-        :param s_stop_time: string. Time in seconds to stop the iteration in
-            the format HH:MM:SS
+        :param s_stop_time: string or float. Time to stop the iteration in the
+            format HH:MM:SS.mmm or in seconds
         '''
         # set stop time
-        f_stop_time = float(s_stop_time[0:2])*60**2
-        f_stop_time += float(s_stop_time[3:5])*60
-        f_stop_time += float(s_stop_time[6:8])
-        if len(s_stop_time) > 8:
-            f_stop_time += (float(s_stop_time[9:14])/1000.)
+        f_stop_time = get_stop_seconds(s_stop_time)
         self.last_stop_time = f_stop_time
         self.stop_time = f_stop_time
+        self.f_next_time = None
         # reset countings to be used in summary
         self.book_ask.reset_counts()
         self.book_bid.reset_counts()
@@ -1125,10 +1609,13 @@ class LimitOrderBook(object):
         Update the current state of the book depending on the secondary id of
         each side.
         '''
+        f_perf = self.obj_perf.start('readline', self.s_instrument)
+        i_rows = 0
         # read bid
         if self.i_read_bid and self.i_get_new_bid:
             try:
                 self.d_bid, self.last_ident_bid = self.book_bid.next()
+                i_rows += 1
                 if self.last_ident_bid == 'MSG':
                     if self.d_bid['agressor_indicator'] != 'Agressor':  # 20190820 -
                         if PYVERSION == '2':
@@ -1147,6 +1634,7 @@ class LimitOrderBook(object):
         if self.i_read_ask and self.i_get_new_ask:
             try:
                 self.d_ask, self.last_ident_ask = self.book_ask.next()
+                i_rows += 1
                 if self.last_ident_ask == 'MSG':
                     if self.d_ask['agressor_indicator'] != 'Agressor':
                         if PYVERSION == '2':
@@ -1161,6 +1649,8 @@ class LimitOrderBook(object):
                             self.i_seca_ptime = self.d_ask['priority_seconds']
             except StopIteration:
                 self.i_read_ask = False
+        self.obj_perf.stop('readline', self.s_instrument, f_perf)
+        self.obj_perf.count('read', self.s_instrument, i_rows)
         # update the book
         l_msg = []
         if self.last_ident_bid == 'MSG' and self.last_ident_ask == 'MSG':
@@ -1176,6 +1666,7 @@ class LimitOrderBook(object):
                 if self.stop_time:
                     if self.d_ask['is_today']:
                         if self.d_ask['priority_seconds'] > self.stop_time:
+                            self.f_next_time = self.d_ask['priority_seconds']
                             self.stop_iteration = True
                             return False
                 # update the book
@@ -1197,6 +1688,7 @@ class LimitOrderBook(object):
                 if self.stop_time:
                     if self.d_bid['is_today']:
                         if self.d_bid['priority_seconds'] > self.stop_time:
+                            self.f_next_time = self.d_bid['priority_seconds']
                             self.stop_iteration = True
                             return False
                 # update the book
@@ -1218,11 +1710,11 @@ class LimitOrderBook(object):
         if i_bid_count > 0 and i_ask_count > 0:
             best_bid = self.book_bid.price_tree.max_item()
             self.obj_best_bid = best_bid[1]
-            self.best_bid = (best_bid[0], best_bid[1].i_qty)
+            self.best_bid = (best_bid[1].f_price, best_bid[1].i_qty)
             self.book_bid.set_last_best_queue(self.best_bid)
             best_ask = self.book_ask.price_tree.min_item()
             self.obj_best_ask = best_ask[1]
-            self.best_ask = (best_ask[0], best_ask[1].i_qty)
+            self.best_ask = (best_ask[1].f_price, best_ask[1].i_qty)
             self.book_ask.set_last_best_queue(self.best_ask)
         # return the messages processed
         return l_msg
@@ -1241,10 +1733,12 @@ class LimitOrderBook(object):
         #     print('\nLimitOrderBook.update(): Before updating')
         #     print(self.get_n_top_prices(5, True))
         if d_data['order_side'] == 'Buy Order':
+            f_perf = self.obj_perf.start('translator', self.s_instrument)
             l_msg = translator.translate_row(self.i_last_order_id,
                                              d_data,
                                              self,
                                              s_side='Buy Order')
+            self.obj_perf.stop('translator', self.s_instrument, f_perf)
             if len(l_msg):
                 self.i_count_updates += 1
                 self._has_changed = True
@@ -1260,17 +1754,21 @@ class LimitOrderBook(object):
                 if d_aux['agent_id'] != 10:
                     l_msg_to_env.append(d_aux)
                 # self.book_bid.update(d_aux)
+                f_perf = self.obj_perf.start('book_update', self.s_instrument)
                 d_aux2 = self._update_map[d_aux['order_side']].update(d_aux)
+                self.obj_perf.stop('book_update', self.s_instrument, f_perf)
                 # track trades
                 if d_aux['order_status'] in ['Partially Filled', 'Filled']:
                     if d_aux['agressor_indicator'] == 'Passive':
                         self.last_trades.append(d_aux2)
                         self.last_trades_aux.append(d_aux2)
         elif d_data['order_side'] == 'Sell Order':
+            f_perf = self.obj_perf.start('translator', self.s_instrument)
             l_msg = translator.translate_row(self.i_last_order_id,
                                              d_data,
                                              self,
                                              s_side='Sell Order')
+            self.obj_perf.stop('translator', self.s_instrument, f_perf)
             if len(l_msg):
                 self.i_count_updates += 1
                 self._has_changed = True
@@ -1286,7 +1784,9 @@ class LimitOrderBook(object):
                 if d_aux['agent_id'] != 10:
                     l_msg_to_env.append(d_aux)
                 # self.book_ask.update(d_aux)
+                f_perf = self.obj_perf.start('book_update', self.s_instrument)
                 d_aux2 = self._update_map[d_aux['order_side']].update(d_aux)
+                self.obj_perf.stop('book_update', self.s_instrument, f_perf)
                 # track trades
                 if d_aux['order_status'] in ['Partially Filled', 'Filled']:
                     if d_aux['agressor_indicator'] == 'Passive':
@@ -1298,14 +1798,20 @@ class LimitOrderBook(object):
         # TODO: loop until the book is OK
         # check consistency
         # NOTE: COMMENT THAT TO STOP CORRECTIONS
+        f_perf = self.obj_perf.start('correct_books', self.s_instrument)
         b_correct, d_correct = translator.correct_books(self)
+        self.obj_perf.stop('correct_books', self.s_instrument, f_perf)
         if b_correct:
             l_aux = [self.book_bid, self.book_ask]
             for s_side, func_update in zip(['BID', 'ASK'], l_aux):
                 # correct each side
                 if d_correct[s_side]:
                     for d_aux in d_correct[s_side]:
+                        f_perf = self.obj_perf.start('book_update',
+                                                     self.s_instrument)
                         d_aux2 = func_update.update(d_aux)
+                        self.obj_perf.stop('book_update', self.s_instrument,
+                                           f_perf)
                         if d_aux['agent_id'] != 10:
                             l_msg_to_env.append(d_aux)
                         # track trades
@@ -1325,9 +1831,9 @@ class LimitOrderBook(object):
             best_ask = self.book_ask.price_tree.min_item()
             # update attributes
             self.obj_best_bid = best_bid[1]
-            self.best_bid = (best_bid[0], best_bid[1].i_qty)
+            self.best_bid = (best_bid[1].f_price, best_bid[1].i_qty)
             self.obj_best_ask = best_ask[1]
-            self.best_ask = (best_ask[0], best_ask[1].i_qty)
+            self.best_ask = (best_ask[1].f_price, best_ask[1].i_qty)
         # return the modifications
         # if len(l_msg_to_env) > 0:
         #     print('\nLimitOrderBook.update(): After updating')
@@ -1360,10 +1866,12 @@ class LimitOrderBook(object):
         #     pprint.pprint(l_msg)
         # check if should stop iteration
         if not self.i_read_bid and not self.i_read_ask:
+            self.f_next_time = float('inf')
             # close files
             for obj in [self.fr_bid, self.archive_bid, self.fr_ask,
                         self.archive_ask]:
-                obj.close()
+                if obj is not None:
+                    obj.close()
             # stop iteration
             raise StopIteration
         elif self.stop_iteration:
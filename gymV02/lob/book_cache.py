@@ -0,0 +1,415 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Convert the BID/ASK files from BmfBovespa to columnar NumPy files that can be
+memory-mapped and replayed without decompressing and parsing every row again.
+Also implement the readers used by the BookSide to consume rows parsed in bulk
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import abc
+import glob
+import itertools
+import os
+import zipfile
+import numpy as np
+from . import parser_data
+from .parser_data import (SIDES, EXECUTION_TYPES, ORDER_STATUS, AGGRESSOR,
+                          BOOK_DTYPE)
+
+
+'''
+Begin help functions
+'''
+
+# base class for the abstract classes, compatible with python 2 and 3
+ABC = abc.ABCMeta('ABC', (object,), {})
+
+# fields of the dictionaries returned by the ArrayBookReader, in order
+ROW_KEYS = ('session_date', 'instrument_symbol', 'order_side',
+            'seq_order_number', 'secondary_order_id', 'execution_type',
+            'priority_time', 'priority_seconds', 'priority_indicator',
+            'order_price', 'total_qty_order', 'traded_qty_order',
+            'order_date', 'order_datetime_entry', 'order_status',
+            'agressor_indicator', 'member', 'idx', 'is_today', 'action',
+            'agent_id', 'order_id', 'org_total_qty_order', 'order_qty')
+
+_SIDES = np.array(SIDES, dtype=object)
+_EXECUTION_TYPES = np.array(EXECUTION_TYPES, dtype=object)
+_ORDER_STATUS = np.array(ORDER_STATUS, dtype=object)
+_AGGRESSOR = np.array(AGGRESSOR, dtype=object)
+
+
+class CacheNotFoundException(Exception):
+    """
+    CacheNotFoundException is raised by the BookCacheReader class to indicate
+    that the cache file related to the zip file passed does not exist
+    """
+    pass
+
+
+def get_cache_path(s_fname):
+    '''
+    Return the path to the cache file related to the zipped file passed
+
+    :param s_fname: string. path to the zipped file
+    '''
+    return os.path.splitext(s_fname)[0] + '.npy'
+
+
+def has_valid_dtype(s_fname, dtype):
+    '''
+    Check if the NumPy file passed holds an array of the dtype passed. Just
+    the header of the file is read
+
+    :param s_fname: string. path to the NumPy file
+    :param dtype: numpy dtype. dtype expected
+    '''
+    try:
+        return np.load(s_fname, mmap_mode='r').dtype == dtype
+    except (IOError, ValueError):
+        return False
+
+
+def has_cache(s_fname):
+    '''
+    Check if there is a cache file newer than the zipped file passed, created
+    with the current layout of the BOOK_DTYPE
+
+    :param s_fname: string. path to the zipped file
+    '''
+    s_cache = get_cache_path(s_fname)
+    if not os.path.isfile(s_cache):
+        return False
+    if os.path.isfile(s_fname):
+        if os.path.getmtime(s_cache) < os.path.getmtime(s_fname):
+            return False
+    return has_valid_dtype(s_cache, BOOK_DTYPE)
+
+
+def int_to_date(i_date):
+    '''
+    Convert a date in the format YYYYMMDD to a string YYYY-MM-DD
+
+    :param i_date: integer. date to convert
+    '''
+    return '{:04d}-{:02d}-{:02d}'.format(
+        i_date // 10000, (i_date // 100) % 100, i_date % 100)
+
+
+'''
+End help functions
+'''
+
+
+def build_cache(s_fname, s_side=None, b_overwrite=False):
+    '''
+    Parse all the rows of the zipped BID/ASK file passed and save them as a
+    NumPy structured array next to it. Return the path to the file created
+
+    :param s_fname: string. Path to the zipped file
+    :param s_side*: string. BID or ASK. Inferred from the name if not passed
+    :param b_overwrite*: boolean. If should rebuild a cache already created
+    '''
+    s_cache = get_cache_path(s_fname)
+    if not b_overwrite and has_cache(s_fname):
+        return s_cache
+    if not s_side:
+        s_side = 'ASK' if '_ASK_' in os.path.basename(s_fname) else 'BID'
+    na_data = parser_data.BookChunkParser(s_side).parse_file(s_fname)
+    # write to a temporary file first, so readers never see a partial file
+    s_tmp = s_cache + '.tmp'
+    with open(s_tmp, 'wb') as fw:
+        np.save(fw, na_data)
+    os.replace(s_tmp, s_cache)
+    return s_cache
+
+
+def build_cache_folder(s_datafolder, s_init, s_end, l_instr=None,
+                       b_overwrite=False):
+    '''
+    Create the cache files of all BID/ASK files between the dates passed.
+    Return a list with the paths to the cache files
+
+    :param s_datafolder: string. The folder to look for the files to be used
+    :param s_init: string. The initial file date (format YYYYMMDD)
+    :param s_end: string. The final file date (format YYYYMMDD)
+    :param l_instr*: list. Instruments to convert. Convert all if not passed
+    :param b_overwrite*: boolean. If should rebuild caches already created
+    '''
+    s_datafolder = s_datafolder.replace('\\', '/')
+    if s_datafolder[-1] != '/':
+        s_datafolder += '/'
+    l_rtn = []
+    for s_folder in sorted(glob.glob(s_datafolder + '20*')):
+        s_folder = s_folder.replace('\\', '/')
+        s_date = s_folder.split('/')[-1]
+        if not int(s_init) <= int(s_date) <= int(s_end):
+            continue
+        for s_side in ['BID', 'ASK']:
+            s_pattern = '{}/{}_{}_*_new.zip'.format(s_folder, s_date, s_side)
+            for s_fname in sorted(glob.glob(s_pattern)):
+                s_instr = s_fname.split('_')[-2]
+                if l_instr and s_instr not in l_instr:
+                    continue
+                l_rtn.append(build_cache(s_fname, s_side, b_overwrite))
+    return l_rtn
+
+
+class CacheLineParser(object):
+    '''
+    Stand-in for the LineParser used by the BookSide when the rows come from
+    an ArrayBookReader. The rows are already parsed, so just pass them through
+    '''
+    def __init__(self, s_file_type):
+        '''
+        Initialize a CacheLineParser object
+
+        :param s_file_type: string. BID or ASK
+        '''
+        self.s_file_type = s_file_type
+        self.last_identification = 'MSG'
+
+    def __call__(self, d_row):
+        '''
+        Return the row passed, already parsed by the BookCacheReader
+
+        :param d_row: dict. a row from the ArrayBookReader
+        '''
+        return d_row
+
+
+class ArrayBookReader(ABC):
+    '''
+    Mimic the readline interface of the ZipExtFile used by the BookSide over
+    rows stored as BOOK_DTYPE arrays. Dictionaries equal to the ones produced
+    by the LineParser are built a chunk at a time, converting each column of
+    the chunk at once
+    '''
+    def __init__(self, s_instrument, i_chunk=4096):
+        '''
+        Initialize an ArrayBookReader object
+
+        :param s_instrument: string. name of the instrument of book
+        :param i_chunk*: integer. Number of rows converted at once
+        '''
+        self.s_instrument = s_instrument
+        self.i_chunk = i_chunk
+        self._l_chunk = []
+        self._i_chunk_idx = 0
+        self._d_dates = {}
+
+    def _get_date(self, i_date):
+        '''
+        Return the string representation of the date, caching it
+
+        :param i_date: integer. date in the format YYYYMMDD
+        '''
+        s_date = self._d_dates.get(i_date, None)
+        if s_date is None:
+            s_date = int_to_date(i_date)
+            self._d_dates[i_date] = s_date
+        return s_date
+
+    def _dates_to_list(self, na_date):
+        '''
+        Return a list with the string representation of the dates passed,
+        converting each distinct date just once
+
+        :param na_date: numpy array. dates in the format YYYYMMDD
+        '''
+        na_unique, na_inverse = np.unique(na_date, return_inverse=True)
+        na_str = np.array([self._get_date(i_date) for i_date in
+                           na_unique.tolist()], dtype=object)
+        return na_str[na_inverse].tolist()
+
+    @abc.abstractmethod
+    def _next_array(self):
+        '''
+        Return a structured array with the next rows to be read. Return an
+        empty array if there are no rows left
+        '''
+        pass
+
+    def _to_tuples(self, na_rows):
+        '''
+        Return the rows of the array passed as tuples
+
+        :param na_rows: numpy array. rows of a BOOK_DTYPE array
+        '''
+        return na_rows.tolist()
+
+    def _to_dicts(self, na_rows, instrument=None):
+        '''
+        Return a list with the dictionaries related to the rows of the array
+        passed
+
+        :param na_rows: numpy array. rows of a BOOK_DTYPE array
+        :param instrument*: list. name of the instrument of each row. Use the
+            instrument of the reader if not passed
+        '''
+        if instrument is None:
+            instrument = itertools.repeat(self.s_instrument)
+        na_session = na_rows['session_date']
+        na_order_date = na_rows['order_date']
+        na_org_qty = na_rows['org_total_qty_order']
+        na_traded_qty = na_rows['traded_qty_order']
+        na_prior = na_rows['priority_indicator']
+        l_cols = [self._dates_to_list(na_session),
+                  instrument,
+                  _SIDES[na_rows['order_side']].tolist(),
+                  np.char.decode(na_rows['seq_order_number']).tolist(),
+                  np.char.decode(na_rows['secondary_order_id']).tolist(),
+                  _EXECUTION_TYPES[na_rows['execution_type']].tolist(),
+                  np.char.decode(na_rows['priority_time']).tolist(),
+                  na_rows['priority_seconds'].tolist(),
+                  na_prior.tolist(),
+                  na_rows['order_price'].tolist(),
+                  (na_org_qty - na_traded_qty).tolist(),
+                  na_traded_qty.tolist(),
+                  self._dates_to_list(na_order_date),
+                  np.char.decode(na_rows['order_datetime_entry']).tolist(),
+                  _ORDER_STATUS[na_rows['order_status']].tolist(),
+                  _AGGRESSOR[na_rows['agressor_indicator']].tolist(),
+                  na_rows['member'].tolist(),
+                  np.char.decode(na_rows['idx']).tolist(),
+                  (na_order_date == na_session).tolist(),
+                  itertools.repeat('history'),
+                  itertools.repeat(10),
+                  na_prior.tolist(),
+                  na_org_qty.tolist(),
+                  itertools.repeat(None)]
+        return [dict(zip(ROW_KEYS, t_row)) for t_row in zip(*l_cols)]
+
+    def _next_item(self, func_convert):
+        '''
+        Return the next row converted by the function passed or None if there
+        are no rows left
+
+        :param func_convert: function. Convert a chunk of rows to a list
+        '''
+        if self._i_chunk_idx >= len(self._l_chunk):
+            na_rows = self._next_array()
+            self._i_chunk_idx = 0
+            if not len(na_rows):
+                self._l_chunk = []
+                return None
+            self._l_chunk = func_convert(na_rows)
+        row = self._l_chunk[self._i_chunk_idx]
+        self._i_chunk_idx += 1
+        return row
+
+    def _next_tuple(self):
+        '''
+        Return the next row as a tuple or None if there are no rows left
+        '''
+        return self._next_item(self._to_tuples)
+
+    def readline(self):
+        '''
+        Return the next row as a dictionary or an empty string if there are no
+        rows left
+        '''
+        d_row = self._next_item(self._to_dicts)
+        if d_row is None:
+            return ''
+        return d_row
+
+    def close(self):
+        '''
+        Release the data held
+        '''
+        self._l_chunk = []
+
+
+class BookCacheReader(ArrayBookReader):
+    '''
+    Read a cache file created by build_cache using a memory-mapped array
+    '''
+    def __init__(self, s_fname, s_instrument, i_chunk=4096):
+        '''
+        Initialize a BookCacheReader object
+
+        :param s_fname: string. Path to the zipped file or to its cache
+        :param s_instrument: string. name of the instrument of book
+        :param i_chunk*: integer. Number of rows converted at once
+        '''
+        super(BookCacheReader, self).__init__(s_instrument, i_chunk)
+        s_cache = s_fname
+        if not s_fname.endswith('.npy'):
+            s_cache = get_cache_path(s_fname)
+        if not os.path.isfile(s_cache):
+            raise CacheNotFoundException(s_cache)
+        self.s_fname = s_cache
+        self.na_data = np.load(s_cache, mmap_mode='r')
+        self.i_row = 0
+
+    def _next_array(self):
+        '''
+        Return the next chunk of the memory-mapped array
+        '''
+        if self.na_data is None or self.i_row >= len(self.na_data):
+            return np.zeros(0, dtype=BOOK_DTYPE)
+        i_end = min(self.i_row + self.i_chunk, len(self.na_data))
+        na_rtn = self.na_data[self.i_row:i_end]
+        self.i_row = i_end
+        return na_rtn
+
+    def __len__(self):
+        '''
+        Return the number of rows in the cache file
+        '''
+        if self.na_data is None:
+            return 0
+        return len(self.na_data)
+
+    def close(self):
+        '''
+        Release the memory-mapped array
+        '''
+        super(BookCacheReader, self).close()
+        self.na_data = None
+
+
+class ZipChunkReader(ArrayBookReader):
+    '''
+    Read a zipped BID/ASK file in large chunks, parsing each one at once with
+    the BookChunkParser
+    '''
+    def __init__(self, s_fname, s_side, s_instrument, i_chunk_bytes=2**22):
+        '''
+        Initialize a ZipChunkReader object
+
+        :param s_fname: string. Path to the zipped file
+        :param s_side: string. BID or ASK
+        :param s_instrument: string. name of the instrument of book
+        :param i_chunk_bytes*: integer. Approximate size of each chunk read
+        '''
+        super(ZipChunkReader, self).__init__(s_instrument)
+        self.s_fname = s_fname
+        self.archive = zipfile.ZipFile(s_fname, 'r')
+        self.fr = self.archive.open(self.archive.infolist()[0])
+        self.parser = parser_data.BookChunkParser(s_side, i_chunk_bytes)
+        self.gen_chunks = self.parser.iter_chunks(self.fr)
+
+    def _next_array(self):
+        '''
+        Parse the next chunk of the zipped file
+        '''
+        if self.gen_chunks is not None:
+            for na_chunk in self.gen_chunks:
+                return na_chunk
+        return np.zeros(0, dtype=BOOK_DTYPE)
+
+    def close(self):
+        '''
+        Close the zipped file
+        '''
+        super(ZipChunkReader, self).close()
+        if self.gen_chunks is not None:
+            self.gen_chunks = None
+            self.fr.close()
+            self.archive.close()
@@ -0,0 +1,251 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Save offline the full order-level state of the books of a trading day at
+regular intervals, with the position of the event log where each state was
+taken, so a simulation can start from the middle of the day without replaying
+the morning
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import json
+import os
+import numpy as np
+from . import book
+from . import event_log
+from .parser_data import SIDES, ORDER_STATUS
+
+
+'''
+Begin help functions
+'''
+
+SNAP_DTYPE = np.dtype([('instrument', 'i2'),
+                       ('order_side', 'i1'),
+                       ('seq_order_number', 'S24'),
+                       ('secondary_order_id', 'S24'),
+                       ('priority_indicator', 'i8'),
+                       ('order_id', 'i8'),
+                       ('order_status', 'i1'),
+                       ('order_price', 'f8'),
+                       ('org_total_qty_order', 'i8'),
+                       ('traded_qty_order', 'i8'),
+                       ('priority_seconds', 'f8'),
+                       ('agent_id', 'i4'),
+                       ('member', 'i4'),
+                       ('order_date', 'S10'),
+                       ('is_today', '?'),
+                       ('action', 'S24'),
+                       ('idx', 'S24')])
+
+_SIDES_MAP = dict(zip(SIDES, range(len(SIDES))))
+_ORDER_STATUS_MAP = dict(zip(ORDER_STATUS, range(len(ORDER_STATUS))))
+
+
+def get_snapshot_path(s_file):
+    '''
+    Return the path to the snapshots of the day related to the file format
+    passed, as the ones used by the Env ('{date}/{date}_{}_{}_new.zip')
+
+    :param s_file: string. Format of the name of the zip files of the day
+    '''
+    s_folder = os.path.dirname(s_file)
+    s_date = os.path.basename(s_file).split('_')[0]
+    return os.path.join(s_folder, s_date + '_SNAPSHOTS.npy')
+
+
+def _get_meta_path(s_snap):
+    '''
+    Return the path to the JSON with the metadata of the snapshots
+
+    :param s_snap: string. Path to the snapshots file
+    '''
+    return os.path.splitext(s_snap)[0] + '.json'
+
+
+def has_snapshots(s_snap, s_log, l_instrument):
+    '''
+    Check if the snapshots passed exist, were taken from the current event log
+    and include all instruments desired
+
+    :param s_snap: string. Path to the snapshots file
+    :param s_log: string. Path to the event log of the same day
+    :param l_instrument: list. name of the instruments of the simulation
+    '''
+    s_meta = _get_meta_path(s_snap)
+    if not os.path.isfile(s_snap) or not os.path.isfile(s_meta):
+        return False
+    if not os.path.isfile(s_log):
+        return False
+    if os.path.getmtime(s_snap) < os.path.getmtime(s_log):
+        return False
+    with open(s_meta, 'r') as fr:
+        d_meta = json.load(fr)
+    if d_meta['instruments'] != event_log.get_instruments(s_log):
+        return False
+    return set(l_instrument).issubset(d_meta['instruments'])
+
+
+def _encode_order(order_obj, i_instr):
+    '''
+    Return a tuple matching SNAP_DTYPE from a resting order
+
+    :param order_obj: Order object. order in the book
+    :param i_instr: integer. Code of the instrument
+    '''
+    return (i_instr,
+            _SIDES_MAP[order_obj.s_side],
+            str(order_obj.name).encode(),
+            str(order_obj.s_sec_id).encode(),
+            order_obj.i_priority,
+            order_obj.i_msg_id,
+            _ORDER_STATUS_MAP[order_obj.s_status],
+            order_obj.f_price,
+            order_obj.i_org_qty,
+            order_obj.i_traded_qty,
+            order_obj.f_ptime,
+            order_obj.i_agent_id,
+            order_obj.i_member,
+            str(order_obj.s_order_date).encode(),
+            bool(order_obj.b_is_today),
+            str(order_obj.s_action).encode(),
+            str(order_obj.s_idx).encode())
+
+
+def _decode_order(t_row, s_instrument):
+    '''
+    Return the dictionary used by BookSide.restore_order from a row of a
+    SNAP_DTYPE array
+
+    :param t_row: tuple. row of the array, as returned by tolist()
+    :param s_instrument: string. name of the instrument of the order
+    '''
+    i_org_qty, i_traded_qty = t_row[8], t_row[9]
+    return {'instrument_symbol': s_instrument,
+            'order_side': SIDES[t_row[1]],
+            'seq_order_number': t_row[2].decode(),
+            'secondary_order_id': t_row[3].decode(),
+            'priority_indicator': t_row[4],
+            'order_id': t_row[5],
+            'order_status': ORDER_STATUS[t_row[6]],
+            'order_price': t_row[7],
+            'org_total_qty_order': i_org_qty,
+            'traded_qty_order': i_traded_qty,
+            'total_qty_order': i_org_qty - i_traded_qty,
+            'priority_seconds': t_row[10],
+            'agent_id': t_row[11],
+            'member': t_row[12],
+            'order_date': t_row[13].decode(),
+            'is_today': t_row[14],
+            'action': t_row[15].decode(),
+            'idx': t_row[16].decode()}
+
+'''
+End help functions
+'''
+
+
+def build_snapshots(s_file, l_instrument=None, f_interval=60.,
+                    b_overwrite=False):
+    '''
+    Replay the event log of the day passed and save the state of all books at
+    every f_interval seconds. Return the path to the snapshots file
+
+    :param s_file: string. Format of the name of the zip files of the day
+    :param l_instrument*: list. instruments of the event log. If the log does
+        not exist yet, it is created with them
+    :param f_interval*: float. Seconds between each snapshot
+    :param b_overwrite*: boolean. If should rebuild snapshots already created
+    '''
+    s_log = event_log.get_event_log_path(s_file)
+    if l_instrument:
+        event_log.build_event_log(s_file, l_instrument)
+    l_log_instr = event_log.get_instruments(s_log)
+    s_snap = get_snapshot_path(s_file)
+    if not b_overwrite and has_snapshots(s_snap, s_log, l_log_instr):
+        return s_snap
+    # replay the whole log, without files attached to the books
+    fr_log = event_log.EventLogReader(s_log)
+    d_books = dict((s_instr, book.LimitOrderBook(None, None, s_instr))
+                   for s_instr in l_log_instr)
+    l_rows = []
+    l_snaps = []
+    i_pos = 0
+    f_next = None
+    while not fr_log.is_over():
+        f_time = fr_log.peek_time()
+        if f_next is None:
+            f_next = (np.floor(f_time / f_interval) + 1) * f_interval
+        # save the books before applying the first event after f_next
+        if f_time > f_next:
+            d_snap = {'time': f_next, 'row': i_pos, 'start': len(l_rows),
+                      'books': {}}
+            for i_instr, s_instr in enumerate(l_log_instr):
+                book_obj = d_books[s_instr]
+                for book_side in [book_obj.book_bid, book_obj.book_ask]:
+                    l_rows += [_encode_order(order_obj, i_instr) for
+                               order_obj in book_side.d_order_map.values()]
+                d_snap['books'][s_instr] = book_obj.get_state()
+            d_snap['end'] = len(l_rows)
+            l_snaps.append(d_snap)
+            while f_time > f_next:
+                f_next += f_interval
+        s_instr, d_row = fr_log.next_event()
+        d_books[s_instr].process_event(d_row)
+        d_books[s_instr].set_rows_read(*fr_log.t_reads[2:])
+        i_pos += 1
+    fr_log.close()
+    na_data = np.array(l_rows, dtype=SNAP_DTYPE)
+    # write to temporary files first, so readers never see partial snapshots
+    s_meta = _get_meta_path(s_snap)
+    with open(s_snap + '.tmp', 'wb') as fw:
+        np.save(fw, na_data)
+    with open(s_meta + '.tmp', 'w') as fw:
+        json.dump({'instruments': l_log_instr,
+                   'interval': f_interval,
+                   'snapshots': l_snaps}, fw)
+    os.replace(s_snap + '.tmp', s_snap)
+    os.replace(s_meta + '.tmp', s_meta)
+    return s_snap
+
+
+def find_snapshot(s_snap, f_time):
+    '''
+    Return the metadata of the last snapshot taken up to the time passed or
+    None if there is no one
+
+    :param s_snap: string. Path to the snapshots file
+    :param f_time: float. Time of the day, in seconds
+    '''
+    with open(_get_meta_path(s_snap), 'r') as fr:
+        d_meta = json.load(fr)
+    d_rtn = None
+    for d_snap in d_meta['snapshots']:
+        if d_snap['time'] > f_time:
+            break
+        d_rtn = d_snap
+    return d_rtn
+
+
+def restore_books(s_snap, d_snap, l_order_books):
+    '''
+    Restore the books passed, just created, to the state of the snapshot
+
+    :param s_snap: string. Path to the snapshots file
+    :param d_snap: dictionary. metadata of the snapshot, from find_snapshot
+    :param l_order_books: list. LimitOrderBook objects to restore
+    '''
+    with open(_get_meta_path(s_snap), 'r') as fr:
+        l_snap_instr = json.load(fr)['instruments']
+    na_data = np.load(s_snap, mmap_mode='r')
+    na_rows = na_data[d_snap['start']:d_snap['end']]
+    for book_obj in l_order_books:
+        s_instr = book_obj.s_instrument
+        i_instr = l_snap_instr.index(s_instr)
+        na_aux = na_rows[na_rows['instrument'] == i_instr]
+        l_orders = [_decode_order(t_row, s_instr) for t_row in
+                    na_aux.tolist()]
+        book_obj.restore_state(d_snap['books'][s_instr], l_orders)
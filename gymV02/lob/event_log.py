@@ -0,0 +1,425 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Resolve offline the order in which the rows of the BID/ASK files of all
+instruments of a trading day are replayed, saving it as a single event log
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import heapq
+import json
+import os
+import numpy as np
+from . import book_cache
+from .parser_data import BOOK_DTYPE, EXECUTION_TYPES, ORDER_STATUS
+
+
+'''
+Begin help functions
+'''
+
+# besides the row, keep the rows read from each side by the LimitOrderBook
+# when the row is applied and when the next row of the book is chosen
+LOG_DTYPE = np.dtype(BOOK_DTYPE.descr + [('instrument', 'i2'),
+                                         ('event_time', 'f8'),
+                                         ('bid_reads', 'i4'),
+                                         ('ask_reads', 'i4'),
+                                         ('bid_reads_next', 'i4'),
+                                         ('ask_reads_next', 'i4')])
+
+# used by the LimitOrderBook as an "empty" secondary id
+BIG_ID = 99999999999999999999999
+
+# codes used to turn a row with zero price into a cancel, as the BookSide
+_I_UPDATE = EXECUTION_TYPES.index('Update')
+_I_CANCELED = ORDER_STATUS.index('Canceled')
+_I_REPLACED = ORDER_STATUS.index('Replaced')
+_S_RESTING = set(ORDER_STATUS.index(s) for s in ['New', 'Replaced'])
+_S_REMOVED = set(ORDER_STATUS.index(s) for s in ['Canceled', 'Expired',
+                                                 'Filled'])
+
+
+def get_event_log_path(s_file):
+    '''
+    Return the path to the event log of the day related to the file format
+    passed, as the ones used by the Env ('{date}/{date}_{}_{}_new.zip')
+
+    :param s_file: string. Format of the name of the zip files of the day
+    '''
+    s_folder = os.path.dirname(s_file)
+    s_date = os.path.basename(s_file).split('_')[0]
+    return os.path.join(s_folder, s_date + '_EVENTS.npy')
+
+
+def get_instruments(s_log):
+    '''
+    Return the list of instruments included in the event log passed
+
+    :param s_log: string. Path to the event log
+    '''
+    s_meta = os.path.splitext(s_log)[0] + '.json'
+    with open(s_meta, 'r') as fr:
+        return json.load(fr)['instruments']
+
+
+def has_event_log(s_log, l_instrument, s_file=None):
+    '''
+    Check if the event log passed exists, was created with the current layout
+    of the LOG_DTYPE and includes all instruments desired
+
+    :param s_log: string. Path to the event log
+    :param l_instrument: list. name of the instruments of the simulation
+    :param s_file*: string. Format of the name of the zip files of the day.
+        If passed, the log should be newer than the files of the instruments
+    '''
+    s_meta = os.path.splitext(s_log)[0] + '.json'
+    if not os.path.isfile(s_log) or not os.path.isfile(s_meta):
+        return False
+    if s_file:
+        f_mtime = os.path.getmtime(s_log)
+        for s_instr in l_instrument:
+            for s_side in ['BID', 'ASK']:
+                s_fname = s_file.format(s_side, s_instr)
+                if os.path.isfile(s_fname) and \
+                        os.path.getmtime(s_fname) > f_mtime:
+                    return False
+    if not book_cache.has_valid_dtype(s_log, LOG_DTYPE):
+        return False
+    return set(l_instrument).issubset(get_instruments(s_log))
+
+
+def _open_side(s_fname, s_side, s_instrument):
+    '''
+    Return a reader to the file passed, using its cache if available
+
+    :param s_fname: string. path to the zipped file
+    :param s_side: string. BID or ASK
+    :param s_instrument: string. name of the instrument of book
+    '''
+    if book_cache.has_cache(s_fname):
+        return book_cache.BookCacheReader(s_fname, s_instrument)
+    return book_cache.ZipChunkReader(s_fname, s_side, s_instrument)
+
+
+def _next_valid_row(d_side):
+    '''
+    Return the next row of the side passed, treating the rows with zero price
+    as the BookSide._readline does when reading them: the row is turned into
+    a cancel if it replaces an order in the book, otherwise it is dropped with
+    the zero-price rows that follow. Return None if there are no rows left
+
+    :param d_side: dict. State of the side, as used by merge_sides
+    '''
+    fr = d_side['fr']
+    t_row = fr._next_tuple()
+    if t_row is None:
+        return None
+    d_side['reads'] += 1
+    if t_row[8] >= 1e-6:
+        return t_row
+    if t_row[13] == _I_REPLACED:
+        f_price = d_side['prices'].get(int(t_row[2]), None)
+        if f_price is not None:
+            return (t_row[:4] + (_I_UPDATE,) + t_row[5:8] + (f_price,) +
+                    t_row[9:13] + (_I_CANCELED,) + t_row[14:])
+    while t_row is not None and t_row[8] == 0.:
+        t_row = fr._next_tuple()
+    return t_row
+
+
+def _apply_row(d_side, t_row):
+    '''
+    Update the prices of the orders resting in the side passed, as the
+    BookSide.update does with its order map, and return the row
+
+    :param d_side: dict. State of the side, as used by merge_sides
+    :param t_row: tuple. row being applied
+    '''
+    i_status = t_row[13]
+    if i_status in _S_RESTING:
+        d_side['prices'][int(t_row[2])] = t_row[8]
+    elif i_status in _S_REMOVED:
+        d_side['prices'].pop(int(t_row[2]), None)
+    return t_row
+
+
+def merge_sides(fr_bid, fr_ask):
+    '''
+    Return a generator of the rows of both sides of a book, as tuples, in the
+    order they are applied by the LimitOrderBook._readline. Once one of the
+    sides is over, the remaining rows of the other side follow in file order.
+    Rows with zero price are treated when read, before the sides are
+    interleaved, so they never take the place of a valid row. Each item is a
+    tuple (row, rows read from the bid, rows read from the ask), with the
+    rows read by each side of the LimitOrderBook when the row is chosen
+
+    :param fr_bid: ArrayBookReader object. Rows of the bid side
+    :param fr_ask: ArrayBookReader object. Rows of the ask side
+    '''
+    d_state = {}
+    for s_side, fr in zip(['BID', 'ASK'], [fr_bid, fr_ask]):
+        d_state[s_side] = {'fr': fr,
+                           'row': None,
+                           'read': True,
+                           'get_new': True,
+                           'sec': BIG_ID,
+                           'last_sec': BIG_ID,
+                           'ptime': 0.,
+                           'prices': {},
+                           'reads': 0,
+                           'f_window': 10e7 if s_side == 'BID' else 10e4}
+    d_bid, d_ask = d_state['BID'], d_state['ASK']
+    while True:
+        # read a new row in each side, if it is needed
+        for d_side in [d_bid, d_ask]:
+            if not (d_side['read'] and d_side['get_new']):
+                continue
+            t_row = _next_valid_row(d_side)
+            if t_row is None:
+                d_side['read'] = False
+                if d_side['get_new']:
+                    d_side['row'] = None
+                continue
+            d_side['row'] = t_row
+            # 'Agressor' rows never hold the position in the queue
+            if book_cache.AGGRESSOR[t_row[14]] != 'Agressor':
+                i_new_sec = int(t_row[16])
+                b_t1 = d_side['sec'] == BIG_ID
+                b_t2 = abs(i_new_sec - d_side['last_sec']) < d_side['f_window']
+                if b_t1 or b_t2:
+                    d_side['get_new'] = False
+                    d_side['sec'] = i_new_sec
+                    d_side['ptime'] = t_row[6]
+        # one of the sides is over
+        if d_bid['row'] is None or d_ask['row'] is None:
+            for d_side in [d_bid, d_ask]:
+                if d_side['row'] is not None:
+                    yield (_apply_row(d_side, d_side['row']),
+                           d_bid['reads'], d_ask['reads'])
+                while True:
+                    t_row = _next_valid_row(d_side)
+                    if t_row is None:
+                        break
+                    yield (_apply_row(d_side, t_row), d_bid['reads'],
+                           d_ask['reads'])
+            return
+        # choose the side to apply, as LimitOrderBook._readline does
+        b_ttask = (d_ask['ptime'] - d_bid['ptime']) < 1e-6
+        b_tsame = abs(d_bid['ptime'] - d_ask['ptime']) < 1e-6
+        if b_ttask or (d_ask['sec'] < d_bid['sec'] and b_tsame):
+            d_side = d_ask
+        else:
+            d_side = d_bid
+        yield (_apply_row(d_side, d_side['row']), d_bid['reads'],
+               d_ask['reads'])
+        d_side['last_sec'] = d_side['sec']
+        d_side['sec'] = BIG_ID
+        d_side['get_new'] = True
+        if not d_side['read']:
+            d_side['row'] = None
+
+
+def _iter_events(fr_bid, fr_ask, i_instr):
+    '''
+    Return a generator of tuples (event time, instrument, position, row, rows
+    read) of an instrument. The event time is the time the LimitOrderBook
+    would apply the row: orders from prior days are applied right away and no
+    row is applied before the rows that precede it. The rows read are the
+    ones from each side when the row is chosen and when the next one is
+
+    :param fr_bid: ArrayBookReader object. Rows of the bid side
+    :param fr_ask: ArrayBookReader object. Rows of the ask side
+    :param i_instr: integer. Code of the instrument
+    '''
+    f_time = 0.
+    t_last = None
+    for i_pos, (t_row, i_bid, i_ask) in enumerate(merge_sides(fr_bid,
+                                                             fr_ask)):
+        if t_last is not None:
+            yield t_last[:4] + (t_last[4] + (i_bid, i_ask),)
+        # is_today: session date equals the order date
+        if t_row[0] == t_row[11]:
+            f_time = max(f_time, t_row[6])
+        t_last = (f_time, i_instr, i_pos, t_row, (i_bid, i_ask))
+    if t_last is not None:
+        yield t_last[:4] + (t_last[4] * 2,)
+
+'''
+End help functions
+'''
+
+
+def build_event_log(s_file, l_instrument, b_overwrite=False,
+                    i_chunk=65536):
+    '''
+    Merge the BID/ASK files of all instruments passed into a single event log,
+    sorted by the time each row should be applied. Save it as a NumPy
+    structured array and a JSON with the instruments. Return the path to it
+
+    :param s_file: string. Format of the name of the zip files of the day
+    :param l_instrument: list. name of the instruments to include
+    :param b_overwrite*: boolean. If should rebuild a log already created
+    :param i_chunk*: integer. Number of rows written to disk at once
+    '''
+    s_log = get_event_log_path(s_file)
+    if not b_overwrite and has_event_log(s_log, l_instrument, s_file):
+        return s_log
+    l_iters = []
+    l_readers = []
+    for i_instr, s_instr in enumerate(l_instrument):
+        fr_bid = _open_side(s_file.format('BID', s_instr), 'BID', s_instr)
+        fr_ask = _open_side(s_file.format('ASK', s_instr), 'ASK', s_instr)
+        l_readers += [fr_bid, fr_ask]
+        l_iters.append(_iter_events(fr_bid, fr_ask, i_instr))
+    # write the merged rows to disk a chunk at a time, so just one chunk of
+    # them is kept as python objects
+    s_raw = s_log + '.raw'
+    i_rows = 0
+    l_rows = []
+    with open(s_raw, 'wb') as fw:
+        for t_event in heapq.merge(*l_iters):
+            l_rows.append(t_event[3] + (t_event[1], t_event[0]) +
+                          t_event[4])
+            if len(l_rows) == i_chunk:
+                np.array(l_rows, dtype=LOG_DTYPE).tofile(fw)
+                i_rows += len(l_rows)
+                l_rows = []
+        np.array(l_rows, dtype=LOG_DTYPE).tofile(fw)
+        i_rows += len(l_rows)
+    for fr in l_readers:
+        fr.close()
+    # write to temporary files first, so readers never see a partial log
+    s_meta = os.path.splitext(s_log)[0] + '.json'
+    with open(s_log + '.tmp', 'wb') as fw:
+        if i_rows:
+            na_data = np.memmap(s_raw, dtype=LOG_DTYPE, mode='r',
+                                shape=(i_rows,))
+            np.save(fw, na_data)
+            del na_data
+        else:
+            np.save(fw, np.zeros(0, dtype=LOG_DTYPE))
+    os.remove(s_raw)
+    with open(s_meta + '.tmp', 'w') as fw:
+        json.dump({'instruments': list(l_instrument)}, fw)
+    os.replace(s_log + '.tmp', s_log)
+    os.replace(s_meta + '.tmp', s_meta)
+    return s_log
+
+
+class EventLogReader(book_cache.ArrayBookReader):
+    '''
+    Read sequentially an event log created by build_event_log
+    '''
+    def __init__(self, s_log, l_instrument=None, i_chunk=4096):
+        '''
+        Initialize an EventLogReader object
+
+        :param s_log: string. Path to the event log
+        :param l_instrument*: list. instruments to read. All if not passed
+        :param i_chunk*: integer. Number of rows converted at once
+        '''
+        super(EventLogReader, self).__init__(None, i_chunk)
+        self.s_fname = s_log
+        self.l_log_instr = get_instruments(s_log)
+        self.na_log_instr = np.array(self.l_log_instr, dtype=object)
+        self.na_data = np.load(s_log, mmap_mode='r')
+        self.na_codes = None
+        if l_instrument:
+            self.na_codes = np.array([self.l_log_instr.index(s_instr) for
+                                      s_instr in l_instrument])
+        self.i_row = 0
+        self._t_next = None
+        self.t_reads = None
+
+    def _next_array(self):
+        '''
+        Return the next chunk of the memory-mapped array, dropping the
+        instruments not desired
+        '''
+        while self.na_data is not None and self.i_row < len(self.na_data):
+            i_end = min(self.i_row + self.i_chunk, len(self.na_data))
+            na_chunk = self.na_data[self.i_row:i_end]
+            self.i_row = i_end
+            if self.na_codes is not None:
+                na_chunk = na_chunk[np.isin(na_chunk['instrument'],
+                                            self.na_codes)]
+            if len(na_chunk):
+                return na_chunk
+        return np.zeros(0, dtype=LOG_DTYPE)
+
+    def _to_events(self, na_rows):
+        '''
+        Return a list of tuples (event time, instrument, dictionary, rows
+        read) related to the rows of the array passed
+
+        :param na_rows: numpy array. rows of a LOG_DTYPE array
+        '''
+        l_instr = self.na_log_instr[na_rows['instrument']].tolist()
+        l_reads = zip(na_rows['bid_reads'].tolist(),
+                      na_rows['ask_reads'].tolist(),
+                      na_rows['bid_reads_next'].tolist(),
+                      na_rows['ask_reads_next'].tolist())
+        return list(zip(na_rows['event_time'].tolist(), l_instr,
+                        self._to_dicts(na_rows, l_instr), l_reads))
+
+    def seek(self, i_row):
+        '''
+        Move the reader to the row passed of the event log, discarding the
+        rows already converted
+
+        :param i_row: integer. Index of the next row to be read
+        '''
+        self.i_row = i_row
+        self._l_chunk = []
+        self._i_chunk_idx = 0
+        self._t_next = None
+
+    def peek_time(self):
+        '''
+        Return the time of the next event, without consuming it. Return inf if
+        there are no events left
+        '''
+        if self._t_next is None:
+            self._t_next = self._next_item(self._to_events)
+            if self._t_next is None:
+                return float('inf')
+        return self._t_next[0]
+
+    def is_over(self):
+        '''
+        Check if all the events were already read
+        '''
+        return self.peek_time() == float('inf')
+
+    def peek_event(self):
+        '''
+        Return the next event as a tuple (instrument, dictionary), without
+        consuming it. Return (None, None) if there are no events left
+        '''
+        if self.peek_time() == float('inf'):
+            return None, None
+        return self._t_next[1], self._t_next[2]
+
+    def next_event(self):
+        '''
+        Return the next event as a tuple (instrument, dictionary). Return
+        (None, None) if there are no events left. The rows read by each side
+        of the book of the event are kept in t_reads
+        '''
+        self.peek_time()
+        t_event, self._t_next = self._t_next, None
+        if t_event is None:
+            return None, None
+        self.t_reads = t_event[3]
+        return t_event[1], t_event[2]
+
+    def close(self):
+        '''
+        Release the memory-mapped array
+        '''
+        super(EventLogReader, self).close()
+        self.na_data = None
+        self._t_next = None
@@ -9,9 +9,13 @@ in the environment
 Created on 10/24/2016
 """
 import numpy as np
+import heapq
 import itertools
 import platform
 from . import book
+from . import book_snapshot
+from . import event_log
+from .perf import NO_PERF
 from neutrinogym.neutrino import Source
 # from neutrinogym.config import START_MKT_TIME, CLOSE_MKT_TIME
 
@@ -166,6 +170,161 @@ class NextStopTime():
         '''
         return self.s_stoptime_was_set == '' and not self.b_use_last
 
+    def notify(self, f_next_event, b_processed, f_next_callback=None):
+        '''
+        Receive information about the events of the books. Not used by this
+        clock, that yields all stop times
+
+        :param f_next_event: float. Time of the next event not processed
+        :param b_processed: boolean. If some event was processed in the step
+        :param f_next_callback*: float. Time of the next IDLE callback due
+        '''
+        pass
+
+
+class EventClock(object):
+    '''
+    Float-based StopTime controller that jumps straight to the next stop time
+    where something can happen. Keep the same grids used by NextStopTime, an
+    IDLE stop every 20 miliseconds and a MARKET stop every milis, but skip the
+    stops that would not process any event nor see any change in the market.
+    The IDLE stops are also kept when a scheduled callback of the agents is
+    due, as the ones created by fx.every and fx.at
+    '''
+    def __init__(self, start_time, close_time, milis=7, i_idle=20):
+        '''
+        Initiate a EventClock object. Save all parameters as attributes
+
+        :param start_time: float. the start time of the market
+        :param close_time: float. the close time of the market
+        :param milis*: integer. Number of miliseconds between MARKET stops
+        :param i_idle*: integer. Number of miliseconds between IDLE stops
+        '''
+        self.f_start_time = start_time
+        self.f_close_time = close_time + 60*5  # to work MARKET_CLOSED
+        self.f_delta_market = max(milis, 1)/1000.
+        self.f_delta_idle = i_idle/1000.
+        self.f_stoptime_was_set = None
+        self.b_use_last = False
+        self.reset()
+
+    def reset(self):
+        '''
+        Reset the clock to the start time
+        '''
+        self.i_idle = 0
+        self.i_market = -1
+        self.f_last_stoptime = None
+        self.f_next_event = float('-inf')
+        self.f_next_callback = float('inf')
+        # if the stops of each kind have something new to show
+        self.b_idle_pending = True
+        self.b_market_pending = True
+
+    def set_stoptime(self, hour, minute, second, milis):
+        '''
+        Set a new stoptime if is not already set
+
+        :param hour: integer. Hour of the day
+        :param minute: integer. Minutes of the day
+        :param second: integer. seconds of the day
+        :param milis: integer. milis of the day
+        '''
+        f_rtn = self.f_stoptime_was_set
+        if self.f_stoptime_was_set is None:
+            f_rtn = hour * 60**2 + minute * 60 + second + milis/1000.
+            self.f_stoptime_was_set = f_rtn
+            self.b_use_last = True
+        return f_rtn, Source.IDLE
+
+    def notify(self, f_next_event, b_processed, f_next_callback=None):
+        '''
+        Receive the time of the next event of the books, if any event was
+        processed in the last step and when the next IDLE callback is due, to
+        define the next stop time
+
+        :param f_next_event: float. Time of the next event not processed. Use
+            -inf if it is unknown
+        :param b_processed: boolean. If some event was processed in the step
+        :param f_next_callback*: float. Time of the next IDLE callback due.
+            Use -inf if it is unknown and None if there is no callback
+        '''
+        self.f_next_event = f_next_event
+        if f_next_callback is None:
+            f_next_callback = float('inf')
+        self.f_next_callback = f_next_callback
+        if b_processed:
+            self.b_idle_pending = True
+            self.b_market_pending = True
+
+    def _next_index(self, i_last, f_delta, b_pending, f_next):
+        '''
+        Return the index of the next stop of a grid
+
+        :param i_last: integer. index of the last stop of the grid
+        :param f_delta: float. interval between the stops of the grid
+        :param b_pending: boolean. If there is something new to show
+        :param f_next: float. Time of the next thing to process in the grid
+        '''
+        if b_pending or f_next == float('-inf'):
+            return i_last + 1
+        if f_next == float('inf'):
+            return None
+        f_aux = (f_next - self.f_start_time) / f_delta
+        return max(i_last + 1, int(np.ceil(f_aux - 1e-9)))
+
+    def __next__(self):
+        '''
+        Return the next stoptime, in seconds, and its source
+        '''
+        if self.f_stoptime_was_set is not None:
+            # if there is a stoptime externally set, use it
+            f_rtn = self.f_stoptime_was_set
+            self.f_stoptime_was_set = None
+            return f_rtn, Source.IDLE
+        elif self.b_use_last:
+            # if did not use the last_stoptime, set to use it again
+            self.b_use_last = False
+            return self.f_last_stoptime, Source.IDLE
+        # jump to the first stop of each grid with something to process
+        i_idle = self._next_index(self.i_idle, self.f_delta_idle,
+                                  self.b_idle_pending,
+                                  min(self.f_next_event,
+                                      self.f_next_callback))
+        i_market = self._next_index(self.i_market, self.f_delta_market,
+                                    self.b_market_pending,
+                                    self.f_next_event)
+        if i_idle is None and i_market is None:
+            raise StopIteration
+        f_idle = float('inf')
+        f_market = float('inf')
+        if i_idle is not None:
+            f_idle = self.f_start_time + i_idle * self.f_delta_idle
+        if i_market is not None:
+            f_market = self.f_start_time + i_market * self.f_delta_market
+        # IDLE stops come first when both are at the same time
+        if f_idle <= f_market:
+            self.i_idle = i_idle
+            self.b_idle_pending = False
+            f_rtn, s_source = f_idle, Source.IDLE
+        else:
+            self.i_market = i_market
+            self.b_market_pending = False
+            f_rtn, s_source = f_market, Source.MARKET
+        if f_rtn > self.f_close_time:
+            raise StopIteration
+        self.f_last_stoptime = f_rtn
+        return f_rtn, s_source
+
+    def next(self):
+        return self.__next__()
+
+    def has_already_used_param(self):
+        '''
+        Check if have already used the stoptime that was set
+        '''
+        return self.f_stoptime_was_set is None and not self.b_use_last
+
 
 '''
 End help functions
@@ -223,7 +382,10 @@ class BvmfFileMatching(OrderMatching):
     order book
     '''
 
-    def __init__(self, env, l_instrument, l_file):
+    def __init__(self, env, l_instrument, l_file, b_use_cache=False,
+                 b_use_event_log=False, b_int_prices=False,
+                 b_price_ladder=False, b_use_snapshots=False,
+                 b_bulk_parse=False, obj_perf=None):
         '''
         Initialize an OrderMatching object. Save all parameters as attributes
 
@@ -231,9 +393,27 @@ class BvmfFileMatching(OrderMatching):
         :param l_instrument: list. name of the instruments of the simulation
         :param l_file: string. Format of the name of the zip files used
         :param i_idx: integer. The index of the start file to be read
+        :param b_use_cache*: boolean. Read from the cache files, if available
+        :param b_use_event_log*: boolean. Replay the event log of the day, if
+            it exists and includes all the instruments
+        :param b_int_prices*: boolean. Key the price trees by integer ticks
+        :param b_price_ladder*: boolean. Keep the price levels in arrays
+        :param b_use_snapshots*: boolean. Start replaying the event log from
+            the last book snapshot before the start time, if available
+        :param b_bulk_parse*: boolean. Parse the zipped files in chunks
+        :param obj_perf*: PerfCounters object. Counters of the environment.
+            Nothing is counted if not set
         '''
         super(BvmfFileMatching, self).__init__(env)
+        self.obj_perf = obj_perf or NO_PERF
         self.l_instrument = l_instrument
+        self.b_use_cache = b_use_cache
+        self.b_bulk_parse = b_bulk_parse
+        self.b_use_event_log = b_use_event_log
+        self.b_int_prices = b_int_prices
+        self.b_price_ladder = b_price_ladder
+        self.b_use_snapshots = b_use_snapshots
+        self.event_log = None
         if not isinstance(l_file, list):
             l_file = [l_file]
         self.l_file = l_file
@@ -256,6 +436,11 @@ class BvmfFileMatching(OrderMatching):
         self.b_get_new_row = True
         self.s_stoptime = ''
         self.f_stoptime = 0.
+        self._t_last_seq = None
+        self.l_book_heap = []  # (time of the next event, index of the book)
+        self.l_touched = []  # books updated in the last step
+        self.d_select_step = {}  # step the next row of each book was chosen
+        self.d_pending_reads = {}  # rows read to set in the next step
         self.d_map_book_list = dict(zip(l_instrument,
                                         (np.cumsum([1]*len(l_instrument))-1)))
 
@@ -295,8 +480,16 @@ class BvmfFileMatching(OrderMatching):
         self.b_get_new_row = True
         self.s_stoptime = ''
         self.f_stoptime = 0.
+        self._t_last_seq = None
+        self.l_book_heap = []  # (time of the next event, index of the book)
+        self.l_touched = []  # books updated in the last step
         self.i_nrow = 0
         self._s_file = None
+        self.d_select_step = {}  # step the next row of each book was chosen
+        self.d_pending_reads = {}  # rows read to set in the next step
+        if self.event_log:
+            self.event_log.close()
+            self.event_log = None
         self.idx += 1
 
     def update(self, l_msg):
@@ -332,41 +525,198 @@ class BvmfFileMatching(OrderMatching):
         self._s_file = self.l_file[self.idx]
         return self._s_file
 
+    def _restore_snapshot(self, s_log):
+        '''
+        Restore the books just created from the last snapshot taken before the
+        start time of the environment and move the event log to that point
+
+        :param s_log: string. Path to the event log of the day
+        '''
+        f_start = getattr(self.env, 'start_mkt_time', None)
+        s_snap = book_snapshot.get_snapshot_path(self.s_file)
+        if f_start is None or not book_snapshot.has_snapshots(
+                s_snap, s_log, self.l_instrument):
+            return
+        d_snap = book_snapshot.find_snapshot(s_snap, f_start)
+        if not d_snap:
+            return
+        book_snapshot.restore_books(s_snap, d_snap, self.l_order_books)
+        self.event_log.seek(d_snap['row'])
+        for book_obj in self.l_order_books:
+            if book_obj.f_time >= self.f_time:
+                self.f_time = book_obj.f_time
+                self.s_time = book_obj.s_time
+
+    def _notify_clock(self):
+        '''
+        Inform the clock the time of the next event of the books, if they or
+        the market time have changed since the last stop, by the market or by
+        the agents, and when the next IDLE callback of the agents is due
+        '''
+        i_seq = 0
+        f_next_event = float('inf')
+        for book_obj in self.l_order_books:
+            i_seq += book_obj.book_bid.i_seq + book_obj.book_ask.i_seq
+            if book_obj.f_next_time is None:
+                f_next_event = float('-inf')
+            else:
+                f_next_event = min(f_next_event, book_obj.f_next_time)
+        if self.event_log:
+            f_next_event = self.event_log.peek_time()
+        t_seq = (i_seq, self.f_time)
+        self.env.NextStopTime.notify(f_next_event, t_seq != self._t_last_seq,
+                                     self.env.get_next_callback_time())
+        self._t_last_seq = t_seq
+
+    def _read_event(self):
+        '''
+        Return the next event of the log as a tuple (book, row), keeping the
+        rows read by each side of the book as the LimitOrderBook._readline
+        would. Aggressor rows of today chosen in a prior step are dropped: the
+        LimitOrderBook keeps reading the side of an aggressor row, so when
+        such a row is stopped by the stop time, it is replaced by the next row
+        of its side in the next step, and never applied. Return (None, None)
+        if the row was dropped
+        '''
+        s_name, d_row = self.event_log.next_event()
+        book_obj = self.get_order_book_obj(s_name)
+        t_reads = self.event_log.t_reads
+        i_select = self.d_select_step.get(s_name, 1)
+        if d_row['is_today'] and d_row['agressor_indicator'] == 'Agressor' \
+                and self.i_nrow > i_select:
+            book_obj.set_rows_read(t_reads[2], t_reads[3])
+            self.d_select_step[s_name] = self.i_nrow
+            return None, None
+        return book_obj, d_row
+
+    def _next_from_event_log(self):
+        '''
+        Return a list of messages from the agents related to the current step,
+        reading the rows of all books from the event log of the day
+        '''
+        self.i_nrow += 1
+        try:
+            if self.event_log.is_over():
+                raise StopIteration
+            self._notify_clock()
+            self.s_stoptime, self.s_source = self.env.NextStopTime.next()
+            for book_obj in self.l_order_books:
+                book_obj.set_stop_time(self.s_stoptime)
+            f_stop_time = self.l_order_books[0].stop_time
+            # the rows read by the books that stopped on messages
+            for s_name, t_reads in self.d_pending_reads.items():
+                self.get_order_book_obj(s_name).set_rows_read(*t_reads)
+            self.d_pending_reads = {}
+            l_msg = []
+            while self.event_log.peek_time() <= f_stop_time:
+                f_perf = self.obj_perf.start('read')
+                book_obj, d_row = self._read_event()
+                self.obj_perf.stop('read', None, f_perf)
+                if not book_obj:
+                    continue
+                l_msg += book_obj.process_event(d_row)
+                t_reads = self.event_log.t_reads
+                # keep the maximum time
+                if book_obj.f_time >= self.f_time:
+                    self.f_time = book_obj.f_time
+                    self.s_time = book_obj.s_time
+                if l_msg:
+                    # the next row of the book is chosen in the next step
+                    book_obj.set_rows_read(t_reads[0], t_reads[1])
+                    self.d_pending_reads[book_obj.s_instrument] = t_reads[2:]
+                    self.d_select_step[book_obj.s_instrument] = self.i_nrow + 1
+                    break
+                book_obj.set_rows_read(t_reads[2], t_reads[3])
+                self.d_select_step[book_obj.s_instrument] = self.i_nrow
+            if not l_msg:
+                # check if unload trade buffer
+                for book_obj in self.l_order_books:
+                    book_obj.should_unload()
+            self.last_date = self.f_time
+            return l_msg
+        except StopIteration:
+            self.i_nrow = 0
+            self.i_qty_traded_at_bid = 0
+            self.i_qty_traded_at_ask = 0
+            self.last_date = 0
+            self.best_bid = (0, 0)
+            self.best_ask = (0, 0)
+            self.obj_best_bid = None
+            self.obj_best_ask = None
+            raise StopIteration
+
     def __next__(self):
         '''
         Return a list of messages from the agents related to the current step
         '''
         # if it is the first line of the file, instanciate new books
         if self.i_nrow == 0:
+            s_log = event_log.get_event_log_path(self.s_file)
+            if self.b_use_event_log and event_log.has_event_log(
+                    s_log, self.l_instrument, self.s_file):
+                self.event_log = event_log.EventLogReader(s_log,
+                                                          self.l_instrument)
             for s_name in self.l_instrument:
                 s_fbid = self.s_file.format('BID', s_name)
                 s_fask = self.s_file.format('ASK', s_name)
-                self.l_order_books.append(book.LimitOrderBook(s_fbid,
-                                                              s_fask,
-                                                              s_name))
+                if self.event_log:
+                    s_fbid, s_fask = None, None
+                self.l_order_books.append(book.LimitOrderBook(
+                    s_fbid, s_fask, s_name, b_use_cache=self.b_use_cache,
+                    b_bulk_parse=self.b_bulk_parse,
+                    b_int_prices=self.b_int_prices,
+                    b_price_ladder=self.b_price_ladder,
+                    obj_perf=self.obj_perf))
+            if self.event_log and self.b_use_snapshots:
+                self._restore_snapshot(s_log)
+            # all books start without a known next event
+            self.l_book_heap = [(float('-inf'), i_idx) for i_idx in
+                                range(len(self.l_order_books))]
+            self.l_touched = []
+        if self.event_log:
+            return self._next_from_event_log()
         self.i_nrow += 1
         # try to read a row of an already opened file
         try:
+            self._notify_clock()
             self.s_stoptime, self.s_source = self.env.NextStopTime.next()
+            f_stop_time = book.get_stop_seconds(self.s_stoptime)
+            # the counts of the books touched in the last step are outdated
+            for i_idx in self.l_touched:
+                self.l_order_books[i_idx].book_bid.reset_counts()
+                self.l_order_books[i_idx].book_ask.reset_counts()
+            self.l_touched = []
             l_msg = []
-            b_exit_for = False
-            for s_name, book_obj in zip(self.l_instrument, self.l_order_books):
-                # set the stop time and update the books until that
-                book_obj.set_stop_time(self.s_stoptime)
+            # just update the books with events until the stop time, in the
+            # order of their next events
+            l_heap = self.l_book_heap
+            while l_heap and l_heap[0][0] <= f_stop_time:
+                i_idx = heapq.heappop(l_heap)[1]
+                self.l_touched.append(i_idx)
+                book_obj = self.l_order_books[i_idx]
+                book_obj.set_stop_time(f_stop_time)
                 for l_msg_aux in book_obj:
                     l_msg += l_msg_aux
                     if len(l_msg_aux) > 0:
-                        b_exit_for = True
                         break
                 # keep the maximum time
                 if book_obj.f_time >= self.f_time:
                     self.f_time = book_obj.f_time
                     self.s_time = book_obj.s_time
-                if b_exit_for:
-                    b_exit_for = False
+                if l_msg:
                     break
                 # check if unload trade buffer
                 book_obj.should_unload()
+            # put back the books touched, keyed by their next event
+            for i_idx in self.l_touched:
+                f_next_time = self.l_order_books[i_idx].f_next_time
+                if f_next_time is None:
+                    f_next_time = float('-inf')
+                heapq.heappush(l_heap, (f_next_time, i_idx))
+            # the buffers of the books without events are flagged as well
+            if not l_msg:
+                for book_obj in self.l_order_books:
+                    book_obj.should_unload()
             self.last_date = self.f_time
             return l_msg
         except StopIteration:
@@ -10,8 +10,10 @@ Created on 06/10/2016
 # import libraries
 import os
 import zipfile
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy as np
 import pandas as pd
-import subprocess
 
 '''
 Begin help functions
@@ -33,93 +35,271 @@ class NoValidTypeException(Exception):
     """
     pass
 
+
+# integer codes used to store the categorical fields of the OFER_CPA and
+# OFER_VDA files. The position in each tuple is the code. Only append values
+SIDES = ('Buy Order', 'Sell Order')
+EXECUTION_TYPES = ('New', 'Update', 'Cancel', 'Trade', 'Reentry',
+                   'New Stop Price', 'Rejected', 'Removed',
+                   'Stop Price Triggered', 'Expired', 'Eliminated')
+ORDER_STATUS = ('New', 'Partially Filled', 'Filled', 'Canceled', 'Replaced',
+                'Rejected', 'Expired', 'Previous Final State')
+AGGRESSOR = ('Neutral', 'Agressor', 'Passive', 'None')
+
+BOOK_DTYPE = np.dtype([('session_date', 'i4'),
+                       ('order_side', 'i1'),
+                       ('seq_order_number', 'S24'),
+                       ('secondary_order_id', 'S24'),
+                       ('execution_type', 'i1'),
+                       ('priority_time', 'S18'),
+                       ('priority_seconds', 'f8'),
+                       ('priority_indicator', 'i8'),
+                       ('order_price', 'f8'),
+                       ('org_total_qty_order', 'i8'),
+                       ('traded_qty_order', 'i8'),
+                       ('order_date', 'i4'),
+                       ('order_datetime_entry', 'S26'),
+                       ('order_status', 'i1'),
+                       ('agressor_indicator', 'i1'),
+                       ('member', 'i4'),
+                       ('idx', 'S24')])
+
+_SIDES_MAP = dict(zip(SIDES, range(len(SIDES))))
+_EXECUTION_TYPES_MAP = dict(zip(EXECUTION_TYPES, range(len(EXECUTION_TYPES))))
+_ORDER_STATUS_MAP = dict(zip(ORDER_STATUS, range(len(ORDER_STATUS))))
+_AGGRESSOR_MAP = dict(zip(AGGRESSOR, range(len(AGGRESSOR))))
+
+
+def date_to_int(s_date):
+    '''
+    Convert a date in the format YYYY-MM-DD to an integer YYYYMMDD
+
+    :param s_date: string. date to convert
+    '''
+    return int(s_date.replace('-', ''))
+
+
+def encode_book_row(d_row):
+    '''
+    Return a tuple matching BOOK_DTYPE from a dictionary parsed by LineParser
+
+    :param d_row: dict. row parsed by the LineParser.parse_detail_book
+    '''
+    return (date_to_int(d_row['session_date']),
+            _SIDES_MAP[d_row['order_side']],
+            d_row['seq_order_number'].encode(),
+            d_row['secondary_order_id'].encode(),
+            _EXECUTION_TYPES_MAP[d_row['execution_type']],
+            d_row['priority_time'].encode(),
+            d_row['priority_seconds'],
+            d_row['priority_indicator'],
+            d_row['order_price'],
+            d_row['org_total_qty_order'],
+            d_row['traded_qty_order'],
+            date_to_int(d_row['order_date']),
+            d_row['order_datetime_entry'].encode(),
+            _ORDER_STATUS_MAP[d_row['order_status']],
+            _AGGRESSOR_MAP[d_row['agressor_indicator']],
+            d_row['member'],
+            d_row['idx'].encode())
+
+
+def _encode_codes(na_raw, d_raw, d_codes):
+    '''
+    Map an array of raw codes from the file to the integer codes used by
+    BOOK_DTYPE, looking up each distinct value just once
+
+    :param na_raw: numpy array. raw codes, as bytes
+    :param d_raw: dict. map from raw code to label, as in the LineParser
+    :param d_codes: dict. map from label to integer code
+    '''
+    na_unique, na_inverse = np.unique(na_raw, return_inverse=True)
+    na_map = np.array([d_codes[d_raw[x.decode()]] for x in na_unique],
+                      dtype='i1')
+    return na_map[na_inverse]
+
+
+def _to_int(t_col):
+    '''
+    Convert a column of numbers (as bytes) to an integer array. Fall back to
+    int() when numpy can not convert the values directly
+
+    :param t_col: tuple. column of the file, as bytes
+    '''
+    try:
+        return np.array(t_col).astype(np.int64)
+    except ValueError:
+        return np.array([int(x) for x in t_col], dtype=np.int64)
+
+
+def _bytes_to_seconds(na_time):
+    '''
+    Convert an array of times in the format HH:MM:SS.NNN (as bytes) to
+    seconds, without parsing each string in Python
+
+    :param na_time: numpy array. times as a fixed length bytes array
+    '''
+    i_width = na_time.dtype.itemsize
+    na_u8 = na_time.view(np.uint8).reshape(-1, i_width).astype(np.int64) - 48
+    na_rtn = (na_u8[:, 0] * 10 + na_u8[:, 1]) * 3600
+    na_rtn += (na_u8[:, 3] * 10 + na_u8[:, 4]) * 60
+    # let numpy convert the SS.NNN part, so the float is the same as float()
+    na_sec = na_time.view(np.uint8).reshape(-1, i_width)[:, 6:].copy()
+    na_sec = na_sec.view('S{}'.format(i_width - 6)).ravel()
+    return na_rtn + na_sec.astype(np.float64)
+
+
+def _sort_key(row):
+    '''
+    Return the key used to sort the rows of an instrument. Equivalent to
+    `sort -t ";" -k 12,12 -k 7,7 -k 5,5`: order date, priority time and
+    secondary order id, using the whole row to break ties
+
+    :param row: bytes. a row in the file being parsed
+    '''
+    l_fields = row.split(b';')
+    if len(l_fields) < 15:
+        return (b'', b'', b'', row)
+    return (l_fields[11], l_fields[6], l_fields[4], row)
+
+
+def _write_zip(t_args):
+    '''
+    Compress the rows passed to a new zip file. Return the path to the file
+
+    :param t_args: tuple. path to the zip file, name of the file inside the
+        zip file and list of rows
+    '''
+    s_file, s_arcname, l_rows = t_args
+    with zipfile.ZipFile(s_file, mode='w',
+                         compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(s_arcname, b''.join(l_rows))
+    return s_file
+
+
+def _extract_data_job(t_args):
+    '''
+    Call extract_data using the arguments passed as a tuple. Used by the
+    process pool of extract_data_parallel
+
+    :param t_args: tuple. arguments of the extract_data function
+    '''
+    return extract_data(*t_args)
+
 '''
 End help functions
 '''
 
 
-def extract_data(s_date, s_fname, s_type, l_instr=[], b_sort=False):
+def extract_data(s_date, s_fname, s_type, l_instr=[], b_sort=True,
+                 i_threads=4):
     '''
     Extract the data from the file related to the instruments desired and
     create a zip file to each one. Also create a TXT with the instruments
     presented in the s_fname file. It is not expected that a given instrument
-    has too much data to fit in memory
+    has too much data to fit in memory, so the original file is read once and
+    the rows are sorted in memory. Return a list with the files created
 
     :param s_date: string. Date
     :param s_fname: string. Path to the file to parse
     :param s_type: string. type of the file {BID, ASK, NEG}
     :param l_instr*: list. List of strings with the instruments to be extracted
-    :param b_sort*: boolean. sort the files created using sort toll from Linux
+    :param b_sort*: boolean. sort the rows by order date, time and id
+    :param i_threads*: integer. Number of zip files compressed at once
     '''
-
-    # loop all the file
     set_instruments = set()
-    # create a list of files to save the information
-    d_files = {}
+    set_instr = set(l_instr)
+    d_rows = dict((s_instr, []) for s_instr in l_instr)
+    l_header = []
+    l_trailer = []
+    row = b''
     s_path = os.path.dirname(os.path.abspath(s_fname))
     s_path = s_path.split('/original')[0]
-    for s_instr in l_instr:
-        s_file = s_path + '/temp/{}/{}_raw.txt'
-        d_files[s_instr] = open(s_file.format(s_date, s_instr), 'w')
 
+    # read the file just once, splitting the rows by instrument
     myParser = LineParser(s_type)
+    d_header = {}
     with zipfile.ZipFile(s_fname, 'r') as archive:
         fr = archive.open(archive.infolist()[0])
-        for idx, row in enumerate(fr):
-            d_aux = myParser(row)
-            if myParser.last_identification == 'MSG':
+        for row in fr:
+            if row[-1:] != b'\n':
+                row += b'\n'
+            l_fields = row.split(b';', 2)
+            if len(l_fields) == 3 and l_fields[0][:2] not in (b'RH', b'RT'):
+                s_instr = l_fields[1].replace(b' ', b'').decode()
+            else:
+                d_aux = myParser(row)
+                if myParser.last_identification == 'RH':
+                    d_header = d_aux
+                    l_header.append(row)
+                    continue
+                elif myParser.last_identification == 'RT':
+                    d_header = d_aux
+                    continue
                 s_instr = d_aux['instrument_symbol']
-                set_instruments.add(s_instr)
-                # include rows just in desired instruments
-                if d_aux['instrument_symbol'] in l_instr:
-                    d_files[s_instr].write(row)
-            elif myParser.last_identification == 'RH':
-                # include the header in all files
-                for s_intr in l_instr:
-                    d_files[s_intr].write(row)
+            set_instruments.add(s_instr)
+            # include rows just in desired instruments
+            if s_instr in set_instr:
+                d_rows[s_instr].append(row)
         fr.close()
-
-    if myParser.last_identification == 'RT':
-        # last row of all files
-        for s_intr in l_instr:
-            d_files[s_intr].write(row)
-            d_files[s_intr].close()
+    # the trailer is the last row of all files, if the file ends with one
+    if row[:2] == b'RT':
+        l_trailer.append(row)
 
     # save a list of the instruments in the file
-    s_file_instr = s_path + '/temp/{:%Y%m%d}/{:%Y%m%d}_{}_INSTR.txt'
-    ts_date = d_aux['end_date']
-    s_file_instr = s_file_instr.format(ts_date, ts_date, myParser.s_file_type)
+    ts_date = d_header['end_date']
+    s_folder = s_path + '/temp/{:%Y%m%d}'.format(ts_date)
+    if not os.path.isdir(s_folder):
+        os.makedirs(s_folder)
+    s_file_instr = s_folder + '/{:%Y%m%d}_{}_INSTR.txt'
+    s_file_instr = s_file_instr.format(ts_date, myParser.s_file_type)
     df_instr = pd.Series(list(set_instruments))
     df_instr.sort_values(inplace=True)
     df_instr.to_csv(s_file_instr, sep='\t', index=False)
 
-    # criate zipfiles
-    i_count = 1
+    # sort the rows of each instrument and compress them in parallel
+    l_jobs = []
     for s_instr in l_instr:
-        s_file = s_path + '/temp/{:%Y%m%d}/{:%Y%m%d}_{}_{}.zip'
-        s_file = s_file.format(d_aux['end_date'],
-                               d_aux['end_date'],
-                               myParser.s_file_type,
-                               s_instr)
-        zf = zipfile.ZipFile(s_file,
-                             mode='w',
-                             compression=zipfile.ZIP_DEFLATED,
-                             )
-        # s_command = 'sort -t $";" -k 5 -o {} {}'
-        s_command = 'sort -t $";" -k 12,12 -k 7,7 -k 5,5 -o {} {}'
-        s_file2 = s_path + '/temp/{:%Y%m%d}/{}.txt'
-        s_file3 = s_path + '/temp/{:%Y%m%d}/{}_raw.txt'
-        s_command = s_command.format(s_file2.format(ts_date, s_instr),
-                                     s_file3.format(ts_date, s_instr))
-        subprocess.check_output(['bash', '-c', s_command])
-        zf.write(s_file2.format(ts_date, s_instr))
-        # close the files and clean the memory
-        zf.close()
-        os.remove(s_file3.format(ts_date, s_instr))
-        os.remove(s_file2.format(ts_date, s_instr))
-        i_count += 1
+        l_rows = d_rows.pop(s_instr)
+        if b_sort:
+            l_rows.sort(key=_sort_key)
+        s_file = s_folder + '/{:%Y%m%d}_{}_{}.zip'
+        s_file = s_file.format(ts_date, myParser.s_file_type, s_instr)
+        s_arcname = '{}.txt'.format(s_instr)
+        l_jobs.append((s_file, s_arcname, l_header + l_rows + l_trailer))
+    if i_threads > 1 and len(l_jobs) > 1:
+        # zlib releases the GIL, so threads are enough to compress in parallel
+        pool = ThreadPool(min(i_threads, len(l_jobs)))
+        try:
+            l_rtn = pool.map(_write_zip, l_jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        l_rtn = [_write_zip(t_job) for t_job in l_jobs]
     # print succcess message
-    print('{} files created'.format(i_count))
+    print('{} files created'.format(len(l_rtn)))
+    return l_rtn
+
+
+def extract_data_parallel(l_jobs, i_processes=None, i_threads=1):
+    '''
+    Run extract_data to each job passed using a pool of processes. Return a
+    list with the files created by each job
+
+    :param l_jobs: list. tuples with the s_date, s_fname, s_type and l_instr
+        arguments of extract_data
+    :param i_processes*: integer. Number of processes. Use all cpus if None
+    :param i_threads*: integer. Number of zip files compressed at once by job
+    '''
+    l_args = [tuple(t_job[:4]) + (True, i_threads) for t_job in l_jobs]
+    pool = multiprocessing.Pool(i_processes)
+    try:
+        l_rtn = pool.map(_extract_data_job, l_args, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return l_rtn
 
 
 class LineParser(object):
@@ -277,10 +457,8 @@ class LineParser(object):
         d_rtn['execution_type'] = self.d_valid_values[l_data[5]]
         # Order time entry in system (HH:MM:SS.NNN) used as priority indicator
         s_aux = l_data[6]
-        f_aux = int(s_aux[0:2])*60*60 + int(s_aux[3:5])*60 + int(s_aux[6:8])
-        f_aux += float(s_aux[9:])/10**6
-        f_aux = sum([float(xx)*60**(2-ii) for ii, xx in
-                    enumerate(s_aux.split(':'))])
+        s_hour, s_min, s_sec = s_aux.split(':')
+        f_aux = int(s_hour)*60*60 + int(s_min)*60 + float(s_sec)
         d_rtn['priority_time'] = s_aux
         d_rtn['priority_seconds'] = f_aux
         # Priority indicator
@@ -344,3 +522,124 @@ class LineParser(object):
         else:
             raise NoMappedException()
         return d_rtn
+
+
+class BookChunkParser(object):
+    '''
+    Parse blocks of rows from the OFER_CPA and OFER_VDA files at once into a
+    NumPy structured array (BOOK_DTYPE). Each column is converted in bulk,
+    instead of building a dictionary for each row as the LineParser does
+    '''
+    def __init__(self, s_file_type, i_chunk_bytes=2**24):
+        '''
+        Initialize a BookChunkParser object
+
+        :param s_file_type: string. BID or ASK
+        :param i_chunk_bytes*: integer. Approximate size of each chunk read
+        '''
+        if s_file_type not in ['BID', 'ASK']:
+            raise NoValidTypeException()
+        self.s_file_type = s_file_type
+        self.i_chunk_bytes = i_chunk_bytes
+        self.line_parser = LineParser(s_file_type)
+
+    def _parse_rows_by_line(self, l_rows):
+        '''
+        Parse the rows using the LineParser. Used when the rows are not in the
+        layout separated by semicolons
+
+        :param l_rows: list. rows from the file, as bytes
+        '''
+        l_rtn = []
+        for row in l_rows:
+            if not row.strip():
+                continue
+            d_aux = self.line_parser(row)
+            if self.line_parser.last_identification == 'MSG':
+                l_rtn.append(encode_book_row(d_aux))
+        return np.array(l_rtn, dtype=BOOK_DTYPE)
+
+    def parse_rows(self, l_rows):
+        '''
+        Return a structured array with the messages in the rows passed. Header
+        and trailer rows are dropped
+
+        :param l_rows: list. rows from the file, as bytes
+        '''
+        l_fields = [row.strip().split(b';') for row in l_rows]
+        if any(len(l_aux) == 1 and l_aux[0] for l_aux in l_fields):
+            return self._parse_rows_by_line(l_rows)
+        l_fields = [l_aux for l_aux in l_fields if len(l_aux) >= 15]
+        na_rtn = np.zeros(len(l_fields), dtype=BOOK_DTYPE)
+        if not l_fields:
+            return na_rtn
+        l_cols = list(zip(*l_fields))
+        # dates and identifiers
+        na_session = np.array(l_cols[0])
+        na_order_date = np.array(l_cols[11])
+        na_rtn['session_date'] = _to_int(np.char.replace(
+            na_session, b'-', b''))
+        na_rtn['order_date'] = _to_int(np.char.replace(
+            na_order_date, b'-', b''))
+        # keep the ids as in the file, so leading zeros are not lost
+        na_rtn['seq_order_number'] = np.array(l_cols[3])
+        na_rtn['secondary_order_id'] = np.array(l_cols[4])
+        na_rtn['priority_indicator'] = _to_int(l_cols[7]) * 100
+        # idx is the order date (YYMMDD) followed by the secondary id digits
+        # after the 6th one
+        na_rtn['idx'] = [s_date[2:4] + s_date[5:7] + s_date[8:10] + s_sec[6:]
+                         for s_date, s_sec in zip(l_cols[11], l_cols[4])]
+        # times
+        na_ptime = np.array(l_cols[6])
+        na_rtn['priority_time'] = na_ptime
+        na_psec = _bytes_to_seconds(na_ptime)
+        # NOTE: in Bovespa, orders from prior days mess up the flow
+        na_psec[na_rtn['session_date'] != na_rtn['order_date']] = 8*60*60.
+        na_rtn['priority_seconds'] = na_psec
+        na_rtn['order_datetime_entry'] = np.array(l_cols[12])
+        # prices and quantities
+        na_rtn['order_price'] = np.char.replace(
+            np.array(l_cols[8]), b' ', b'').astype(np.float64)
+        na_rtn['org_total_qty_order'] = _to_int(l_cols[9])
+        na_rtn['traded_qty_order'] = _to_int(l_cols[10])
+        na_rtn['member'] = _to_int(l_cols[15])
+        # categorical fields
+        p = self.line_parser
+        na_rtn['order_side'] = _encode_codes(
+            np.array(l_cols[2]), p.d_side, _SIDES_MAP)
+        na_rtn['execution_type'] = _encode_codes(
+            np.array(l_cols[5]), p.d_valid_values, _EXECUTION_TYPES_MAP)
+        na_rtn['order_status'] = _encode_codes(
+            np.array(l_cols[13]), p.d_order_status, _ORDER_STATUS_MAP)
+        na_rtn['agressor_indicator'] = _encode_codes(
+            np.array(l_cols[14]), p.d_aggressor, _AGGRESSOR_MAP)
+        return na_rtn
+
+    def iter_chunks(self, fr):
+        '''
+        Return a generator of structured arrays, each one related to a chunk
+        of the opened file passed
+
+        :param fr: file object. opened file, as the ZipExtFile
+        '''
+        while True:
+            l_rows = fr.readlines(self.i_chunk_bytes)
+            if not l_rows:
+                break
+            na_chunk = self.parse_rows(l_rows)
+            if len(na_chunk):
+                yield na_chunk
+
+    def parse_file(self, s_fname):
+        '''
+        Return a structured array with all the messages of the zipped file
+
+        :param s_fname: string. Path to the zipped file
+        '''
+        with zipfile.ZipFile(s_fname, 'r') as archive:
+            fr = archive.open(archive.infolist()[0])
+            l_chunks = list(self.iter_chunks(fr))
+            fr.close()
+        if not l_chunks:
+            return np.zeros(0, dtype=BOOK_DTYPE)
+        return np.concatenate(l_chunks)
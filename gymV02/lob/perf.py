@@ -0,0 +1,174 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Implement low-overhead counters to measure where the time of a simulation goes.
+Each stage (parsing, book updates, translator, agent code...) accumulates the
+number of events and, for a sample of them, the time spent using a monotonic
+clock
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import time
+
+
+'''
+Begin help functions
+'''
+
+# monotonic clock with the best resolution available
+try:
+    CLOCK = time.perf_counter
+except AttributeError:
+    CLOCK = time.time  # py2
+
+'''
+End help functions
+'''
+
+
+class PerfCounters(object):
+    '''
+    Accumulate event counts and elapsed times by stage and instrument. Just
+    1 of each i_sample events of a stage is timed, and the total time of the
+    stage is estimated from them
+    '''
+    def __init__(self, b_enabled=False, i_sample=64):
+        '''
+        Initialize a PerfCounters object
+
+        :param b_enabled*: boolean. If should count anything
+        :param i_sample*: integer. Time 1 of each i_sample events. Use 1 to
+            time all of them
+        '''
+        self.configure(b_enabled, i_sample)
+
+    def configure(self, b_enabled, i_sample=64):
+        '''
+        Enable or disable the counters and reset them
+
+        :param b_enabled: boolean. If should count anything
+        :param i_sample*: integer. Time 1 of each i_sample events
+        '''
+        self.b_enabled = b_enabled
+        self.i_sample = max(int(i_sample), 1)
+        self.reset()
+
+    def reset(self):
+        '''
+        Reset all counters
+        '''
+        self.d_count = {}  # (stage, instrument): number of events
+        self.d_timed = {}  # (stage, instrument): number of events timed
+        self.d_time = {}  # (stage, instrument): seconds of the events timed
+        self.f_start = CLOCK()
+
+    def count(self, s_stage, s_instr=None, i_events=1):
+        '''
+        Count events of a stage that are not timed
+
+        :param s_stage: string. name of the stage
+        :param s_instr*: string. instrument related to the events
+        :param i_events*: integer. number of events
+        '''
+        if not self.b_enabled:
+            return
+        t_key = (s_stage, s_instr)
+        self.d_count[t_key] = self.d_count.get(t_key, 0) + i_events
+
+    def start(self, s_stage, s_instr=None):
+        '''
+        Count an event of the stage passed. Return the current time if the
+        event should be timed or None
+
+        :param s_stage: string. name of the stage
+        :param s_instr*: string. instrument related to the event
+        '''
+        if not self.b_enabled:
+            return None
+        t_key = (s_stage, s_instr)
+        i_count = self.d_count.get(t_key, 0) + 1
+        self.d_count[t_key] = i_count
+        if i_count % self.i_sample:
+            return None
+        return CLOCK()
+
+    def stop(self, s_stage, s_instr, f_start):
+        '''
+        Accumulate the time of an event started by start()
+
+        :param s_stage: string. name of the stage
+        :param s_instr: string. instrument related to the event
+        :param f_start: float. value returned by start()
+        '''
+        if f_start is None:
+            return
+        f_elapsed = CLOCK() - f_start
+        t_key = (s_stage, s_instr)
+        self.d_time[t_key] = self.d_time.get(t_key, 0.) + f_elapsed
+        self.d_timed[t_key] = self.d_timed.get(t_key, 0) + 1
+
+    def _stage_stats(self, i_count, i_timed, f_time):
+        '''
+        Return a dictionary with the statistics of a stage
+
+        :param i_count: integer. number of events
+        :param i_timed: integer. number of events timed
+        :param f_time: float. seconds of the events timed
+        '''
+        f_us = f_time / i_timed * 1e6 if i_timed else 0.
+        return {'count': i_count,
+                'timed': i_timed,
+                'us_per_event': f_us,
+                'total_s': f_us * i_count / 1e6}
+
+    def get_stats(self):
+        '''
+        Return a dictionary with the statistics of each stage, with the
+        breakdown by instrument, and the wall time since the last reset
+        '''
+        f_wall = CLOCK() - self.f_start
+        d_stages = {}
+        for (s_stage, s_instr), i_count in self.d_count.items():
+            d_stage = d_stages.setdefault(
+                s_stage, {'count': 0, 'timed': 0, 'time': 0.,
+                          'instruments': {}})
+            i_timed = self.d_timed.get((s_stage, s_instr), 0)
+            f_time = self.d_time.get((s_stage, s_instr), 0.)
+            d_stage['count'] += i_count
+            d_stage['timed'] += i_timed
+            d_stage['time'] += f_time
+            if s_instr is not None:
+                d_stage['instruments'][s_instr] = self._stage_stats(
+                    i_count, i_timed, f_time)
+        d_rtn = {'wall_s': f_wall, 'stages': {}}
+        for s_stage, d_stage in d_stages.items():
+            d_aux = self._stage_stats(d_stage['count'], d_stage['timed'],
+                                      d_stage['time'])
+            d_aux['per_second'] = d_stage['count'] / f_wall if f_wall else 0.
+            if d_stage['instruments']:
+                d_aux['instruments'] = d_stage['instruments']
+            d_rtn['stages'][s_stage] = d_aux
+        return d_rtn
+
+    def format_stats(self):
+        '''
+        Return a string with one line by stage, to be logged
+        '''
+        d_stats = self.get_stats()
+        l_rtn = ['wall time {:0.2f} s'.format(d_stats['wall_s'])]
+        s_line = '{:<12} {:>12,d} events {:>12,.1f}/s {:>10,.2f} us/event'
+        s_line += ' {:>8,.2f} s'
+        for s_stage in sorted(d_stats['stages']):
+            d_aux = d_stats['stages'][s_stage]
+            l_rtn.append(s_line.format(s_stage, d_aux['count'],
+                                       d_aux['per_second'],
+                                       d_aux['us_per_event'],
+                                       d_aux['total_s']))
+        return '\n'.join(l_rtn)
+
+
+# disabled counters used by the books created without an environment
+NO_PERF = PerfCounters()
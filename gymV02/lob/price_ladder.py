@@ -0,0 +1,335 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Implement a price ladder: a dense array of price levels indexed by the number
+of ticks from a moving anchor. It can replace the FastRBTree used as the
+price_tree of a BookSide when the prices are keyed by integer ticks
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import math
+from bintrees import FastRBTree
+
+
+'''
+Begin help functions
+'''
+
+
+class InvalidKeyException(Exception):
+    """
+    InvalidKeyException is raised by the PriceLadder class to indicate that
+    the key passed is not an integer number of ticks
+    """
+    pass
+
+'''
+End help functions
+'''
+
+
+class PriceLadder(object):
+    '''
+    A dense array of price levels around the best price of a book side. Price
+    levels too far from the anchor are kept in a FastRBTree. It mimics the
+    parts of the FastRBTree interface used by the BookSide, the translator and
+    the LimitOrderBook
+    '''
+    def __init__(self, b_max_is_best, i_size=2048):
+        '''
+        Initialize a PriceLadder object
+
+        :param b_max_is_best: boolean. True to the bid side, where the best
+            price is the greatest key. False to the ask side
+        :param i_size*: integer. Number of ticks covered by the array
+        '''
+        self.b_max_is_best = b_max_is_best
+        self.i_size = i_size
+        self.l_levels = [None] * i_size
+        self.i_base = None  # key of the first slot
+        self.i_ladder_count = 0
+        self.i_max_idx = -1  # slot of the greatest key in the array
+        self.i_min_idx = i_size  # slot of the smallest key in the array
+        self.far_tree = FastRBTree()
+
+    @property
+    def count(self):
+        '''
+        Return the number of price levels
+        '''
+        return self.i_ladder_count + self.far_tree.count
+
+    def __len__(self):
+        return self.count
+
+    def _slot(self, key):
+        '''
+        Return the index of the key in the array or -1 if it is out of it
+
+        :param key: integer. number of ticks of the price
+        '''
+        if self.i_base is None:
+            return -1
+        i_idx = key - self.i_base
+        if 0 <= i_idx < self.i_size:
+            return i_idx
+        return -1
+
+    def _recenter(self, key):
+        '''
+        Move the anchor of the array so the key passed is in its middle. All
+        levels are redistributed between the array and the far tree
+
+        :param key: integer. number of ticks of the new center
+        '''
+        l_items = list(self.items())
+        self.l_levels = [None] * self.i_size
+        self.i_ladder_count = 0
+        self.i_max_idx = -1
+        self.i_min_idx = self.i_size
+        self.far_tree = FastRBTree()
+        self.i_base = key - self.i_size // 2
+        for i_key, obj_level in l_items:
+            self._insert(i_key, obj_level)
+
+    def _should_recenter(self, key):
+        '''
+        Check if the anchor should move to the key passed, that is out of the
+        array. It moves when the key is the new best price or when the current
+        best price is already out of the array
+
+        :param key: integer. number of ticks of the price
+        '''
+        if not self.i_ladder_count:
+            return True
+        if self.b_max_is_best:
+            i_best = self.max_key()
+            return key > i_best or self._slot(i_best) < 0
+        i_best = self.min_key()
+        return key < i_best or self._slot(i_best) < 0
+
+    def _insert(self, key, value):
+        '''
+        Insert the value in the array, or in the far tree if the key is out of
+        the array
+
+        :param key: integer. number of ticks of the price
+        :param value: PriceLevel object.
+        '''
+        i_idx = self._slot(key)
+        if i_idx < 0:
+            self.far_tree.insert(key, value)
+            return
+        if self.l_levels[i_idx] is None:
+            self.i_ladder_count += 1
+        self.l_levels[i_idx] = value
+        if i_idx > self.i_max_idx:
+            self.i_max_idx = i_idx
+        if i_idx < self.i_min_idx:
+            self.i_min_idx = i_idx
+
+    def get(self, key, default=None):
+        '''
+        Return the price level of the key passed or default
+
+        :param key: integer. number of ticks of the price
+        :param default*: object. value returned when the key is not found
+        '''
+        i_idx = self._slot(key)
+        if i_idx >= 0:
+            obj_rtn = self.l_levels[i_idx]
+            if obj_rtn is None:
+                return default
+            return obj_rtn
+        return self.far_tree.get(key, default)
+
+    def insert(self, key, value):
+        '''
+        Insert a price level. Move the anchor if the key is out of the array
+        and it is the new best price or the array is empty
+
+        :param key: integer. number of ticks of the price
+        :param value: PriceLevel object.
+        '''
+        if not isinstance(key, int):
+            raise InvalidKeyException('PriceLadder keys should be integers')
+        if self.i_base is None:
+            self.i_base = key - self.i_size // 2
+        elif self._slot(key) < 0 and self._should_recenter(key):
+            self._recenter(key)
+        self._insert(key, value)
+
+    def remove(self, key):
+        '''
+        Remove the price level of the key passed. Raise KeyError if not found
+
+        :param key: integer. number of ticks of the price
+        '''
+        i_idx = self._slot(key)
+        if i_idx < 0:
+            self.far_tree.remove(key)
+            return
+        if self.l_levels[i_idx] is None:
+            raise KeyError(str(key))
+        self.l_levels[i_idx] = None
+        self.i_ladder_count -= 1
+        if self.i_ladder_count == 0:
+            self.i_max_idx = -1
+            self.i_min_idx = self.i_size
+            return
+        # walk to the next level occupied, if it was one of the extremes
+        l_levels = self.l_levels
+        if i_idx == self.i_max_idx:
+            while l_levels[self.i_max_idx] is None:
+                self.i_max_idx -= 1
+        if i_idx == self.i_min_idx:
+            while l_levels[self.i_min_idx] is None:
+                self.i_min_idx += 1
+
+    def max_key(self):
+        '''
+        Return the greatest key. Raise ValueError if empty
+        '''
+        return self.max_item()[0]
+
+    def min_key(self):
+        '''
+        Return the smallest key. Raise ValueError if empty
+        '''
+        return self.min_item()[0]
+
+    def max_item(self):
+        '''
+        Return the (key, PriceLevel) with the greatest key
+        '''
+        if self.far_tree.count:
+            t_far = self.far_tree.max_item()
+            if not self.i_ladder_count or t_far[0] > self.i_base:
+                return t_far
+        if not self.i_ladder_count:
+            raise ValueError('PriceLadder is empty')
+        i_idx = self.i_max_idx
+        return (self.i_base + i_idx, self.l_levels[i_idx])
+
+    def min_item(self):
+        '''
+        Return the (key, PriceLevel) with the smallest key
+        '''
+        if self.far_tree.count:
+            t_far = self.far_tree.min_item()
+            if not self.i_ladder_count or t_far[0] < self.i_base:
+                return t_far
+        if not self.i_ladder_count:
+            raise ValueError('PriceLadder is empty')
+        i_idx = self.i_min_idx
+        return (self.i_base + i_idx, self.l_levels[i_idx])
+
+    def _iter_ladder(self, i_min, i_max, reverse):
+        '''
+        Return a generator of (key, PriceLevel) in the array, between the
+        slots passed (inclusive)
+
+        :param i_min: integer. first slot
+        :param i_max: integer. last slot
+        :param reverse: boolean. If should iterate from the greatest key
+        '''
+        i_min = max(i_min, self.i_min_idx)
+        i_max = min(i_max, self.i_max_idx)
+        if i_min > i_max:
+            return
+        l_levels = self.l_levels
+        i_base = self.i_base
+        if reverse:
+            for i_idx in range(i_max, i_min - 1, -1):
+                obj_level = l_levels[i_idx]
+                if obj_level is not None:
+                    yield (i_base + i_idx, obj_level)
+        else:
+            for i_idx in range(i_min, i_max + 1):
+                obj_level = l_levels[i_idx]
+                if obj_level is not None:
+                    yield (i_base + i_idx, obj_level)
+
+    def item_slice(self, start_key, end_key, reverse=False):
+        '''
+        Return a generator of (key, PriceLevel) with start_key <= key <
+        end_key, as FastRBTree.item_slice
+
+        :param start_key: number. the lower key (inclusive)
+        :param end_key: number. the upper key (exclusive)
+        :param reverse*: boolean. If should iterate from the greatest key
+        '''
+        if self.i_base is None:
+            return iter(self.far_tree.item_slice(start_key, end_key, reverse))
+        i_top = self.i_base + self.i_size
+        l_gens = []
+        # keys below the array
+        if start_key < self.i_base:
+            l_gens.append(self.far_tree.item_slice(
+                start_key, min(end_key, self.i_base), reverse))
+        # keys in the array
+        i_start = max(start_key, self.i_base)
+        i_end = min(end_key, i_top)
+        if i_start < i_end:
+            i_first = int(math.ceil(i_start)) - self.i_base
+            i_last = int(math.ceil(i_end)) - self.i_base - 1
+            l_gens.append(self._iter_ladder(i_first, i_last, reverse))
+        # keys above the array
+        if end_key > i_top:
+            l_gens.append(self.far_tree.item_slice(
+                max(start_key, i_top), end_key, reverse))
+        if reverse:
+            l_gens = l_gens[::-1]
+        return (t_item for gen in l_gens for t_item in gen)
+
+    def items(self, reverse=False):
+        '''
+        Return a generator of all (key, PriceLevel) sorted by key
+
+        :param reverse*: boolean. If should iterate from the greatest key
+        '''
+        if self.i_base is None:
+            return iter(self.far_tree.items(reverse=reverse))
+        i_start = self.i_base
+        i_end = self.i_base + self.i_size
+        if self.far_tree.count:
+            i_start = min(i_start, self.far_tree.min_key())
+            i_end = max(i_end, self.far_tree.max_key() + 1)
+        return self.item_slice(i_start, i_end, reverse)
+
+    def keys(self, reverse=False):
+        '''
+        Return a generator of all the keys, sorted
+
+        :param reverse*: boolean. If should iterate from the greatest key
+        '''
+        return (t_item[0] for t_item in self.items(reverse))
+
+    def nlargest(self, n):
+        '''
+        Return a list with the n (key, PriceLevel) of greatest keys
+
+        :param n: integer. Number of items
+        '''
+        l_rtn = []
+        for t_item in self.items(reverse=True):
+            if len(l_rtn) >= n:
+                break
+            l_rtn.append(t_item)
+        return l_rtn
+
+    def nsmallest(self, n):
+        '''
+        Return a list with the n (key, PriceLevel) of smallest keys
+
+        :param n: integer. Number of items
+        '''
+        l_rtn = []
+        for t_item in self.items(reverse=False):
+            if len(l_rtn) >= n:
+                break
+            l_rtn.append(t_item)
+        return l_rtn
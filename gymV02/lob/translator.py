@@ -8,6 +8,7 @@ Translate messages from files and from agents to the matching engine
 Created on 10/24/2016
 """
 
+import itertools
 import numpy as np
 from neutrinogym import neutrino
 # import pprint
@@ -32,18 +33,20 @@ def translate_trades(row, my_book):
     if row['order_side'] == 'Buy Order':
         if not my_book.best_bid:
             return l_msg
+        this_side = my_book.book_bid
         f_best_price = my_book.best_bid[0]
-        f_max = f_best_price + 0.01
-        f_min = row['order_price']
+        f_min, f_max = my_book.book_bid.price_range(row['order_price'],
+                                                    f_best_price)
         gen_bk = my_book.book_bid.price_tree.item_slice(f_min,
                                                         f_max,
                                                         reverse=True)
     else:
         if not my_book.best_ask:
             return l_msg
+        this_side = my_book.book_ask
         f_best_price = my_book.best_ask[0]
-        f_max = row['order_price'] + 0.01
-        f_min = f_best_price
+        f_min, f_max = my_book.book_ask.price_range(f_best_price,
+                                                    row['order_price'])
         gen_bk = my_book.book_ask.price_tree.item_slice(f_min,
                                                         f_max,
                                                         reverse=False)
@@ -52,12 +55,30 @@ def translate_trades(row, my_book):
     b_neutrino_order = False
     if not gen_bk:
         return None
+    # fast path: solve the trade looking just at the first price level, as
+    # the loop below does, when the row is the first order of the level or
+    # when the level has no order from the agents
+    t_first = next(iter(gen_bk), None)
+    if t_first is None:
+        return [row]
+    obj_first = t_first[1]
+    if obj_first.order_tree.min_item()[1].name == row['seq_order_number']:
+        return [row]
+    if not my_book.b_secure_changes:
+        if not this_side.has_agent_orders(obj_first.key):
+            order_aux = this_side.d_order_map.get(
+                int(row['seq_order_number']), None)
+            if order_aux is None or order_aux.key != obj_first.key:
+                i_count = min(obj_first.order_tree.count, 1000)
+                my_book.i_count_correction_by_trades += i_count
+                return [row]
+    gen_bk = itertools.chain([t_first], gen_bk)
     l_msg_debug = []
     for f_price, obj_price in gen_bk:
         # assert obj_price.order_tree.count <= 2, 'More than two offers'
         for idx_ord, obj_order in obj_price.order_tree.nsmallest(1000):
             # check if the order Id is different from the message
-            d_compare = obj_order.d_msg
+            d_compare = obj_order
             if row['seq_order_number'] != d_compare['seq_order_number']:
                 my_book.i_count_correction_by_trades += 1
                 # create a trade to fill that order
@@ -223,7 +244,7 @@ def correct_books(my_book):
                 s_symbol = my_book.d_bid['instrument_symbol']
                 for idx_ord, obj_order in obj_price.order_tree.nsmallest(1000):
                     # check if the order Id is different from the message
-                    d_compare = obj_order.d_msg
+                    d_compare = obj_order
                     # create a trade to fill that order
                     i_org_qty = d_compare['org_total_qty_order']
                     i_traded_qty = d_compare['traded_qty_order']
@@ -323,7 +344,7 @@ def correct_books_new(my_book):
                 s_symbol = my_book.d_bid['instrument_symbol']
                 for idx_ord, obj_order in obj_price.order_tree.nsmallest(1000):
                     # check if the order Id is different from the message
-                    d_compare = obj_order.d_msg
+                    d_compare = obj_order
                     # create a trade to fill that order
                     i_org_qty = d_compare['org_total_qty_order']
                     i_traded_qty = d_compare['traded_qty_order']
@@ -393,15 +414,15 @@ def translate_trades_to_agent(row, my_book):
     s_side = row['order_side']
     if row['order_side'] == 'Sell Order':
         f_best_price = my_book.best_bid[0]
-        f_max = f_best_price + 0.01
-        f_min = row['order_price']
+        f_min, f_max = my_book.book_bid.price_range(row['order_price'],
+                                                    f_best_price)
         gen_bk = my_book.book_bid.price_tree.item_slice(f_min,
                                                         f_max,
                                                         reverse=True)
     else:
         f_best_price = my_book.best_ask[0]
-        f_max = row['order_price'] + 0.01
-        f_min = f_best_price
+        f_min, f_max = my_book.book_ask.price_range(f_best_price,
+                                                    row['order_price'])
         gen_bk = my_book.book_ask.price_tree.item_slice(f_min,
                                                         f_max,
                                                         reverse=False)
@@ -415,7 +436,7 @@ def translate_trades_to_agent(row, my_book):
         if b_stop:
             break
         for idx_ord, obj_order in obj_price.order_tree.nsmallest(1000):
-            order_aux = obj_order.d_msg
+            order_aux = obj_order
 
             # define how much should be traded
             i_qty_traded = order_aux['total_qty_order']  # remain
@@ -440,7 +461,7 @@ def translate_trades_to_agent(row, my_book):
                 s_action = 'BUY'
             s_action += '_crossed'
             # create a trade to fill that order
-            d_new_msg = order_aux.copy()
+            d_new_msg = order_aux.d_msg
             i_sec_order = my_book.i_sec_ask
             if order_aux['order_side'] == 'Buy Order':
                 i_sec_order = my_book.i_sec_bid
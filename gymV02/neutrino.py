@@ -45,28 +45,51 @@ def gen_uuid(size=16):
 
 def byPrice(book_side, i_depth):
     '''
-    Return the nth top prices of the order book side passed
+    Return the nth top prices of the order book side passed. The lists are
+    cached until one of the sides of the book changes, so a copy is returned
 
     :param side_obj: Book Side object.
     '''
-    i_depth2 = max(i_depth, 7)
     book_aux = book_side.this_side
-    l_rtn = book_aux.get_n_top_prices(i_depth2, b_return_dataframe=False)
     f_price_to_filer = book_aux.other_side.best_queue[0]
+    t_seq = (book_aux.i_seq, book_aux.other_side.i_seq, f_price_to_filer)
+    if book_side._t_by_price_seq != t_seq:
+        book_side._t_by_price_seq = t_seq
+        book_side._d_by_price = {}
+    l_rtn = book_side._d_by_price.get(i_depth, None)
+    if l_rtn is None:
+        l_rtn = _by_price(book_aux, i_depth, f_price_to_filer)
+        book_side._d_by_price[i_depth] = l_rtn
+    return list(l_rtn)
+
+
+def _by_price(book_aux, i_depth, f_price_to_filer):
+    '''
+    Return the nth top prices of the order book side passed, reading them from
+    the depth snapshot of the side
+
+    :param book_aux: BookSide object.
+    :param i_depth: integer. Maximum depth
+    :param f_price_to_filer: float. Best price of the other side
+    '''
+    i_depth2 = max(i_depth, 7)
+    # compare the keys of the price tree, converting to prices just the output
+    na_key, na_price, na_qty, _ = book_aux.get_depth(i_depth2, b_keys=True)
     if not f_price_to_filer:
         return [QueueInfo(0, None)]
+    key_to_filter = book_aux.price_key(f_price_to_filer)
     if book_aux.s_side == 'BID':
-        l_rtn1 = [QueueInfo(x[1].i_qty, x[0]) for x in l_rtn
-                  if x[0] < f_price_to_filer]
+        na_mask = na_key < key_to_filter
     else:
-        l_rtn1 = [QueueInfo(x[1].i_qty, x[0]) for x in l_rtn
-                  if x[0] > f_price_to_filer]
+        na_mask = na_key > key_to_filter
+    l_rtn1 = [QueueInfo(i_qty, f_price) for i_qty, f_price in
+              zip(na_qty[na_mask][:i_depth].tolist(),
+                  na_price[na_mask][:i_depth].tolist())]
     if len(l_rtn1) == 0:
-        if len(l_rtn) == 0:
+        if len(na_key) == 0:
             return [QueueInfo(0, None)]
-        x = l_rtn[-1]
-        return [QueueInfo(x[1].i_qty, x[0])]
-    return l_rtn1[:i_depth]
+        return [QueueInfo(int(na_qty[-1]), float(na_price[-1]))]
+    return l_rtn1
 
 
 class Side(Enum):
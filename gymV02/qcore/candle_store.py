@@ -0,0 +1,434 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Compute offline the candles and the most common indicators of each instrument
+of a trading day, saving them as memory-mappable arrays, so the candles can be
+backfilled with the bars before the start of a simulation and bar-driven
+backtests do not need to replay the books
+
+@author: ucaiado
+
+Created on 10/18/2026
+'''
+# import libraries
+import datetime
+import json
+import os
+import numpy as np
+from neutrinogym.lob import book
+from neutrinogym.lob import event_log
+from . import data_feeder
+
+
+'''
+Begin help functions
+'''
+
+BAR_DTYPE = np.dtype([('instrument', 'i2'),
+                      ('interval', 'i4'),
+                      ('time', 'f8')] +
+                     [(s_field, 'f8') for s_field in
+                      data_feeder.CANDLE_FIELDS])
+
+# indicators computed by default, as TYPE:conf. The symbol and the interval
+# are included for each candle
+DEFAULT_INDICATORS = ['SMA:input=close;time_period=20',
+                      'EMA:input=close;time_period=20',
+                      'STDDEV:input=close;time_period=20',
+                      'BBANDS:matype=0;nbdevdn=2;nbdevup=2;time_period=20',
+                      'RSI:input=close;time_period=14',
+                      'ATR:time_period=14',
+                      'ADX:time_period=14']
+
+
+def get_store_path(s_file):
+    '''
+    Return the path to the candle store of the day related to the file format
+    passed, as the ones used by the Env ('{date}/{date}_{}_{}_new.zip')
+
+    :param s_file: string. Format of the name of the zip files of the day
+    '''
+    s_folder = os.path.dirname(s_file)
+    s_date = os.path.basename(s_file).split('_')[0]
+    return os.path.join(s_folder, s_date + '_CANDLES.npy')
+
+
+def _get_meta_path(s_store):
+    '''
+    Return the path to the JSON with the metadata of the candle store
+
+    :param s_store: string. Path to the candle store
+    '''
+    return os.path.splitext(s_store)[0] + '.json'
+
+
+def _get_ta_path(s_store):
+    '''
+    Return the path to the values of the indicators of the candle store
+
+    :param s_store: string. Path to the candle store
+    '''
+    return os.path.splitext(s_store)[0] + '_TA.npy'
+
+
+def has_store(s_store, s_log, l_instrument, l_intervals=None,
+              l_indicators=None):
+    '''
+    Check if the candle store passed exists, was computed from the current
+    event log and includes all instruments, intervals and indicators desired
+
+    :param s_store: string. Path to the candle store
+    :param s_log: string. Path to the event log of the same day
+    :param l_instrument: list. name of the instruments of the simulation
+    :param l_intervals*: list. intervals of the candles, in seconds
+    :param l_indicators*: list. indicators, as TYPE:conf
+    '''
+    s_meta = _get_meta_path(s_store)
+    if not os.path.isfile(s_store) or not os.path.isfile(s_meta):
+        return False
+    if not os.path.isfile(s_log):
+        return False
+    if os.path.getmtime(s_store) < os.path.getmtime(s_log):
+        return False
+    with open(s_meta, 'r') as fr:
+        d_meta = json.load(fr)
+    if not set(l_instrument).issubset(d_meta['instruments']):
+        return False
+    if l_intervals and not set(float(f_interval) for f_interval in
+                               l_intervals).issubset(
+                                   d_meta.get('intervals', [])):
+        return False
+    if l_indicators and not set(l_indicators).issubset(
+            d_meta.get('indicators', [])):
+        return False
+    return True
+
+
+def get_indicator_name(s_ta_conf, s_instr, f_interval):
+    '''
+    Return the canonical name of an indicator of DEFAULT_INDICATORS for the
+    candle passed
+
+    :param s_ta_conf: string. indicator as TYPE:conf
+    :param s_instr: string. name of the instrument
+    :param f_interval: float. interval of the candle, in seconds
+    '''
+    s_ta_key, s_conf = s_ta_conf.split(':')
+    s_name = '{}:{}:{};interval={:0.0f}'.format(s_ta_key, s_instr, s_conf,
+                                               f_interval)
+    return data_feeder.get_spec(s_name).s_key
+
+
+def _replay_trades(s_log, l_log_instr):
+    '''
+    Replay the event log passed and return a dictionary with the trades of
+    each instrument, as a TradeArrays tuple
+
+    :param s_log: string. Path to the event log
+    :param l_log_instr: list. instruments of the event log
+    '''
+    fr_log = event_log.EventLogReader(s_log)
+    d_books = dict((s_instr, book.LimitOrderBook(None, None, s_instr))
+                   for s_instr in l_log_instr)
+    d_trades = dict((s_instr, []) for s_instr in l_log_instr)
+    while not fr_log.is_over():
+        s_instr, d_row = fr_log.next_event()
+        book_obj = d_books[s_instr]
+        book_obj.process_event(d_row)
+        trades = book_obj.last_trades
+        if len(trades):
+            d_trades[s_instr].append([np.array(na_aux) for na_aux in
+                                      trades.trades_since()])
+            trades.clear()
+    fr_log.close()
+    for s_instr, l_chunks in d_trades.items():
+        if not l_chunks:
+            d_trades[s_instr] = book.TradeBuffer().trades_since()
+            continue
+        d_trades[s_instr] = book.TradeArrays(
+            *[np.concatenate(l_aux) for l_aux in zip(*l_chunks)])
+    return d_trades
+
+
+def _compute_candle(trades, s_instr, f_interval, l_indicators):
+    '''
+    Return the bars of a candle updated with all the trades passed, as an
+    array of BAR_DTYPE, and the values of the indicators, as an array of
+    shape (bars, columns). Also return the columns of each indicator
+
+    :param trades: TradeArrays tuple. trades of the instrument
+    :param s_instr: string. name of the instrument
+    :param f_interval: float. interval of the candle, in seconds
+    :param l_indicators: list. indicators to compute, as TYPE:conf
+    '''
+    # keep all the bars of the day in memory
+    i_count = int(24 * 60 ** 2 / f_interval) + 2
+    d_candle = {'ID': -1, 'INDICATORS': [], 'INTERVAL': f_interval}
+    for s_field in data_feeder.CANDLE_FIELDS:
+        d_candle[s_field] = data_feeder.ElapsedList(
+            f_elapsed_time=f_interval, i_count=i_count, s_type=s_field)
+    l_names = [get_indicator_name(s_ta_conf, s_instr, f_interval) for
+               s_ta_conf in l_indicators]
+    for s_name in l_names:
+        data_feeder.share_indicator(d_candle, s_name)
+    for bucket in data_feeder.aggregate_trade_arrays(trades,
+                                                     int(f_interval)):
+        d_candle = data_feeder.update_bucket(d_candle, bucket)[0]
+    i_bars = d_candle['LST'].count
+    na_bars = np.zeros(i_bars, dtype=BAR_DTYPE)
+    if not i_bars:
+        return na_bars, np.zeros((0, 0)), {}
+    f_last = d_candle['LST'].last_time
+    na_bars['interval'] = f_interval
+    na_bars['time'] = f_last - f_interval * np.arange(i_bars - 1, -1, -1)
+    for s_field in data_feeder.CANDLE_FIELDS:
+        na_bars[s_field] = d_candle[s_field].get_values()
+    # the indicators are computed over the whole day at once
+    d_candle = data_feeder.update_ta(True, d_candle)
+    l_values = []
+    d_cols = {}
+    i_col = 0
+    for s_name in l_names:
+        na_aux = np.full((1, i_bars), np.nan)
+        if len(d_candle[s_name]):
+            na_aux = np.atleast_2d(np.asarray(d_candle[s_name],
+                                              dtype='float64'))
+        d_cols[s_name] = [i_col, na_aux.shape[0]]
+        i_col += na_aux.shape[0]
+        l_values.append(na_aux)
+    return na_bars, np.vstack(l_values).T, d_cols
+
+
+def to_timestamp(s_date, f_time):
+    '''
+    Return the time of the day passed as seconds since 1970, as the begin
+    time returned by get_begin_time
+
+    :param s_date: string. date of the trading day (format YYYYMMDD)
+    :param f_time: float. time of the day, in seconds
+    '''
+    dt_day = datetime.datetime.strptime(s_date, '%Y%m%d')
+    f_day = (dt_day - datetime.datetime(1970, 1, 1)).total_seconds()
+    return f_day + f_time
+
+'''
+End help functions
+'''
+
+
+def build_candle_store(s_file, l_instrument=None, l_intervals=None,
+                       l_indicators=None, b_overwrite=False):
+    '''
+    Replay the event log of the day passed and save the bars of the candles
+    of all instruments, in each interval, and the values of the indicators
+    passed. Return the path to the candle store
+
+    :param s_file: string. Format of the name of the zip files of the day
+    :param l_instrument*: list. instruments of the event log. If the log does
+        not exist yet, it is created with them
+    :param l_intervals*: list. intervals of the candles, in seconds. The
+        default is 60
+    :param l_indicators*: list. indicators to compute, as TYPE:conf. The
+        default is DEFAULT_INDICATORS
+    :param b_overwrite*: boolean. If should rebuild a store that already
+        has all the instruments, intervals and indicators passed
+    '''
+    s_log = event_log.get_event_log_path(s_file)
+    if l_instrument:
+        event_log.build_event_log(s_file, l_instrument)
+    l_log_instr = event_log.get_instruments(s_log)
+    s_store = get_store_path(s_file)
+    if not l_intervals:
+        l_intervals = [60]
+    if not l_indicators:
+        l_indicators = DEFAULT_INDICATORS
+    if not b_overwrite and has_store(s_store, s_log, l_log_instr,
+                                     l_intervals, l_indicators):
+        return s_store
+    d_trades = _replay_trades(s_log, l_log_instr)
+    l_bars = []
+    l_values = []
+    l_blocks = []
+    i_row = 0
+    for i_instr, s_instr in enumerate(l_log_instr):
+        for f_interval in l_intervals:
+            na_bars, na_values, d_cols = _compute_candle(
+                d_trades[s_instr], s_instr, float(f_interval), l_indicators)
+            na_bars['instrument'] = i_instr
+            l_bars.append(na_bars)
+            if len(na_bars):
+                l_values.append(na_values)
+            l_blocks.append({'instrument': s_instr,
+                             'interval': float(f_interval),
+                             'start': i_row,
+                             'end': i_row + len(na_bars),
+                             'indicators': d_cols})
+            i_row += len(na_bars)
+    na_bars = np.concatenate(l_bars)
+    na_values = np.zeros((0, 0))
+    if l_values:
+        na_values = np.vstack(l_values)
+    # write to temporary files first, so readers never see a partial store
+    s_meta = _get_meta_path(s_store)
+    s_ta = _get_ta_path(s_store)
+    with open(s_ta + '.tmp', 'wb') as fw:
+        np.save(fw, na_values)
+    with open(s_store + '.tmp', 'wb') as fw:
+        np.save(fw, na_bars)
+    with open(s_meta + '.tmp', 'w') as fw:
+        json.dump({'date': os.path.basename(s_store).split('_')[0],
+                   'instruments': l_log_instr,
+                   'intervals': [float(f_interval) for f_interval in
+                                 l_intervals],
+                   'indicators': list(l_indicators),
+                   'blocks': l_blocks}, fw)
+    os.replace(s_ta + '.tmp', s_ta)
+    os.replace(s_store + '.tmp', s_store)
+    os.replace(s_meta + '.tmp', s_meta)
+    return s_store
+
+
+class CandleStore(object):
+    '''
+    Read the bars and the indicators of a candle store created by
+    build_candle_store
+    '''
+    def __init__(self, s_store):
+        '''
+        Initialize a CandleStore object
+
+        :param s_store: string. Path to the candle store
+        '''
+        with open(_get_meta_path(s_store), 'r') as fr:
+            d_meta = json.load(fr)
+        self.s_fname = s_store
+        self.s_date = d_meta['date']
+        self.l_instrument = d_meta['instruments']
+        self.d_blocks = dict(((d_block['instrument'], d_block['interval']),
+                              d_block) for d_block in d_meta['blocks'])
+        self.na_bars = np.load(s_store, mmap_mode='r')
+        self.na_values = np.load(_get_ta_path(s_store), mmap_mode='r')
+
+    def has_candle(self, s_instr, f_interval):
+        '''
+        Check if the candle passed is in the store
+
+        :param s_instr: string. name of the instrument
+        :param f_interval: float. interval of the candle, in seconds
+        '''
+        return (s_instr, float(f_interval)) in self.d_blocks
+
+    def _get_rows(self, s_instr, f_interval, f_start, f_end):
+        '''
+        Return the first and last rows of the bars of a candle that start at
+        or after f_start and are closed up to f_end
+
+        :param s_instr: string. name of the instrument
+        :param f_interval: float. interval of the candle, in seconds
+        :param f_start: float. time of the day, in seconds
+        :param f_end: float. time of the day, in seconds
+        '''
+        d_block = self.d_blocks[(s_instr, float(f_interval))]
+        na_time = self.na_bars['time'][d_block['start']:d_block['end']]
+        i_first = np.searchsorted(na_time, f_start, side='left')
+        i_last = np.searchsorted(na_time, f_end - f_interval, side='right')
+        i_last = max(i_first, i_last)
+        return d_block['start'] + i_first, d_block['start'] + i_last
+
+    def get_bars(self, s_instr, f_interval, f_start=0.,
+                 f_end=float('inf')):
+        '''
+        Return the bars of a candle that start at or after f_start and are
+        closed up to f_end, as a read-only array of BAR_DTYPE
+
+        :param s_instr: string. name of the instrument
+        :param f_interval: float. interval of the candle, in seconds
+        :param f_start*: float. time of the day, in seconds
+        :param f_end*: float. time of the day, in seconds
+        '''
+        i_first, i_last = self._get_rows(s_instr, f_interval, f_start, f_end)
+        return self.na_bars[i_first:i_last]
+
+    def get_indicator(self, s_name, f_interval, f_start=0.,
+                      f_end=float('inf')):
+        '''
+        Return the values of an indicator in the same bars of get_bars, as an
+        array of shape (outputs, bars). Return None if it is not in the store
+
+        :param s_name: string. name of the indicator, as SMA:symbol:conf
+        :param f_interval: float. interval of the candle, in seconds
+        :param f_start*: float. time of the day, in seconds
+        :param f_end*: float. time of the day, in seconds
+        '''
+        spec = data_feeder.get_spec(s_name)
+        s_instr = s_name.split(':')[1]
+        d_block = self.d_blocks.get((s_instr, float(f_interval)))
+        if not d_block or spec.s_key not in d_block['indicators']:
+            return None
+        i_col, i_outputs = d_block['indicators'][spec.s_key]
+        i_first, i_last = self._get_rows(s_instr, f_interval, f_start, f_end)
+        return self.na_values[i_first:i_last, i_col:i_col + i_outputs].T
+
+    def iter_bars(self, s_instr, f_interval, f_start=0.,
+                  f_end=float('inf')):
+        '''
+        Return a generator of tuples (time the bar closes, bars closed up to
+        then) of a candle, to run bar-driven backtests without replaying the
+        books. The bars are views of the memory-mapped array
+
+        :param s_instr: string. name of the instrument
+        :param f_interval: float. interval of the candle, in seconds
+        :param f_start*: float. time of the day, in seconds
+        :param f_end*: float. time of the day, in seconds
+        '''
+        d_block = self.d_blocks[(s_instr, float(f_interval))]
+        i_first, i_last = self._get_rows(s_instr, f_interval, f_start, f_end)
+        for i_row in range(i_first, i_last):
+            f_close = self.na_bars['time'][i_row] + f_interval
+            yield f_close, self.na_bars[d_block['start']:i_row + 1]
+
+    def close(self):
+        '''
+        Release the memory-mapped arrays
+        '''
+        self.na_bars = None
+        self.na_values = None
+
+
+def backfill_candle(d_candle, s_instr, l_stores, f_begin, f_now):
+    '''
+    Fill the ElapsedList objects of a candle just created with the bars
+    closed from f_begin up to f_now, read from the candle stores passed.
+    Return the number of bars included
+
+    :param d_candle: dictionary. data of the candle, without any bar
+    :param s_instr: string. name of the instrument
+    :param l_stores: list. CandleStore objects of the days simulated up to
+        the current one, the last being the current day
+    :param f_begin: float. begin time, in seconds since 1970, as the one
+        returned by get_begin_time
+    :param f_now: float. time of the current day, in seconds
+    '''
+    f_interval = d_candle['INTERVAL']
+    i_count = d_candle['LST'].i_count
+    l_bars = []
+    i_bars = 0
+    # read the days backwards, up to the bars that fit in memory
+    for i_day, store in enumerate(reversed(l_stores)):
+        if i_bars >= i_count or not store.has_candle(s_instr, f_interval):
+            break
+        f_start = max(0., f_begin - to_timestamp(store.s_date, 0.))
+        f_end = f_now if not i_day else float('inf')
+        na_bars = store.get_bars(s_instr, f_interval, f_start, f_end)
+        l_bars.insert(0, (i_day, na_bars[-(i_count - i_bars):]))
+        i_bars += len(na_bars)
+    for i_day, na_bars in l_bars:
+        if not len(na_bars):
+            continue
+        f_last_time = None if i_day else na_bars['time'][-1]
+        for s_field in data_feeder.CANDLE_FIELDS:
+            d_candle[s_field].backfill(na_bars[s_field], f_last_time)
+    # the trades of the bars included are not used again by make_updates
+    if l_bars and l_bars[-1][0] == 0 and len(l_bars[-1][1]):
+        d_candle['START'] = l_bars[-1][1]['time'][-1] + f_interval
+    return min(i_bars, i_count)
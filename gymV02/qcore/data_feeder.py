@@ -9,11 +9,12 @@ enrionemnt to allow testing the strategies created
 Created on 05/17/2018
 '''
 
-from collections import deque
-import itertools
+import logging
+import math
 import numpy as np
 import talib
 from neutrinogym.neutrino import fx
+from . import streaming_ta
 
 import pdb
 
@@ -22,6 +23,13 @@ Begin help functions
 '''
 
 LAST_TIME = 0
+# update the indicators incrementally (streaming_ta) instead of calling
+# TA-Lib over the whole history. If TA_CHECK, compare both (see set_ta_mode)
+TA_STREAMING = True
+TA_CHECK = False
+# series kept by ElapsedList objects in each candle
+CANDLE_FIELDS = ['MAX', 'MIN', 'LST', 'QTD', 'NTRADES', 'QTD_B', 'QTD_S',
+                 'CUMQTD', 'CUMQTD_B', 'CUMQTD_S', 'VOLUME', 'TS']
 MAP_INPUT = {'pmax': 'na_max',
              'pmin': 'na_min',
              'open': 'na_open',
@@ -49,15 +57,11 @@ def acum(f_value, f_old):
 
 
 def extend_ts(f_old, f_elapsed_time, i_include):
-    f_old2 = f_old + f_elapsed_time
-    f_limit = (f_old+i_include*f_elapsed_time + 1)
-    obj_aux = itertools.count(f_old2, f_elapsed_time)
-    gen = itertools.takewhile(lambda n: n < f_limit, obj_aux)
-    return gen
+    return f_old + f_elapsed_time * np.arange(1, i_include + 1)
 
 
 def extend_all(f_old, f_elapsed_time, i_include):
-    return itertools.repeat(f_old, i_include)
+    return f_old
 
 
 def update_ADX(**kwargs):
@@ -306,6 +310,81 @@ def update_MACD(**kwargs):
     return np.stack(na_rtn)
 
 
+def set_ta_mode(b_streaming=True, b_check=False):
+    '''
+    Set how the technical indicators are updated
+
+    :param b_streaming*: boolean. Update the indicators incrementally
+    :param b_check*: boolean. Also compute the indicators using TA-Lib and
+        log the ones whose values delivered do not match
+    '''
+    global TA_STREAMING, TA_CHECK
+    TA_STREAMING = b_streaming
+    TA_CHECK = b_check
+
+
+def to_canonical_value(s_value):
+    '''
+    Return the value of a parameter in a canonical form, so 2, 2.0 and 2.00
+    are the same parameter
+
+    :param s_value: string. value of the parameter
+    '''
+    try:
+        f_value = float(s_value)
+    except ValueError:
+        return s_value
+    if f_value == int(f_value):
+        return '{:0.0f}'.format(f_value)
+    return repr(f_value)
+
+
+def get_canonical_name(s_ta_key, s_symbol, d_conf, s_input):
+    '''
+    Return the name of an indicator that just depends on what is computed,
+    as TYPE:symbol:conf with the parameters of the conf sorted
+
+    :param s_ta_key: string. indicator type
+    :param s_symbol: string. instrument
+    :param d_conf: dictionary. parameters of the indicator
+    :param s_input: string. candle series used. None if it is not used
+    '''
+    d_aux = dict((s_key, to_canonical_value(s_val))
+                 for s_key, s_val in d_conf.items() if s_key != 'input')
+    if s_input:
+        d_aux['input'] = s_input
+    s_conf = ';'.join('{}={}'.format(s_key, d_aux[s_key])
+                      for s_key in sorted(d_aux))
+    return '{}:{}:{}'.format(s_ta_key, s_symbol, s_conf)
+
+
+def get_trade_time(i_time):
+    '''
+    Return the time of a trade in seconds since midnight. It also accepts an
+    array of times
+
+    :param i_time: integer or numpy array. time as HHMMSSssss
+    '''
+    f_rtn = (i_time // 10**8) * 60.**2 + (i_time // 10**6 % 100) * 60.
+    return f_rtn + (i_time % 10**6) / 1e4
+
+
+def get_base_interval(d_inst_data):
+    '''
+    Return the greatest interval, in seconds, that divides the intervals of
+    all candles passed, or None if some of them is not an integer
+
+    :param d_inst_data: dictionary. candles of an instrument
+    '''
+    i_rtn = 0
+    for inst_data in d_inst_data.values():
+        f_interval = max(1., inst_data['INTERVAL'])
+        if f_interval != int(f_interval):
+            return None
+        i_rtn = math.gcd(i_rtn, int(f_interval))
+    return i_rtn or None
+
+
 '''
 End help functions
 '''
@@ -333,6 +412,352 @@ TA_UPDATE_MAP = {'SMA': update_SMA,
                  }
 
 
+class IndicatorSpec(object):
+    '''
+    Configuration of an indicator, parsed just once from its name
+    '''
+    def __init__(self, s_name):
+        '''
+        Initialize an IndicatorSpec object
+
+        :param s_name: string. name of the indicator, as SMA:symbol:conf
+        '''
+        s_ta_key, s_cmm, s_aux = s_name.split(':')
+        self.s_name = s_name
+        self.s_ta_key = s_ta_key
+        self.d_conf = dict([x.split('=') for x in s_aux.split(';')])
+        self.i_timeperiod = int(float(self.d_conf['time_period']))
+        self.s_input = None
+        if s_ta_key in ['SMA', 'EMA', 'STDDEV', 'MOM', 'SAMOM', 'RSI',
+                        'OBV']:
+            self.s_input = self.d_conf.get('input', None)
+            if not self.s_input:
+                self.s_input = 'close'
+        self.func = TA_UPDATE_MAP[s_ta_key]
+        self.s_key = get_canonical_name(s_ta_key, s_cmm, self.d_conf,
+                                        self.s_input)
+        # check if the indicator can be streamed
+        self.b_streaming = True
+        try:
+            streaming_ta.make_indicator(s_ta_key, self.d_conf,
+                                        self.i_timeperiod, self.s_input)
+        except NotImplementedError:
+            self.b_streaming = False
+
+    def compute(self, d_arrays):
+        '''
+        Return the indicator computed by TA-Lib over the whole history
+
+        :param d_arrays: dictionary. candle series as numpy arrays
+        '''
+        return self.func(s_input=self.s_input,
+                         d_conf=self.d_conf,
+                         i_timeperiod=self.i_timeperiod,
+                         **d_arrays)
+
+    def new_stream(self, i_count):
+        '''
+        Return a StreamingIndicator object to update this indicator
+
+        :param i_count: integer. maximum number of bars of the candle
+        '''
+        return streaming_ta.StreamingIndicator(
+            self.s_ta_key, self.d_conf, self.i_timeperiod, self.s_input,
+            i_count)
+
+
+SPECS = {}
+
+
+def get_spec(s_name):
+    '''
+    Return the IndicatorSpec of the indicator passed
+
+    :param s_name: string. name of the indicator
+    '''
+    spec = SPECS.get(s_name)
+    if spec is None:
+        spec = IndicatorSpec(s_name)
+        SPECS[s_name] = spec
+    return spec
+
+
+def share_indicator(d_instr_data, s_name):
+    '''
+    Include a name to the indicators of the candle passed. Names with the
+    same canonical name share a single computation in update_ta(). Return
+    the canonical name
+
+    :param d_instr_data: dictionary. data of the candle
+    :param s_name: string. name of the indicator, as SMA:symbol:conf
+    '''
+    s_key = get_spec(s_name).s_key
+    d_aliases = d_instr_data.setdefault('ALIASES', {})
+    if s_key not in d_aliases:
+        d_aliases[s_key] = []
+        d_instr_data['INDICATORS'].append(s_key)
+    l_names = d_aliases[s_key]
+    if s_name not in l_names:
+        # the new name starts with the values already computed, if any
+        d_instr_data[s_name] = []
+        if l_names:
+            d_instr_data[s_name] = d_instr_data[l_names[0]]
+        l_names.append(s_name)
+    return s_key
+
+
+def release_indicator(d_instr_data, s_name):
+    '''
+    Exclude a name from the indicators of the candle passed. The indicator
+    stops being computed when no name uses it anymore. Return if it did stop
+
+    :param d_instr_data: dictionary. data of the candle
+    :param s_name: string. name of the indicator, as SMA:symbol:conf
+    '''
+    s_key = get_spec(s_name).s_key
+    l_names = d_instr_data.get('ALIASES', {}).get(s_key, [])
+    if s_name in l_names:
+        l_names.remove(s_name)
+    if l_names or s_key not in d_instr_data['INDICATORS']:
+        return False
+    d_instr_data['INDICATORS'].remove(s_key)
+    d_instr_data['ALIASES'].pop(s_key)
+    d_instr_data.get('STREAMS', {}).pop(s_key, None)
+    return True
+
+
+def get_names(d_instr_data):
+    '''
+    Iterate over the names of all indicators subscribed to the candle passed
+
+    :param d_instr_data: dictionary. data of the candle
+    '''
+    d_aliases = d_instr_data.get('ALIASES', {})
+    for s_key in d_instr_data['INDICATORS']:
+        for s_name in d_aliases.get(s_key, (s_key,)):
+            yield s_name
+
+
+def get_arrays(d_instr_data):
+    '''
+    Return the series of a candle as numpy arrays, named as the parameters of
+    the update functions of TA_UPDATE_MAP. They are views of the buffers of
+    the ElapsedList objects
+
+    :param d_instr_data: dictionary. data of the candle
+    '''
+    return {'na_close': d_instr_data['LST'].get_values(),
+            'na_max': d_instr_data['MAX'].get_values(),
+            'na_min': d_instr_data['MIN'].get_values(),
+            'na_qty': d_instr_data['QTD'].get_values(),
+            'na_qtyb': d_instr_data['QTD_B'].get_values(),
+            'na_qtys': d_instr_data['QTD_S'].get_values(),
+            'na_cumqty': d_instr_data['CUMQTD'].get_values(),
+            'na_cumqtyb': d_instr_data['CUMQTD_B'].get_values(),
+            'na_cumqtys': d_instr_data['CUMQTD_S'].get_values(),
+            'na_volume': d_instr_data['VOLUME'].get_values()}
+
+
+def check_ta(s_name, na_stream, na_talib):
+    '''
+    Log the indicator if the values streamed do not match the TA-Lib ones.
+    Return if they match
+
+    :param s_name: string. name of the indicator
+    :param na_stream: numpy array. values of the StreamingIndicator
+    :param na_talib: numpy array. values of TA-Lib
+    '''
+    na_talib = np.asarray(na_talib, dtype='float64')
+    if na_talib.shape == na_stream.shape and np.allclose(
+            na_stream, na_talib, rtol=1e-6, atol=1e-6, equal_nan=True):
+        return True
+    s_msg = 'update_ta(): {} does not match TA-Lib. streamed {}, TA-Lib {}'
+    logging.warning(s_msg.format(s_name, na_stream[:, -3:],
+                                 na_talib[..., -3:]))
+    return False
+
+
+class TradeBucket(object):
+    '''
+    Trades of an instrument aggregated by base bucket. A base bucket is
+    inside a single bucket of every candle of the instrument, so each candle
+    is updated once by base bucket, instead of once by trade
+    '''
+    __slots__ = ['i_bucket', 'f_time', 'i_id', 'f_max', 'f_min', 'f_last',
+                 'f_qty', 'f_qtyb', 'f_qtys', 'i_trades', 'f_volume']
+
+    def __init__(self, i_bucket, f_time, i_id, f_price, f_qty, s_agr):
+        '''
+        Initialize a TradeBucket object with its first trade
+
+        :param i_bucket: integer. index of the base bucket
+        :param f_time: float. time of the trade, in seconds
+        :param i_id: integer. trade id
+        :param f_price: float.
+        :param f_qty: float.
+        :param s_agr: string. agressor of the trade (+, - or X)
+        '''
+        self.i_bucket = i_bucket
+        self.f_max = f_price
+        self.f_min = f_price
+        self.f_qty = 0
+        self.f_qtyb = 0
+        self.f_qtys = 0
+        self.i_trades = 0
+        self.f_volume = 0
+        self.add(f_time, i_id, f_price, f_qty, s_agr)
+
+    def add(self, f_time, i_id, f_price, f_qty, s_agr):
+        '''
+        Include a trade in the bucket
+
+        :param f_time: float. time of the trade, in seconds
+        :param i_id: integer. trade id
+        :param f_price: float.
+        :param f_qty: float.
+        :param s_agr: string. agressor of the trade (+, - or X)
+        '''
+        self.f_time = f_time
+        self.i_id = i_id
+        if f_price > self.f_max:
+            self.f_max = f_price
+        if f_price < self.f_min:
+            self.f_min = f_price
+        self.f_last = f_price
+        self.f_qty += f_qty
+        if s_agr == '+':
+            self.f_qtyb += f_qty
+        elif s_agr == '-':
+            self.f_qtys += f_qty
+        self.i_trades += 1
+        self.f_volume += f_qty * f_price
+
+    def merge(self, bucket):
+        '''
+        Include the trades of a later bucket in this one
+
+        :param bucket: TradeBucket object.
+        '''
+        self.f_time = bucket.f_time
+        self.i_id = bucket.i_id
+        if bucket.f_max > self.f_max:
+            self.f_max = bucket.f_max
+        if bucket.f_min < self.f_min:
+            self.f_min = bucket.f_min
+        self.f_last = bucket.f_last
+        self.f_qty += bucket.f_qty
+        self.f_qtyb += bucket.f_qtyb
+        self.f_qtys += bucket.f_qtys
+        self.i_trades += bucket.i_trades
+        self.f_volume += bucket.f_volume
+
+    @classmethod
+    def from_values(cls, *args):
+        '''
+        Return a TradeBucket object with trades already aggregated. The
+        values are passed in the order of the __slots__ attribute
+        '''
+        bucket = cls.__new__(cls)
+        for s_attr, value in zip(cls.__slots__, args):
+            setattr(bucket, s_attr, value)
+        return bucket
+
+
+def aggregate_trades(trades, i_first, last_trade_id, i_base):
+    '''
+    Return a list of TradeBucket objects with the trades after
+    last_trade_id, aggregated by base bucket
+
+    :param trades: list. trades of the instrument
+    :param i_first: integer. index of the first trade to check
+    :param last_trade_id: integer. last trade id already processed
+    :param i_base: integer. base interval, in seconds. If None, each trade
+        is put in its own bucket
+    '''
+    l_rtn = []
+    bucket = None
+    for idx in range(i_first, len(trades)):
+        obj_trade = trades[idx]
+        s_agr = obj_trade.status
+        i_id = obj_trade.tradeID
+        if s_agr not in ['+', '-', 'X'] or i_id <= last_trade_id:
+            continue
+        f_time = get_trade_time(obj_trade.time)
+        i_bucket = int(f_time / i_base) if i_base else idx
+        if bucket is not None and bucket.i_bucket == i_bucket:
+            bucket.add(f_time, i_id, obj_trade.price, obj_trade.quantity,
+                       s_agr)
+        else:
+            bucket = TradeBucket(i_bucket, f_time, i_id, obj_trade.price,
+                                 obj_trade.quantity, s_agr)
+            l_rtn.append(bucket)
+    return l_rtn
+
+
+def roll_up_buckets(l_buckets, i_interval):
+    '''
+    Return a list of TradeBucket objects with the base buckets passed merged
+    by bucket of a candle, so the candle is updated once by its own bucket
+
+    :param l_buckets: list. TradeBucket objects of the base interval
+    :param i_interval: integer. interval of the candle, in seconds. A
+        multiple of the base interval
+    '''
+    l_rtn = []
+    bucket = None
+    for base_bucket in l_buckets:
+        i_bucket = int(base_bucket.f_time / i_interval)
+        if bucket is not None and bucket.i_bucket == i_bucket:
+            bucket.merge(base_bucket)
+        else:
+            bucket = TradeBucket.from_values(*[
+                getattr(base_bucket, s_attr) for s_attr in
+                TradeBucket.__slots__])
+            bucket.i_bucket = i_bucket
+            l_rtn.append(bucket)
+    return l_rtn
+
+
+def aggregate_trade_arrays(trades, i_base):
+    '''
+    Return a list of TradeBucket objects with the trades passed, aggregated
+    by base bucket. Do the same as aggregate_trades, but in bulk
+
+    :param trades: TradeArrays tuple. trades returned by the trade tape
+    :param i_base: integer. base interval, in seconds. If None, each trade
+        is put in its own bucket
+    '''
+    i_len = len(trades.trade_id)
+    if not i_len:
+        return []
+    na_time = get_trade_time(trades.time)
+    if i_base:
+        na_bucket = (na_time / i_base).astype(np.int64)
+        na_first = np.flatnonzero(np.diff(na_bucket)) + 1
+        na_first = np.concatenate(([0], na_first))
+    else:
+        na_bucket = np.arange(i_len)
+        na_first = na_bucket
+    na_last = np.append(na_first[1:], i_len) - 1
+    na_price = trades.price
+    na_qty = trades.qty
+    na_zero = np.zeros_like(na_qty)
+    l_values = [na_bucket[na_first], na_time[na_last],
+                trades.trade_id[na_last],
+                np.maximum.reduceat(na_price, na_first),
+                np.minimum.reduceat(na_price, na_first),
+                na_price[na_last],
+                np.add.reduceat(na_qty, na_first),
+                np.add.reduceat(np.where(trades.agr > 0, na_qty, na_zero),
+                                na_first),
+                np.add.reduceat(np.where(trades.agr < 0, na_qty, na_zero),
+                                na_first),
+                na_last - na_first + 1,
+                np.add.reduceat(na_qty * na_price, na_first)]
+    return [TradeBucket.from_values(*t_values) for t_values in
+            zip(*[na_aux.tolist() for na_aux in l_values])]
+
+
 def update_prices(d_instr_data, f_value, f_time):
     '''
     Update price lists of the given instrument
@@ -367,32 +792,45 @@ def update_qty(d_instr_data, f_value, f_time, s_agr):
     :param f_value: float. value to be kept
     :param f_time: float. Time in seconds
     '''
-    f_val = 0
     f_valb = 0
     f_vals = 0
-    b_update = False
-    # update qty
     if not f_value:
         f_value = 0
+    if s_agr == '+':
+        f_valb = f_value
+    if s_agr == '-':
+        f_vals = f_value
+    return aux_update_qty(d_instr_data, f_value, f_valb, f_vals, 1, f_time)
+
+
+def aux_update_qty(d_instr_data, f_value, f_valb, f_vals, i_trades, f_time):
+    '''
+    Update qty lists of the given instrument
+
+    :param f_value: float. quantity traded
+    :param f_valb: float. quantity traded by buyer agressors
+    :param f_vals: float. quantity traded by seller agressors
+    :param i_trades: integer. number of trades
+    :param f_time: float. Time in seconds
+    '''
+    f_val = 0
+    b_update = False
+    # update qty
     if d_instr_data['QTD'].update(f_value, f_time, f_val):
         b_update = True
         d_instr_data['QTD'].repeat_the_last(f_time, f_val)
     aux_update_cumqty('CUMQTD', d_instr_data, f_value, f_time)
 
     # update number of trades
-    if d_instr_data['NTRADES'].update(1, f_time, f_val):
+    if d_instr_data['NTRADES'].update(i_trades, f_time, f_val):
         b_update = True
         d_instr_data['NTRADES'].repeat_the_last(f_time, f_val)
 
     # update agressor
-    if s_agr == '+':
-        f_valb = f_value
     if d_instr_data['QTD_B'].update(f_valb, f_time, f_val):
         d_instr_data['QTD_B'].repeat_the_last(f_time, f_val)
     aux_update_cumqty('CUMQTD_B', d_instr_data, f_valb, f_time)
 
-    if s_agr == '-':
-        f_vals = f_value
     if d_instr_data['QTD_S'].update(f_vals, f_time, f_val):
         d_instr_data['QTD_S'].repeat_the_last(f_time, f_val)
     aux_update_cumqty('CUMQTD_S', d_instr_data, f_vals, f_time)
@@ -429,48 +867,61 @@ def update_volume(d_instr_data, f_value, f_time):
     return d_instr_data
 
 
+def update_bucket(d_instr_data, bucket):
+    '''
+    Update all lists of the given instrument with the trades of a base
+    bucket. It is the same as updating them trade by trade, as long as the
+    bucket is inside a single bucket of the candle
+
+    :param d_instr_data: dictionary. data of the candle
+    :param bucket: TradeBucket object.
+    '''
+    f_time = bucket.f_time
+    f_aux = d_instr_data['LST'].get_value()
+    b_update = False
+    for s_key, f_value, f_val in zip(['MAX', 'MIN', 'LST'],
+                                     [bucket.f_max, bucket.f_min,
+                                      bucket.f_last],
+                                     [f_aux, f_aux, None]):
+        if d_instr_data[s_key].update(f_value, f_time, f_val):
+            b_update = True
+            d_instr_data[s_key].repeat_the_last(f_time, f_val)
+    d_instr_data, b_update2 = aux_update_qty(
+        d_instr_data, bucket.f_qty, bucket.f_qtyb, bucket.f_qtys,
+        bucket.i_trades, f_time)
+    d_instr_data = update_volume(d_instr_data, bucket.f_volume, f_time)
+    f_last_time = d_instr_data['LST'].last_time
+    d_instr_data = update_ts(d_instr_data, f_last_time, f_time)
+    return d_instr_data, b_update or b_update2
+
+
 def update_ta(b_update, d_instr_data):
     # update TA indicators
     b_there_is_ta = len(d_instr_data) > 5
     if b_update and b_there_is_ta:
-        na_close = np.array(d_instr_data['LST'].l)
-        na_max = np.array(d_instr_data['MAX'].l)
-        na_min = np.array(d_instr_data['MIN'].l)
-        na_qty = np.array(d_instr_data['QTD'].l)
-        na_qtyb = np.array(d_instr_data['QTD_B'].l)
-        na_qtys = np.array(d_instr_data['QTD_S'].l)
-        na_cumqty = np.array(d_instr_data['CUMQTD'].l)
-        na_cumqtyb = np.array(d_instr_data['CUMQTD_B'].l)
-        na_cumqtys = np.array(d_instr_data['CUMQTD_S'].l)
-        na_volume = np.array(d_instr_data['VOLUME'].l)
-
+        # the numpy arrays are just created if some indicator uses TA-Lib
+        obj_lst = d_instr_data['LST']
+        d_arrays = None
+        d_streams = d_instr_data.setdefault('STREAMS', {})
+        d_aliases = d_instr_data.get('ALIASES', {})
         for s_this_ta in d_instr_data['INDICATORS']:
-            s_ta_key, s_cmm, s_aux = s_this_ta.split(':')
-            d_conf = dict([x.split('=') for x in s_aux.split(';')])
-            i_time_period = int(d_conf['time_period'])
-            # l_aux = s_this_ta.split(';')
-            # i_time_period = int(l_aux[-1].split('=')[1])
-            # s_ta_key = l_aux[0].split(':')[0]
-            s_input = None
-            if s_ta_key in ['SMA', 'EMA', 'STDDEV', 'MOM', 'SAMOM', 'RSI',
-                            'OBV']:
-                s_input = d_conf.get('input', None)
-                if not s_input:
-                    s_input = 'close'
-            na_aux = TA_UPDATE_MAP[s_ta_key](na_max=na_max,
-                                             na_min=na_min,
-                                             na_close=na_close,
-                                             na_qty=na_qty,
-                                             na_qtyb=na_qtyb,
-                                             na_qtys=na_qtys,
-                                             na_cumqty=na_cumqty,
-                                             na_cumqtyb=na_cumqtyb,
-                                             na_cumqtys=na_cumqtys,
-                                             na_volume=na_volume,
-                                             s_input=s_input,
-                                             d_conf=d_conf,
-                                             i_timeperiod=i_time_period)
-            d_instr_data[s_this_ta] = na_aux
+            spec = get_spec(s_this_ta)
+            na_aux = None
+            if TA_STREAMING and spec.b_streaming:
+                stream = d_streams.get(s_this_ta)
+                if stream is None:
+                    stream = spec.new_stream(obj_lst.i_count)
+                    d_streams[s_this_ta] = stream
+                na_aux = stream.update(d_instr_data)
+                if TA_CHECK and na_aux is not None:
+                    d_arrays = d_arrays or get_arrays(d_instr_data)
+                    check_ta(s_this_ta, na_aux, spec.compute(d_arrays))
+            if na_aux is None:
+                d_arrays = d_arrays or get_arrays(d_instr_data)
+                na_aux = spec.compute(d_arrays)
+            # fan out the values to every name that shares this indicator
+            for s_name in d_aliases.get(s_this_ta, (s_this_ta,)):
+                d_instr_data[s_name] = na_aux
     return d_instr_data
 
 
@@ -487,6 +938,9 @@ def make_updates(symbol, d_inst_data):
     summary = fx.getSummary(fx.book(symbol), True)
     f_mkt_time = fx.now(b_old=True)
     d_update = {}
+    # the trades are aggregated just once for all candles of the instrument
+    i_base = get_base_interval(d_inst_data)
+    d_buckets = {}
     for s_name in d_inst_data:
         inst_data = d_inst_data[s_name]
         f_price = None
@@ -497,27 +951,27 @@ def make_updates(symbol, d_inst_data):
         i_iterate = len(trades) - summary.tradeCount
         d_update[s_name] = False
         b_update = False
-        for idx in range(max(0, i_iterate), len(trades)):
-            obj_trade = trades[idx]
-            s_agr = obj_trade.status
-            f_price = obj_trade.price
-            f_qty = obj_trade.quantity
-            i_id = obj_trade.tradeID
-            # s = str(obj_trade.time/1000.)
-            # s = '{0:09d}'.format(obj_trade.time)
-            # s = s[:-3] + '.' + s[-3:]
-            s = '{0:010d}'.format(obj_trade.time)
-            s = s[:-4] + '.' + s[-4:]
-            if s_agr not in ['+', '-', 'X'] or i_id <= last_trade_id:
-                continue
-            inst_data['ID'] = i_id
-            f_time2 = float(s[:2])*60**2+float(s[2:4])*60 + float(s[4:])
-            inst_data, b_update = update_prices(inst_data, f_price, f_time2)
-            inst_data, b_update2 = update_qty(inst_data, f_qty, f_time2, s_agr)
-            inst_data = update_volume(inst_data, f_qty*f_price, f_time2)
-            f_last_time = inst_data['LST'].last_time
-            inst_data = update_ts(inst_data, f_last_time, f_time2)
-            b_update = b_update or b_update2
+        l_buckets = d_buckets.get(last_trade_id)
+        if l_buckets is None and hasattr(trades, 'trades_since'):
+            # read the trade tape in bulk, when it is available
+            l_buckets = aggregate_trade_arrays(
+                trades.trades_since(last_trade_id), i_base)
+            d_buckets[last_trade_id] = l_buckets
+        elif l_buckets is None:
+            l_buckets = aggregate_trades(trades, max(0, i_iterate),
+                                         last_trade_id, i_base)
+            d_buckets[last_trade_id] = l_buckets
+        if l_buckets:
+            inst_data['ID'] = l_buckets[-1].i_id
+        # trades before START are already in the bars loaded from a store
+        f_start = inst_data.get('START', 0.)
+        l_candle = [bucket for bucket in l_buckets if bucket.f_time >= f_start]
+        # the coarser candles are updated once by each of their own buckets
+        i_interval = int(max(1., inst_data['INTERVAL']))
+        if i_base and i_interval > i_base:
+            l_candle = roll_up_buckets(l_candle, i_interval)
+        for bucket in l_candle:
+            inst_data, b_update = update_bucket(inst_data, bucket)
             inst_data = update_ta(b_update, inst_data)
             d_update[s_name] = b_update
         # ensure that the candle data is updated at least one time per 10 secds
@@ -545,7 +999,10 @@ def make_updates(symbol, d_inst_data):
 class ElapsedList(object):
     '''
     ElapsedList is a list that has a maximum lenght and is updated from time
-    to time
+    to time. The values are kept in a numpy array with room for two lists.
+    When the array is full, the last values are moved to its beginning, so
+    the list is always a contiguous slice of it and can be used without
+    copies
     '''
 
     _compare = {'MAX': max, 'MIN': min, 'LST': same_val, 'QTD': acum,
@@ -571,11 +1028,40 @@ class ElapsedList(object):
         self.i_count = i_count
         self.f_elapsed_time = max(1., f_elapsed_time)
         self.last_time = 0.
-        self.l = deque([], maxlen=i_count)
+        # a bucket change can include up to i_count + 1 values at once
+        self.na_buffer = np.full(2 * i_count + 2, np.nan)
+        self.i_start = 0  # index of the first value of the list
+        self.i_end = 0  # index after the last value of the list
+        self.i_bars = 0  # buckets included since the start, even if dropped
         self.i_used = 0
         self.compare = self._compare[s_type]
         self.s_type = s_type
 
+    @property
+    def l(self):
+        '''
+        Return the list as a view of the buffer
+        '''
+        return self.na_buffer[self.i_start:self.i_end]
+
+    def _include(self, values, i_include):
+        '''
+        Include values at the end of the list, dropping the oldest ones
+
+        :param values: float or numpy array. values to be included
+        :param i_include: integer. number of values
+        '''
+        na_buffer = self.na_buffer
+        if self.i_end + i_include > na_buffer.shape[0]:
+            i_keep = self.i_end - self.i_start
+            na_buffer[:i_keep] = na_buffer[self.i_start:self.i_end]
+            self.i_start = 0
+            self.i_end = i_keep
+        na_buffer[self.i_end:self.i_end + i_include] = values
+        self.i_end += i_include
+        self.i_start = max(self.i_start, self.i_end - self.i_count)
+        self.i_bars += i_include
+
     def update(self, f_value, f_current_time, f_valrepeat=None):
         '''
         Update the list according to the time passed. Return if it changed
@@ -592,82 +1078,103 @@ class ElapsedList(object):
             f_aux = int(self.last_time/f_elapsed_time+1)
             f_aux *= f_elapsed_time
             f_aux = int((f_current_time - f_aux)/f_elapsed_time)
-            # if int(min(f_aux, self.i_count)) > 500:
-            #     import pdb; pdb.set_trace()
             i_include = int(min(f_aux, self.i_count))
-            # i_include = f_aux
             if i_include > 0 and self.i_used != 1:
-                f_old = self.l[-1]
+                f_old = self.na_buffer[self.i_end - 1]
                 if f_valrepeat or f_valrepeat == 0:
                     f_old = f_valrepeat
-                g = self._extend[self.s_type](f_old, f_elapsed_time, i_include)
-                self.l.extend(g)
-            self.l.append(f_value)
+                values = self._extend[self.s_type](f_old, f_elapsed_time,
+                                                   i_include)
+                self._include(values, i_include)
+            self._include(f_value, 1)
             f_aux = int(f_current_time/f_elapsed_time) * f_elapsed_time
             self.last_time = f_aux
             return True
         else:
             if f_current_time < self.last_time:
                 return False
-            f_old = self.l[-1]
-            if not f_old:
+            i_last = self.i_end - 1
+            f_old = self.na_buffer[i_last]
+            if not f_old or f_old != f_old:
                 f_old = 0
-            self.l[-1] = self.compare(f_value, f_old)
-            return f_old != self.l[-1]
+            self.na_buffer[i_last] = self.compare(f_value, f_old)
+            return f_old != self.na_buffer[i_last]
+
+    def backfill(self, na_values, f_last_time=None):
+        '''
+        Include the values of buckets already closed at the end of the list,
+        as the ones loaded from a candle store
+
+        :param na_values: numpy array. values of consecutive buckets
+        :param f_last_time*: float. time of the bucket of the last value. If
+            None, the values are from other day, so the next update starts a
+            new bucket without filling the gap
+        '''
+        na_values = np.asarray(na_values, dtype='float64')[-self.i_count:]
+        if not len(na_values):
+            return
+        self._include(na_values, len(na_values))
+        if f_last_time is None:
+            self.last_time = 0.
+            self.i_used = 0
+        else:
+            self.last_time = f_last_time
+            self.i_used = max(self.i_used, 1)
 
     def repeat_the_last(self, f_current_time, f_valrepeat=None):
         '''
         Repeat the last value using the time passed
         '''
-        try:
-            f_old = self.l[-1]
-            f_other = None
-            if f_valrepeat:
-                f_other = f_valrepeat
-            if f_valrepeat == 0:
-                f_other = 0
-                f_old = 0
-            if not f_other:
-                f_other = 0
-            return self.update(f_old, f_current_time, f_other)
-        except IndexError:
+        if self.i_end == self.i_start:
             return False
+        f_old = self.na_buffer[self.i_end - 1]
+        f_other = None
+        if f_valrepeat:
+            f_other = f_valrepeat
+        if f_valrepeat == 0:
+            f_other = 0
+            f_old = 0
+        if not f_other:
+            f_other = 0
+        return self.update(f_old, f_current_time, f_other)
 
     def get_value(self, i_id=None):
         '''
         Return and item from the list according to the id passed
         '''
-        try:
-            if not i_id:
-                return self.l[-1]
-            return self.l[i_id]
-        except IndexError:
+        i_len = self.i_end - self.i_start
+        if not i_id:
+            i_id = -1
+        if i_id < 0:
+            i_id += i_len
+        if not 0 <= i_id < i_len:
             return None
+        return self.na_buffer[self.i_start + i_id]
 
     def get_last_values(self, i_id=None):
         '''
         Return and item from the list according to the id passed
         '''
-        # try:
         if i_id:
             return self.l[i_id]
-        if not self.l:
+        if self.i_end == self.i_start:
             return None
-        return list(self.l)[0]
-        # except IndexError:
-        #     return None
+        return self.na_buffer[self.i_start]
 
     def get_last_values_as_array(self):
         '''
-        Return the values already in memory as a numpy array
+        Return the values already in memory as a read-only numpy array
         '''
-        return np.array(self.get_last_values())
+        return self.get_values()
 
     def get_values(self):
         '''
-        Return the values already in memory as a numpy array
+        Return the values already in memory as a read-only numpy array. It is
+        a view of the buffer, so it should not be kept between updates
         '''
-        return np.array(self.l)
+        na_rtn = self.na_buffer[self.i_start:self.i_end]
+        na_rtn.flags.writeable = False
+        return na_rtn
 
     def get_current_bucket(self):
         '''
@@ -680,4 +1187,4 @@ class ElapsedList(object):
         '''
         Return and item from the list according to the id passed
         '''
-        return len(self.l)
+        return self.i_end - self.i_start
@@ -22,12 +22,15 @@ from neutrinogym.neutrino import (fx, Source, UpdateReason, Symbol,
 from neutrinogym import logger
 # simulations imports
 from neutrinogym.lob import matching_engine
+from neutrinogym.lob import event_log
 from neutrinogym.lob import translator
 from neutrinogym.lob import BvmfFileMatching
+from neutrinogym.lob.perf import PerfCounters
 from .utils.neutrino_utils import (DoubleWrapperError, Logger)
 from .utils.handle_orders import (OrderHandler, Instrument)
 from .utils.handle_data import CandlesHandler
 from . import data_feeder
+from . import candle_store
 
 import pprint
 
@@ -199,6 +202,11 @@ class Env(object):
         self.instr_data = {}
         self.instr_data_subscribed = {}
         self.b_bov = False  # set to true to make it works with Bovespa data
+        self.i_seed = None  # seed of the random numbers of each episode
+        self.b_use_candle_store = False
+        self.d_candle_stores = {}  # CandleStore objects by path
+        # profiling counters of the simulations of this env
+        self.obj_perf = PerfCounters()
         # DEBUG ####
         self.count_actions = {}
         # ##########
@@ -219,13 +227,22 @@ class Env(object):
         self.candles = CandlesHandler()
         self.orders = {}
 
-    def initialize(self, fnames, instr, inter_time, idx=None):
+    def initialize(self, fnames, instr, inter_time, idx=None,
+                   b_use_cache=False, b_use_event_log=False,
+                   b_int_prices=False, b_price_ladder=False,
+                   b_use_snapshots=False, b_bulk_parse=False):
         '''
         Initialize the core attributes of the environment class
 
         :param fnames: list. the container zip files to be used in simulation
         :param instr: list. list of instrument to be simulated.
         :param inter_time: NextStopTime object. the hour all books is in sync
+        :param b_use_cache*: boolean. Read the books from the cache files
+        :param b_use_event_log*: boolean. Replay the event log of each day
+        :param b_int_prices*: boolean. Key the books by integer price ticks
+        :param b_price_ladder*: boolean. Keep the price levels in arrays
+        :param b_use_snapshots*: boolean. Start from the book snapshots
+        :param b_bulk_parse*: boolean. Parse the zipped files in chunks
         '''
         if not isinstance(instr, list):
             instr = [instr]
@@ -247,7 +264,14 @@ class Env(object):
         # Initiate Matching Engine
         self.order_matching = BvmfFileMatching(env=self,
                                                l_instrument=instr,
-                                               l_file=fnames)
+                                               l_file=fnames,
+                                               b_use_cache=b_use_cache,
+                                               b_use_event_log=b_use_event_log,
+                                               b_int_prices=b_int_prices,
+                                               b_price_ladder=b_price_ladder,
+                                               b_use_snapshots=b_use_snapshots,
+                                               b_bulk_parse=b_bulk_parse,
+                                               obj_perf=self.obj_perf)
 
         # define the best bid and offer attributes
         self._i_nrow = self.order_matching.i_nrow
@@ -267,7 +291,13 @@ class Env(object):
     def setParameters(self, init, end, datafolder, instruments,
                       starttime='09:20:00', endtime='15:40:00', idx=None,
                       logfolder=None, state_func=None, f_milis=100.,
-                      b_randstart=True):
+                      b_randstart=True, b_use_cache=False,
+                      b_bulk_parse=False, b_use_event_log=False,
+                      b_int_prices=False, b_price_ladder=False,
+                      b_use_snapshots=False, b_event_clock=False,
+                      b_perf_stats=False, i_perf_sample=64, i_seed=None,
+                      b_streaming_ta=True, b_check_ta=False,
+                      b_use_candle_store=True):
         '''
         Set parameters to use in simulation
 
@@ -278,8 +308,44 @@ class Env(object):
         :param endtime*: string. The time to close (format HH:mm:ss)
         :param idx*: integer. The index of the start file to be read
         :param logfolder*: string. The path to the log's folder
+        :param b_use_cache*: boolean. Read the books from the cache files
+            created by lob.book_cache.build_cache, if available
+        :param b_bulk_parse*: boolean. Parse the zipped files in chunks with
+            the lob.parser_data.BookChunkParser, instead of row by row
+        :param b_use_event_log*: boolean. Replay the event log created by
+            lob.event_log.build_event_log, if available
+        :param b_int_prices*: boolean. Key the books by the integer number of
+            price increments of each instrument, instead of float prices
+        :param b_price_ladder*: boolean. Keep the price levels of the books in
+            arrays indexed by ticks (lob.price_ladder). Implies b_int_prices
+        :param b_use_snapshots*: boolean. Restore the books from the snapshots
+            created by lob.book_snapshot.build_snapshots, if available, and
+            replay the event log just from the last one before the start time
+        :param b_event_clock*: boolean. Use the EventClock, that skips the
+            stop times without market events nor callbacks due, instead of
+            NextStopTime
+        :param b_perf_stats*: boolean. Count the events of each stage of the
+            simulation and time a sample of them (see get_perf_stats)
+        :param i_perf_sample*: integer. Time 1 of each i_perf_sample events
+            of a stage. Use 1 to time all of them
+        :param i_seed*: integer. Seed the random numbers used by the random
+            start and by the noise of the NextStopTime. Each episode is seeded
+            with i_seed plus the number of the trial. Random if None
+        :param b_streaming_ta*: boolean. Update the technical indicators one
+            bar at a time (qcore.streaming_ta) instead of calling TA-Lib over
+            the whole history of the candles
+        :param b_check_ta*: boolean. Also compute the streamed indicators
+            using TA-Lib and log the ones that do not match
+        :param b_use_candle_store*: boolean. Fill the candles subscribed with
+            the bars before the current time, read from the stores created
+            by qcore.candle_store.build_candle_store, if available
         :return: EpisodesInfo object. Metadata about the simulation parameters
         '''
+        # seed the random numbers, if required
+        self.i_seed = i_seed
+        if i_seed is not None:
+            np.random.seed(seed=i_seed)
+
         # include 15 minutes as random time to start trading
         f1 = sum([float(s)*60**(2-i) for i, s in
                   enumerate(starttime.split(':'))])
@@ -305,18 +371,32 @@ class Env(object):
             s_err = s_err.format(init, end)
             raise NotEnoughFilesError(s_err)
 
-        # initialize the NextStopTime object
-        iter_time = matching_engine.NextStopTime(self.start_mkt_time,
-                                                 self.close_mkt_time,
-                                                 milis=f_milis)
+        # initialize the clock that defines when the books are synchronized
+        if b_event_clock:
+            iter_time = matching_engine.EventClock(self.start_mkt_time,
+                                                   self.close_mkt_time,
+                                                   milis=f_milis)
+        else:
+            iter_time = matching_engine.NextStopTime(self.start_mkt_time,
+                                                     self.close_mkt_time,
+                                                     milis=f_milis)
 
         # set the log folder
         logger.set_logger(logfolder)
 
+        # enable the profiling counters
+        self.obj_perf.configure(b_perf_stats, i_perf_sample)
+
+        # set how the technical indicators are updated
+        data_feeder.set_ta_mode(b_streaming_ta, b_check_ta)
+        self.b_use_candle_store = b_use_candle_store
+
         # initialize the enviornment
         if not isinstance(instruments, list):
             instruments = [instruments]
-        self.initialize(l_files, instruments, iter_time, idx)
+        self.initialize(l_files, instruments, iter_time, idx, b_use_cache,
+                        b_use_event_log, b_int_prices, b_price_ladder,
+                        b_use_snapshots, b_bulk_parse)
 
         # set state function
         self.last_observation.set_state_function(state_func)
@@ -428,6 +508,33 @@ class Env(object):
             return self.order_matching.f_time
         return self.order_matching.s_time
 
+    def get_next_callback_time(self):
+        '''
+        Return the time when the next IDLE callback of the agents is due, so
+        the clock does not skip it. The callbacks are checked against the
+        market time, as in callBack(). Return -inf if some callback is due
+        already or its time is unknown, and inf if there is none
+        '''
+        f_now = self.order_matching.f_time
+        f_rtn = float('inf')
+        for i_id, agent_actions in iter(self.agents_actions.items()):
+            # agents of the old API handle every IDLE stop themselves
+            if getattr(agent_actions.owner, 'b_has_bidSide', False):
+                return float('-inf')
+            d_pcbacks = fx.pending_callbacks.get(i_id, None)
+            if d_pcbacks and not d_pcbacks['checked']:
+                return float('-inf')
+            d_callbacks = self.agents_callbacks[Source.IDLE].get(i_id, {})
+            for schdule_infos in d_callbacks:
+                if schdule_infos.kind == 'at':
+                    f_due = schdule_infos.at
+                else:
+                    f_due = schdule_infos._last_time + schdule_infos.every
+                if f_now > f_due:
+                    return float('-inf')
+                f_rtn = min(f_rtn, f_due)
+        return f_rtn
+
     def add_callback(self, func, source, trigger=neutrino.Source.MARKET,
                      i_id=11, s_instr=None, s_name=None):
         '''
@@ -477,8 +584,41 @@ class Env(object):
         s_name = '{}:{}:{}'.format(s_source, s_instr, s_conf)
         if s_instr in self.instr_data_subscribed:
             if s_name in self.instr_data_subscribed[s_instr]:
-                if i_id in self.instr_data_subscribed[s_instr][s_name]:
-                    self.instr_data_subscribed[s_instr][s_name].discard(i_id)
+                set_ids = self.instr_data_subscribed[s_instr][s_name]
+                if i_id in set_ids:
+                    set_ids.discard(i_id)
+                    # stop computing the indicator when the last agent
+                    # unsubscribes it
+                    if not set_ids and s_source != 'CANDLE':
+                        d_conf = dict([x.split('=')
+                                       for x in s_conf.split(';')])
+                        s_this_name = '{}:{}:interval={:0.0f}'.format(
+                            'CANDLE', s_instr, float(d_conf['interval']))
+                        d_aux = self.instr_data[s_instr].get(s_this_name)
+                        if d_aux:
+                            data_feeder.release_indicator(d_aux, s_name)
+
+    def get_candle_stores(self):
+        '''
+        Return a list with the CandleStore objects of the consecutive days
+        simulated up to the current one, the last being the current day.
+        Return an empty list if the current day has no candle store
+        '''
+        l_rtn = []
+        l_file = self.order_matching.l_file
+        i_idx = l_file.index(self.order_matching.s_file)
+        for s_file in reversed(l_file[:i_idx + 1]):
+            s_store = candle_store.get_store_path(s_file)
+            store = self.d_candle_stores.get(s_store)
+            if store is None:
+                s_log = event_log.get_event_log_path(s_file)
+                if not candle_store.has_store(s_store, s_log,
+                                              self.l_instrument):
+                    break
+                store = candle_store.CandleStore(s_store)
+                self.d_candle_stores[s_store] = store
+            l_rtn.insert(0, store)
+        return l_rtn
 
     def addIndicator(self, s_instr, s_source, s_conf, i_begin, i_id=11):
         '''
@@ -528,18 +668,26 @@ class Env(object):
             self.instr_data_subscribed[s_instr][s_name].add(i_id)
             d_aux['CANDLE_NAME'] = s_name
             if 'MAX' not in d_aux:
-                for s_field in ['MAX', 'MIN', 'LST', 'QTD', 'NTRADES', 'QTD_B',
-                                'QTD_S', 'CUMQTD', 'CUMQTD_B', 'CUMQTD_S',
-                                'VOLUME', 'TS']:
+                for s_field in data_feeder.CANDLE_FIELDS:
                     d_aux[s_field] = data_feeder.ElapsedList(
                         f_elapsed_time=f_time,
                         i_count=i_count,
                         s_type=s_field)
+                # include the bars before the current time, if stored
+                if self.b_use_candle_store:
+                    l_stores = self.get_candle_stores()
+                    if l_stores:
+                        candle_store.backfill_candle(
+                            d_aux, s_instr, l_stores, i_begin,
+                            self.order_matching.f_time)
         else:
             d_aux = self.instr_data[s_instr][s_this_name]
             s_name = '{}:{}:{}'.format(s_source, s_instr, s_conf)
-            d_aux[s_name] = []
-            d_aux['INDICATORS'].append(s_name)
+            # indicators with the same canonical name are computed once
+            data_feeder.share_indicator(d_aux, s_name)
+            # compute it right away if the candle already has bars
+            if 'LST' in d_aux and d_aux['LST'].count > 1:
+                d_aux = data_feeder.update_ta(True, d_aux)
             if s_name not in self.instr_data_subscribed[s_instr]:
                 self.instr_data_subscribed[s_instr][s_name] = set()
             self.instr_data_subscribed[s_instr][s_name].add(i_id)
@@ -584,12 +732,16 @@ class Env(object):
         self.instr_data_subscribed = {}
         self.order_matching.reset()
         self.reset_generator()
+        self.obj_perf.reset()
         neutrino.fx.initial_time = 0  # Hack
 
         # NOTE: it is ugly, but reset the order_matching idx. Should reviwe it
         self.order_matching.s_file
-        # shuffle seed
-        np.random.seed(seed=None)
+        # shuffle seed, or use a fixed one by trial if a seed was set
+        i_seed = None
+        if self.i_seed is not None:
+            i_seed = self.i_seed + self.count_trials
+        np.random.seed(seed=i_seed)
 
         # log the trial will start
         s_msg = '[reset]Environment: New Trial will start!'
@@ -728,10 +880,39 @@ class Env(object):
         agent.command(neutrino.Source.COMMAND, json.dumps({'bid': True}))
         agent.command(neutrino.Source.COMMAND, json.dumps({'ask': True}))
 
+    def get_perf_stats(self):
+        '''
+        Return a dictionary with the statistics of the profiling counters
+        since the last reset: the rows read and steps performed by second, the
+        microseconds by callback and the stats of each stage, with the
+        breakdown by instrument
+        '''
+        d_stats = self.obj_perf.get_stats()
+        d_stages = d_stats['stages']
+        d_read = d_stages.get('read', {})
+        d_step = d_stages.get('step', {})
+        d_callback = d_stages.get('callback', {})
+        d_stats['rows_per_s'] = d_read.get('per_second', 0.)
+        d_stats['steps_per_s'] = d_step.get('per_second', 0.)
+        d_stats['us_per_callback'] = d_callback.get('us_per_event', 0.)
+        return d_stats
+
     def callBack(self, agent, observation):
         '''
         Call some methods of the agent, depending on the events observed
 
+        :param agent: Agent object.
+        :param observation: Observation object.
+        '''
+        f_perf = self.obj_perf.start('callback')
+        agent_actions = self._callBack(agent, observation)
+        self.obj_perf.stop('callback', None, f_perf)
+        return agent_actions
+
+    def _callBack(self, agent, observation):
+        '''
+        Call some methods of the agent, depending on the events observed
+
         :param agent: Agent object.
         :param observation: Observation object.
         '''
@@ -779,7 +960,9 @@ class Env(object):
         # update indicators, if any is registered
         for s_instr in self.instr_data:
             d_these_candles = self.instr_data[s_instr]
+            f_perf = self.obj_perf.start('indicators', s_instr)
             t_aux = data_feeder.make_updates(s_instr, d_these_candles)
+            self.obj_perf.stop('indicators', s_instr, f_perf)
             d_update, d_these_candles = t_aux
             self.instr_data[s_instr] = d_these_candles
             # if d_these_candles and not agent.b_has_bidSide:
@@ -798,7 +981,7 @@ class Env(object):
                     d_data_subscribed = self.instr_data_subscribed[s_instr]
                     if inst_data['CANDLE_NAME'] in d_data_subscribed:
                         agent.indicatorData(('CANDLE', inst_data))
-                        for s_this_ta in inst_data['INDICATORS']:
+                        for s_this_ta in data_feeder.get_names(inst_data):
                             agent.indicatorData((s_this_ta, inst_data))
 
         # update the agent with trades that had occurred in the last step
@@ -907,7 +1090,9 @@ class Env(object):
                                     Source.IDLE,
                                     agent.i_id])
                             # func(updates)  # NOTE: no params passed anymore
+                            f_perf = self.obj_perf.start('agent')
                             func()
+                            self.obj_perf.stop('agent', None, f_perf)
                             # import pdb; pdb.set_trace()
                     for a, b, c in l_to_exclude:
                         self.remove_callback(s_name=a, trigger=b, i_id=c)
@@ -921,7 +1106,9 @@ class Env(object):
                             s_instr, s_side)
                         if i_idx != self.book_idx[s_instr][s_side]:
                             self.book_idx[s_instr][s_side] = i_idx
+                            f_perf = self.obj_perf.start('agent', s_instr)
                             agent_func(Source.MARKET, book=book_aux)
+                            self.obj_perf.stop('agent', s_instr, f_perf)
                             self.update_order_book(
                                 agent_actions.get_last_msgs())
             else:
@@ -953,7 +1140,9 @@ class Env(object):
                     if d_cb and s_instr in d_cb and book_aux._has_changed:
                         for s_src, func in d_cb[s_instr]:
                             # if book_aux._has_changed:
+                            f_perf = self.obj_perf.start('agent', s_instr)
                             func(updates)
+                            self.obj_perf.stop('agent', s_instr, f_perf)
                         book_aux._has_changed = False
                 # import pdb; pdb.set_trace()
 
@@ -972,7 +1161,10 @@ class Env(object):
         '''
         # Get the updates from the books that are not related to the history
         # until the stoptime
+        f_step = self.obj_perf.start('step')
+        f_perf = self.obj_perf.start('matching')
         l_msg = self.order_matching.next()
+        self.obj_perf.stop('matching', None, f_perf)
 
         # execute the actions passed
         f_reward = 0.
@@ -999,11 +1191,16 @@ class Env(object):
             s_msg += ' The session ended.'
             logging.info(s_msg.format(self.order_matching.s_time))
             d_info = {'total_steps': self.t}
+            if self.obj_perf.b_enabled:
+                s_msg = '[step]Environment: Performance counters\n{}'
+                logging.info(s_msg.format(self.obj_perf.format_stats()))
+                d_info['perf_stats'] = self.get_perf_stats()
 
         # hold last messages
         # self.last_observation.set_new_msgs(l_msg, self.t)
         self.last_observation.append_msg(l_msg, self.t)
         self.last_observation.update_features(self, actions)
+        self.obj_perf.stop('step', None, f_step)
         return self.last_observation, f_reward, self.done, d_info
 
     def update_order_book(self, l_msg):
@@ -1207,6 +1404,12 @@ class EnvWrapper(object):
         '''
         return self.env.callBack(agent, observation)
 
+    def get_perf_stats(self):
+        '''
+        Return a dictionary with the statistics of the profiling counters
+        '''
+        return self.env.get_perf_stats()
+
     def step(self, actions=None):
         '''
         Perform a discreate step in the environment updating the state of all
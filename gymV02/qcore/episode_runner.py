@@ -0,0 +1,439 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Run many simulation episodes, one per (date, agent parameters), in a pool of
+worker processes. Each worker has its own Env and agent, as neutrino.ENV is a
+global of the module, and sends back the trial data of each episode to be
+merged in a TrialResults object. Also sweep agent configurations from forks
+of an environment already replayed up to some time of the day
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import copy
+import multiprocessing
+import os
+import pickle
+import traceback
+
+from neutrinogym.envs import make
+from neutrinogym.qcore.env import EnvWrapper
+
+
+'''
+Begin help functions
+'''
+
+# configuration of the episodes run by this process. Set by _init_worker
+WORKER_CONF = {}
+# items of the Env.d_trial_data reported as they were filled by the env
+TRIAL_KEYS = ['final_pnl', 'final_duration', 'max_pnl', 'min_pnl',
+              'final_reward']
+
+
+class EpisodeFailedException(Exception):
+    """
+    EpisodeFailedException is raised by the run_episodes function to indicate
+    that a worker could not finish an episode
+    """
+    pass
+
+
+def _init_worker(agent_factory, d_env_params, s_env, f_pnl_interval,
+                 env_wrapper=None):
+    '''
+    Save in the process the configuration shared by all episodes
+
+    :param agent_factory: callable. Return a new agent from the parameters
+        of the episode. Should be pickable (a module-level function or class)
+    :param d_env_params: dictionary. Parameters of Env.setParameters, except
+        init and end
+    :param s_env: string. Name of the environment in envs.IMPLEMENTED_ENVS
+    :param f_pnl_interval: float. Seconds between each point of hist_pnl
+    :param env_wrapper*: callable. Return the environment passed wrapped,
+        as an EnvWrapper subclass. Should be pickable
+    '''
+    WORKER_CONF['agent_factory'] = agent_factory
+    WORKER_CONF['env_params'] = d_env_params
+    WORKER_CONF['env'] = s_env
+    WORKER_CONF['pnl_interval'] = f_pnl_interval
+    WORKER_CONF['env_wrapper'] = env_wrapper
+
+
+def _get_core_env(env):
+    '''
+    Return the Env object inside the wrappers of the environment passed
+
+    :param env: Env or EnvWrapper object.
+    '''
+    while isinstance(env, EnvWrapper):
+        env = env.env
+    return env
+
+
+def get_agent_pnl(env, agent):
+    '''
+    Return the PnL of the agent in the current episode, marking the open
+    position to the mid price of each book, and its positions by instrument.
+    Used when the environment does not fill its own trial data
+
+    :param env: Env object. The environment where the agent is trading
+    :param agent: Agent object.
+    '''
+    f_pnl = 0.
+    d_positions = {}
+    for s_symbol, instr in iter(agent._instr_stack.items()):
+        d_pos = instr._position
+        d_positions[s_symbol] = copy.deepcopy(d_pos)
+        f_pnl += d_pos['Ask'] - d_pos['Bid']
+        i_pos = d_pos['qBid'] - d_pos['qAsk']
+        if i_pos:
+            book_obj = env.get_order_book(s_symbol)
+            f_mid = (book_obj.best_bid[0] + book_obj.best_ask[0]) / 2.
+            f_pnl += i_pos * f_mid
+    return f_pnl, d_positions
+
+
+def _start_episode(s_date, agent_params):
+    '''
+    Create the environment and the agent of an episode and reset them.
+    Return the env, the agent and the first observation
+
+    :param s_date: string. date of the episode
+    :param agent_params: object. parameters passed to the agent_factory
+    '''
+    env = make(WORKER_CONF['env'])
+    if WORKER_CONF.get('env_wrapper', None):
+        env = WORKER_CONF['env_wrapper'](env)
+    d_env_params = dict(WORKER_CONF['env_params'])
+    d_env_params['init'] = s_date
+    d_env_params['end'] = s_date
+    env.setParameters(**d_env_params)
+    agent = WORKER_CONF['agent_factory'](agent_params)
+    observation = env.reset()
+    env.resetAgent(agent, hold_pos=False)
+    return env, agent, observation
+
+
+def _play(env, agent, observation, d_stats, f_until=None):
+    '''
+    Run the callBack/step loop of the episode, keeping the history of the
+    PnL in d_stats. Return the last observation and if the episode is over
+
+    :param env: Env object. The environment where the agent is trading
+    :param agent: Agent object.
+    :param observation: Observation object. The last observation
+    :param d_stats: dictionary. hist_pnl, next_pnl and reward of the episode
+    :param f_until*: float. Stop at this time of the day, in seconds. Run
+        until the close if not set
+    '''
+    f_interval = WORKER_CONF['pnl_interval']
+    while True:
+        actions = env.callBack(agent, observation)
+        try:
+            observation, f_rwd, b_done, _ = env.step(actions)
+        except StopIteration:
+            return observation, True
+        d_stats['reward'] += f_rwd
+        # keep the history of the PnL in intervals of market time
+        f_time = env.get_current_time(b_rtn_str=False)
+        if f_time >= d_stats['next_pnl']:
+            f_pnl, _ = get_agent_pnl(env, agent)
+            d_stats['hist_pnl'].append((f_time, f_pnl))
+            d_stats['next_pnl'] = f_time + f_interval
+        if b_done:
+            return observation, True
+        if f_until is not None and f_time >= f_until:
+            return observation, False
+
+
+def _get_trial_data(env, agent, s_date, agent_params, d_stats):
+    '''
+    Return the trial data of the episode just finished. The items of
+    TRIAL_KEYS come from the d_trial_data of the environment, when it fills
+    them at the end of the episode (as an EnvWrapper that computes the PnL of
+    the strategy). Otherwise, they are computed from the positions of the
+    agent, marked to the mid price
+
+    :param env: Env object. The environment where the agent traded
+    :param agent: Agent object.
+    :param s_date: string. date of the episode
+    :param agent_params: object. parameters used by the agent
+    :param d_stats: dictionary. hist_pnl, next_pnl, reward and the size of
+        each list of the d_trial_data of the env when the episode started
+    '''
+    f_pnl, d_positions = get_agent_pnl(env, agent)
+    l_hist_pnl = d_stats['hist_pnl']
+    l_pnl = [f_aux for _, f_aux in l_hist_pnl] or [f_pnl]
+    d_rtn = {'date': s_date,
+             'params': agent_params,
+             'final_pnl': f_pnl,
+             'final_duration': _get_core_env(env).t,
+             'max_pnl': max(l_pnl),
+             'min_pnl': min(l_pnl),
+             'final_reward': d_stats['reward'],
+             'hist_pnl': l_hist_pnl,
+             'agents_positions': {agent.i_id: d_positions}}
+    d_trial_data = env.d_trial_data
+    for s_key in TRIAL_KEYS:
+        if len(d_trial_data[s_key]) > d_stats['trial_sizes'][s_key]:
+            d_rtn[s_key] = d_trial_data[s_key][-1]
+    return d_rtn
+
+
+def _new_stats(env):
+    '''
+    Return the dictionary used to keep the stats of an episode
+
+    :param env: Env object. The environment of the episode
+    '''
+    return {'hist_pnl': [], 'next_pnl': 0., 'reward': 0.,
+            'trial_sizes': dict((s_key, len(env.d_trial_data[s_key]))
+                                for s_key in TRIAL_KEYS)}
+
+
+def run_episode(t_task):
+    '''
+    Run a full episode in the current process. Return the index of the task,
+    the trial data of the episode and the traceback, if it failed
+
+    :param t_task: tuple. (index of the task, date, agent parameters)
+    '''
+    i_task, s_date, agent_params = t_task
+    try:
+        env, agent, observation = _start_episode(s_date, agent_params)
+        d_stats = _new_stats(env)
+        _play(env, agent, observation, d_stats)
+        d_trial_data = _get_trial_data(env, agent, s_date, agent_params,
+                                       d_stats)
+        env.close()
+        return i_task, d_trial_data, None
+    except Exception:
+        return i_task, None, traceback.format_exc()
+
+
+def _read_child(t_child):
+    '''
+    Return the result sent by a forked child and wait for it to exit
+
+    :param t_child: tuple. (pid of the child, read end of its pipe)
+    '''
+    i_pid, i_read = t_child
+    l_chunks = []
+    while True:
+        s_chunk = os.read(i_read, 1 << 16)
+        if not s_chunk:
+            break
+        l_chunks.append(s_chunk)
+    os.close(i_read)
+    os.waitpid(i_pid, 0)
+    if not l_chunks:
+        return None, None, 'child process {} died'.format(i_pid)
+    return pickle.loads(b''.join(l_chunks))
+
+
+def _merge_result(obj_results, t_rtn, s_date, func_callback):
+    '''
+    Include the result of an episode in the TrialResults passed. Raise
+    EpisodeFailedException if the episode failed
+
+    :param obj_results: TrialResults object.
+    :param t_rtn: tuple. (index of the task, trial data, error message)
+    :param s_date: string. date of the episode
+    :param func_callback: function. Called with (i_task, d_episode)
+    '''
+    i_task, d_episode, s_err = t_rtn
+    if s_err:
+        s_msg = 'Episode {} ({}) failed:\n{}'
+        raise EpisodeFailedException(s_msg.format(i_task, s_date, s_err))
+    obj_results.add(i_task, d_episode)
+    if func_callback:
+        func_callback(i_task, d_episode)
+
+'''
+End help functions
+'''
+
+
+class TrialResults(object):
+    '''
+    Merge the trial data of many episodes in the same structure of the
+    Env.d_trial_data, with one item by episode in each list, sorted by the
+    order the tasks were passed
+    '''
+    def __init__(self, i_tasks):
+        '''
+        Initialize a TrialResults object
+
+        :param i_tasks: integer. Number of episodes to be merged
+        '''
+        self.i_tasks = i_tasks
+        self.l_episodes = [None] * i_tasks
+        self.i_done = 0
+
+    def add(self, i_task, d_episode):
+        '''
+        Include the trial data of an episode
+
+        :param i_task: integer. Index of the episode in the tasks
+        :param d_episode: dictionary. trial data from run_episode
+        '''
+        self.l_episodes[i_task] = d_episode
+        self.i_done += 1
+
+    @property
+    def d_trial_data(self):
+        '''
+        Return the trial data of all episodes finished, merged
+        '''
+        d_rtn = {'date': [],
+                 'params': [],
+                 'final_pnl': [],
+                 'final_duration': [],
+                 'max_pnl': [],
+                 'min_pnl': [],
+                 'final_reward': [],
+                 'hist_pnl': [],
+                 'agents_positions': []}
+        for d_episode in self.l_episodes:
+            if d_episode is None:
+                continue
+            for s_key in d_rtn:
+                d_rtn[s_key].append(d_episode[s_key])
+        return d_rtn
+
+
+def run_episodes(l_dates, agent_factory, d_env_params, l_agent_params=None,
+                 i_workers=None, s_env='LevelTwo', f_pnl_interval=60.,
+                 func_callback=None, env_wrapper=None):
+    '''
+    Run one episode for each combination of date and agent parameters in a
+    pool of processes. Return a TrialResults object
+
+    :param l_dates: list. dates of the episodes (format YYYYMMDD)
+    :param agent_factory: callable. Return a new agent from the parameters
+        of each episode. Should be pickable (a module-level function or class)
+    :param d_env_params: dictionary. Parameters of Env.setParameters, except
+        init and end
+    :param l_agent_params*: list. parameters of the agent to be tested in each
+        date. Use [None] if not set
+    :param i_workers*: integer. Number of processes. Use the number of CPUs if
+        not set. If 1, run the episodes in this process
+    :param s_env*: string. Name of the environment in envs.IMPLEMENTED_ENVS
+    :param f_pnl_interval*: float. Seconds between each point of hist_pnl
+    :param func_callback*: function. Called with (i_task, d_episode) as each
+        episode finishes
+    :param env_wrapper*: callable. Return the environment passed wrapped,
+        as an EnvWrapper subclass that fills its d_trial_data. Should be
+        pickable (a module-level function or class)
+    '''
+    if not l_agent_params:
+        l_agent_params = [None]
+    l_tasks = []
+    for agent_params in l_agent_params:
+        for s_date in l_dates:
+            l_tasks.append((len(l_tasks), s_date, agent_params))
+    obj_results = TrialResults(len(l_tasks))
+    t_initargs = (agent_factory, d_env_params, s_env, f_pnl_interval,
+                  env_wrapper)
+    if not i_workers:
+        i_workers = multiprocessing.cpu_count()
+    i_workers = min(i_workers, len(l_tasks))
+    pool = None
+    if i_workers > 1:
+        pool = multiprocessing.Pool(i_workers, initializer=_init_worker,
+                                    initargs=t_initargs)
+        iter_results = pool.imap_unordered(run_episode, l_tasks)
+    else:
+        _init_worker(*t_initargs)
+        iter_results = (run_episode(t_task) for t_task in l_tasks)
+    try:
+        # merge the episodes as they finish
+        for t_rtn in iter_results:
+            _merge_result(obj_results, t_rtn, l_tasks[t_rtn[0]][1],
+                          func_callback)
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+    return obj_results
+
+
+def run_forked_sweep(s_date, agent_factory, d_env_params, l_setparams,
+                     f_fork_time, agent_params=None, i_workers=None,
+                     s_env='LevelTwo', f_pnl_interval=60.,
+                     func_callback=None, env_wrapper=None):
+    '''
+    Replay the date passed up to f_fork_time once and fork a copy-on-write
+    child process for each configuration in l_setparams. Each child applies
+    its configuration with Env.set_agent_params and runs to the close. Return
+    a TrialResults object. Just available where os.fork exists
+
+    :param s_date: string. date of the episodes (format YYYYMMDD)
+    :param agent_factory: callable. Return a new agent from agent_params
+    :param d_env_params: dictionary. Parameters of Env.setParameters, except
+        init and end
+    :param l_setparams: list. Each item is a list of strings passed to
+        Env.set_agent_params(agent, 'parameters', l_txt)
+    :param f_fork_time: float. Time of the day, in seconds, to fork
+    :param agent_params*: object. parameters passed to the agent_factory
+    :param i_workers*: integer. Maximum number of children running at once.
+        Use the number of CPUs if not set
+    :param s_env*: string. Name of the environment in envs.IMPLEMENTED_ENVS
+    :param f_pnl_interval*: float. Seconds between each point of hist_pnl
+    :param func_callback*: function. Called with (i_task, d_episode) as each
+        episode finishes
+    :param env_wrapper*: callable. Return the environment passed wrapped,
+        as an EnvWrapper subclass that fills its d_trial_data
+    '''
+    if not hasattr(os, 'fork'):
+        raise EpisodeFailedException('os.fork is not available')
+    _init_worker(agent_factory, d_env_params, s_env, f_pnl_interval,
+                 env_wrapper)
+    env, agent, observation = _start_episode(s_date, agent_params)
+    d_stats = _new_stats(env)
+    observation, b_done = _play(env, agent, observation, d_stats,
+                                f_until=f_fork_time)
+    if b_done:
+        s_err = 'The episode of {} finished before the fork time'
+        raise EpisodeFailedException(s_err.format(s_date))
+    if not i_workers:
+        i_workers = multiprocessing.cpu_count()
+    obj_results = TrialResults(len(l_setparams))
+    l_running = []
+    try:
+        for i_task, l_txt in enumerate(l_setparams):
+            # wait for the oldest child, if there are too many running
+            if len(l_running) >= i_workers:
+                t_rtn = _read_child(l_running.pop(0))
+                _merge_result(obj_results, t_rtn, s_date, func_callback)
+            i_read, i_write = os.pipe()
+            i_pid = os.fork()
+            if i_pid == 0:
+                # child: set the configuration and run to the close
+                os.close(i_read)
+                try:
+                    env.set_agent_params(agent, 'parameters', l_txt)
+                    _play(env, agent, observation, d_stats)
+                    t_rtn = (i_task, _get_trial_data(
+                        env, agent, s_date, l_txt, d_stats), None)
+                except Exception:
+                    t_rtn = (i_task, None, traceback.format_exc())
+                s_data = pickle.dumps(t_rtn)
+                while s_data:
+                    s_data = s_data[os.write(i_write, s_data):]
+                os.close(i_write)
+                os._exit(0)
+            os.close(i_write)
+            l_running.append((i_pid, i_read))
+        while l_running:
+            t_rtn = _read_child(l_running.pop(0))
+            _merge_result(obj_results, t_rtn, s_date, func_callback)
+    finally:
+        for i_pid, i_read in l_running:
+            os.close(i_read)
+            os.waitpid(i_pid, 0)
+    env.close()
+    return obj_results
@@ -0,0 +1,1035 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Implement technical indicators updated one bar at a time, using the same
+definitions of TA-Lib. Each indicator keeps just the state needed to compute
+the next value, so a new or modified bar costs O(1) instead of a new pass of
+TA-Lib over the whole history kept in memory
+
+@author: ucaiado
+
+Created on 10/18/2026
+'''
+
+from collections import deque
+import math
+import numpy as np
+
+
+'''
+Begin help functions
+'''
+
+NAN = float('nan')
+
+# series of the candles that can be used as the input of an indicator
+SERIES_MAP = {'pmax': 'MAX',
+              'pmin': 'MIN',
+              'close': 'LST',
+              'quantity': 'QTD',
+              'volume': 'VOLUME',
+              'quantity_sell': 'QTD_S',
+              'quantity_buy': 'QTD_B',
+              'quantity_accumulated': 'CUMQTD',
+              'quantity_sell_accumulated': 'CUMQTD_S',
+              'quantity_buy_accumulated': 'CUMQTD_B'}
+
+HLC = ['MAX', 'MIN', 'LST']
+
+
+def is_zero(f_value):
+    '''
+    Return if the value is zero, as the TA_IS_ZERO macro of TA-Lib
+
+    :param f_value: float.
+    '''
+    return -1e-8 < f_value < 1e-8
+
+
+def true_range(f_high, f_low, f_prev_close):
+    '''
+    Return the greatest of high - low, |high - previous close| and
+    |low - previous close|
+
+    :param f_high: float.
+    :param f_low: float.
+    :param f_prev_close: float.
+    '''
+    f_rtn = f_high - f_low
+    f_aux = abs(f_high - f_prev_close)
+    if f_aux > f_rtn:
+        f_rtn = f_aux
+    f_aux = abs(f_low - f_prev_close)
+    if f_aux > f_rtn:
+        f_rtn = f_aux
+    return f_rtn
+
+
+def to_int(s_value, i_default):
+    '''
+    Return the value of a configuration as an integer
+
+    :param s_value: string. value of the configuration or None
+    :param i_default: integer. value used by TA-Lib if it is not set
+    '''
+    if s_value is None or s_value == '':
+        return i_default
+    return int(float(s_value))
+
+
+def to_float(s_value, f_default):
+    '''
+    Return the value of a configuration as a float
+
+    :param s_value: string. value of the configuration or None
+    :param f_default: float. value used by TA-Lib if it is not set
+    '''
+    if s_value is None or s_value == '':
+        return f_default
+    return float(s_value)
+
+
+'''
+End help functions
+'''
+
+
+class RollingWindow(object):
+    '''
+    Keep the sum and the sum of squares of the last i_period - 1 values
+    committed, so the window that ends at a new value is known without
+    changing the state
+    '''
+    def __init__(self, i_period):
+        '''
+        Initialize a RollingWindow object
+
+        :param i_period: integer. number of values of a full window
+        '''
+        self.i_period = i_period
+        self.values = deque()
+        self.f_sum = 0.
+        self.f_sum2 = 0.
+
+    def is_full(self):
+        '''
+        Return if a new value completes a window
+        '''
+        return len(self.values) + 1 >= self.i_period
+
+    def push(self, f_value):
+        '''
+        Include a value in the window and drop the oldest one, if needed
+
+        :param f_value: float.
+        '''
+        self.values.append(f_value)
+        self.f_sum += f_value
+        self.f_sum2 += f_value * f_value
+        if len(self.values) >= self.i_period:
+            f_old = self.values.popleft()
+            self.f_sum -= f_old
+            self.f_sum2 -= f_old * f_old
+
+
+class RollingExtreme(object):
+    '''
+    Keep the maximum (or minimum) of the last i_period - 1 values committed
+    using a monotonic queue
+    '''
+    def __init__(self, i_period, b_max=True):
+        '''
+        Initialize a RollingExtreme object
+
+        :param i_period: integer. number of values of a full window
+        :param b_max*: boolean. Keep the maximum. Keep the minimum if False
+        '''
+        self.i_period = i_period
+        self.b_max = b_max
+        self.queue = deque()  # (index, value)
+        self.i_count = 0
+
+    def get(self, f_value):
+        '''
+        Return the extreme of the window that ends at the value passed
+
+        :param f_value: float. new value, not committed
+        '''
+        if not self.queue:
+            return f_value
+        f_rtn = self.queue[0][1]
+        if self.b_max:
+            return f_value if f_value > f_rtn else f_rtn
+        return f_value if f_value < f_rtn else f_rtn
+
+    def push(self, f_value):
+        '''
+        Include a value in the window
+
+        :param f_value: float.
+        '''
+        queue = self.queue
+        if self.b_max:
+            while queue and queue[-1][1] <= f_value:
+                queue.pop()
+        else:
+            while queue and queue[-1][1] >= f_value:
+                queue.pop()
+        queue.append((self.i_count, f_value))
+        self.i_count += 1
+        while queue and queue[0][0] <= self.i_count - self.i_period:
+            queue.popleft()
+
+
+class SMA(object):
+    '''
+    Simple moving average. As the TA-Lib python wrapper, the leading NaNs of
+    the input are skipped
+    '''
+    i_outputs = 1
+
+    def __init__(self, i_period):
+        '''
+        Initialize a SMA object
+
+        :param i_period: integer.
+        '''
+        self.i_period = i_period
+        self.lookback = i_period - 1
+        self.window = RollingWindow(i_period)
+
+    def update(self, f_value, b_commit=True):
+        '''
+        Return the value of the indicator at a new bar. Just change the state
+        if b_commit is True. Otherwise, the bar can still be modified
+
+        :param f_value: float. value of the input at the bar
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        if f_value != f_value:
+            return NAN
+        window = self.window
+        f_rtn = NAN
+        if window.is_full():
+            f_rtn = (window.f_sum + f_value) / self.i_period
+        if b_commit:
+            window.push(f_value)
+        return f_rtn
+
+
+class EMA(object):
+    '''
+    Exponential moving average seeded by the simple average of the first
+    i_period values, as the default compatibility mode of TA-Lib
+    '''
+    i_outputs = 1
+
+    def __init__(self, i_period):
+        '''
+        Initialize an EMA object
+
+        :param i_period: integer.
+        '''
+        self.i_period = i_period
+        self.lookback = i_period - 1
+        self.f_k = 2. / (i_period + 1)
+        self.i_count = 0
+        self.f_sum = 0.
+        self.f_prev = NAN
+
+    def update(self, f_value, b_commit=True):
+        '''
+        Return the value of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_value: float. value of the input at the bar
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        if f_value != f_value:
+            return NAN
+        f_rtn = NAN
+        if self.i_count >= self.i_period:
+            f_rtn = ((f_value - self.f_prev) * self.f_k) + self.f_prev
+        elif self.i_count == self.i_period - 1:
+            f_rtn = (self.f_sum + f_value) / self.i_period
+        if b_commit:
+            self.i_count += 1
+            self.f_sum += f_value
+            self.f_prev = f_rtn
+        return f_rtn
+
+
+def get_ma(i_period, i_matype=0):
+    '''
+    Return a moving average object of the TA-Lib type passed
+
+    :param i_period: integer.
+    :param i_matype*: integer. 0 is SMA and 1 is EMA. The other TA-Lib types
+        are not implemented
+    '''
+    if i_period == 1 or i_matype == 0:
+        return SMA(i_period)
+    if i_matype == 1:
+        return EMA(i_period)
+    raise NotImplementedError('MA type {} is not streamed'.format(i_matype))
+
+
+class MOM(object):
+    '''
+    Momentum, the difference between the value and the value i_period bars
+    ago
+    '''
+    i_outputs = 1
+
+    def __init__(self, i_period):
+        '''
+        Initialize a MOM object
+
+        :param i_period: integer.
+        '''
+        self.i_period = i_period
+        self.window = deque()
+
+    def update(self, f_value, b_commit=True):
+        '''
+        Return the value of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_value: float. value of the input at the bar
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        f_rtn = NAN
+        if len(self.window) == self.i_period:
+            f_rtn = f_value - self.window[0]
+        if b_commit:
+            self.window.append(f_value)
+            if len(self.window) > self.i_period:
+                self.window.popleft()
+        return f_rtn
+
+
+class STDDEV(object):
+    '''
+    Standard deviation of the last i_period values, times f_nbdev
+    '''
+    i_outputs = 1
+
+    def __init__(self, i_period, f_nbdev=1.):
+        '''
+        Initialize a STDDEV object
+
+        :param i_period: integer.
+        :param f_nbdev*: float.
+        '''
+        self.i_period = i_period
+        self.f_nbdev = f_nbdev
+        self.window = RollingWindow(i_period)
+
+    def std(self, f_value):
+        '''
+        Return the standard deviation of the window that ends at the value
+        passed, or NaN if the window is not complete
+
+        :param f_value: float. value of the input at the bar
+        '''
+        window = self.window
+        if not window.is_full():
+            return NAN
+        f_mean = (window.f_sum + f_value) / self.i_period
+        f_var = (window.f_sum2 + f_value * f_value) / self.i_period
+        f_var -= f_mean * f_mean
+        if f_var < 1e-8:
+            return 0.
+        return math.sqrt(f_var)
+
+    def update(self, f_value, b_commit=True):
+        '''
+        Return the value of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_value: float. value of the input at the bar
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        f_rtn = self.std(f_value) * self.f_nbdev
+        if b_commit:
+            self.window.push(f_value)
+        return f_rtn
+
+
+class BBANDS(object):
+    '''
+    Bollinger bands. Return the upper, the middle and the lower bands
+    '''
+    i_outputs = 3
+
+    def __init__(self, i_period, f_nbdevup=2., f_nbdevdn=2., i_matype=0):
+        '''
+        Initialize a BBANDS object
+
+        :param i_period: integer.
+        :param f_nbdevup*: float. deviations of the upper band
+        :param f_nbdevdn*: float. deviations of the lower band
+        :param i_matype*: integer. TA-Lib type of the middle band
+        '''
+        self.f_nbdevup = f_nbdevup
+        self.f_nbdevdn = f_nbdevdn
+        self.ma = get_ma(i_period, i_matype)
+        self.stddev = STDDEV(i_period)
+
+    def update(self, f_value, b_commit=True):
+        '''
+        Return the values of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_value: float. value of the input at the bar
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        f_middle = self.ma.update(f_value, b_commit)
+        f_std = self.stddev.update(f_value, b_commit)
+        if f_middle != f_middle:
+            return NAN, NAN, NAN
+        return (f_middle + f_std * self.f_nbdevup,
+                f_middle,
+                f_middle - f_std * self.f_nbdevdn)
+
+
+class RSI(object):
+    '''
+    Relative strength index using the Wilder's smoothing
+    '''
+    i_outputs = 1
+
+    def __init__(self, i_period):
+        '''
+        Initialize a RSI object
+
+        :param i_period: integer.
+        '''
+        self.i_period = i_period
+        self.i_count = 0
+        self.f_prev = NAN
+        self.f_gain = 0.
+        self.f_loss = 0.
+
+    def update(self, f_value, b_commit=True):
+        '''
+        Return the value of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_value: float. value of the input at the bar
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        f_rtn = NAN
+        i_period = self.i_period
+        f_gain = self.f_gain
+        f_loss = self.f_loss
+        if self.i_count:
+            f_diff = f_value - self.f_prev
+            if self.i_count > i_period:
+                f_loss *= (i_period - 1)
+                f_gain *= (i_period - 1)
+            if f_diff < 0:
+                f_loss -= f_diff
+            else:
+                f_gain += f_diff
+            if self.i_count >= i_period:
+                f_loss /= i_period
+                f_gain /= i_period
+                f_aux = f_gain + f_loss
+                f_rtn = 0. if is_zero(f_aux) else 100. * (f_gain / f_aux)
+        if b_commit:
+            self.i_count += 1
+            self.f_prev = f_value
+            self.f_gain = f_gain
+            self.f_loss = f_loss
+        return f_rtn
+
+
+class OBV(object):
+    '''
+    On balance volume
+    '''
+    i_outputs = 1
+
+    def __init__(self):
+        '''
+        Initialize an OBV object
+        '''
+        self.f_prev = NAN
+        self.f_obv = NAN
+
+    def update(self, f_value, f_volume, b_commit=True):
+        '''
+        Return the value of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_value: float. value of the input at the bar
+        :param f_volume: float. volume at the bar
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        f_rtn = self.f_obv
+        if f_rtn != f_rtn:
+            f_rtn = f_volume
+        elif f_value > self.f_prev:
+            f_rtn += f_volume
+        elif f_value < self.f_prev:
+            f_rtn -= f_volume
+        if b_commit:
+            self.f_prev = f_value
+            self.f_obv = f_rtn
+        return f_rtn
+
+
+class TRANGE(object):
+    '''
+    True range
+    '''
+    i_outputs = 1
+
+    def __init__(self):
+        '''
+        Initialize a TRANGE object
+        '''
+        self.f_prev_close = NAN
+
+    def update(self, f_high, f_low, f_close, b_commit=True):
+        '''
+        Return the value of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_high: float.
+        :param f_low: float.
+        :param f_close: float.
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        f_rtn = NAN
+        if self.f_prev_close == self.f_prev_close:
+            f_rtn = true_range(f_high, f_low, self.f_prev_close)
+        if b_commit:
+            self.f_prev_close = f_close
+        return f_rtn
+
+
+class ATR(object):
+    '''
+    Average true range using the Wilder's smoothing
+    '''
+    i_outputs = 1
+
+    def __init__(self, i_period):
+        '''
+        Initialize an ATR object
+
+        :param i_period: integer.
+        '''
+        self.i_period = i_period
+        self.trange = TRANGE()
+        self.i_count = 0
+        self.f_sum = 0.
+        self.f_atr = NAN
+
+    def update(self, f_high, f_low, f_close, b_commit=True):
+        '''
+        Return the value of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_high: float.
+        :param f_low: float.
+        :param f_close: float.
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        f_tr = self.trange.update(f_high, f_low, f_close, b_commit)
+        i_period = self.i_period
+        if i_period == 1:
+            return f_tr
+        f_rtn = NAN
+        f_sum = self.f_sum
+        if self.i_count > i_period:
+            f_rtn = self.f_atr * (i_period - 1)
+            f_rtn += f_tr
+            f_rtn /= i_period
+        elif self.i_count:
+            f_sum += f_tr
+            if self.i_count == i_period:
+                f_rtn = f_sum / i_period
+        if b_commit:
+            self.i_count += 1
+            self.f_sum = f_sum
+            self.f_atr = f_rtn
+        return f_rtn
+
+
+class DMI(object):
+    '''
+    Directional movement indicators. Return the PLUS_DI, the MINUS_DI or the
+    ADX, as set by s_output
+    '''
+    i_outputs = 1
+
+    def __init__(self, i_period, s_output='ADX'):
+        '''
+        Initialize a DMI object
+
+        :param i_period: integer. Should be greater than 1
+        :param s_output*: string. PLUS_DI, MINUS_DI or ADX
+        '''
+        if i_period < 2:
+            raise NotImplementedError('DMI period 1 is not streamed')
+        self.i_period = i_period
+        self.s_output = s_output
+        self.i_count = 0
+        self.t_prev = None  # high, low and close of the last bar
+        self.f_pdm = 0.
+        self.f_mdm = 0.
+        self.f_tr = 0.
+        self.f_sumdx = 0.
+        self.f_adx = NAN
+
+    def update(self, f_high, f_low, f_close, b_commit=True):
+        '''
+        Return the value of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_high: float.
+        :param f_low: float.
+        :param f_close: float.
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        i_period = self.i_period
+        i_count = self.i_count
+        f_rtn = NAN
+        f_pdm, f_mdm, f_tr = self.f_pdm, self.f_mdm, self.f_tr
+        f_sumdx, f_adx = self.f_sumdx, self.f_adx
+        if i_count:
+            f_phigh, f_plow, f_pclose = self.t_prev
+            f_diffp = f_high - f_phigh
+            f_diffm = f_plow - f_low
+            if i_count >= i_period:
+                f_pdm -= f_pdm / i_period
+                f_mdm -= f_mdm / i_period
+            if f_diffm > 0 and f_diffp < f_diffm:
+                f_mdm += f_diffm
+            elif f_diffp > 0 and f_diffp > f_diffm:
+                f_pdm += f_diffp
+            if i_count >= i_period:
+                f_tr = f_tr - (f_tr / i_period)
+                f_tr += true_range(f_high, f_low, f_pclose)
+            else:
+                f_tr += true_range(f_high, f_low, f_pclose)
+            if i_count >= i_period:
+                if self.s_output == 'PLUS_DI':
+                    f_rtn = 0. if is_zero(f_tr) else 100. * (f_pdm / f_tr)
+                elif self.s_output == 'MINUS_DI':
+                    f_rtn = 0. if is_zero(f_tr) else 100. * (f_mdm / f_tr)
+                else:
+                    f_dx = NAN
+                    if not is_zero(f_tr):
+                        f_mdi = 100. * (f_mdm / f_tr)
+                        f_pdi = 100. * (f_pdm / f_tr)
+                        f_aux = f_mdi + f_pdi
+                        if not is_zero(f_aux):
+                            f_dx = 100. * (abs(f_mdi - f_pdi) / f_aux)
+                    if i_count < 2 * i_period:
+                        if f_dx == f_dx:
+                            f_sumdx += f_dx
+                        if i_count == 2 * i_period - 1:
+                            f_adx = f_sumdx / i_period
+                    elif f_dx == f_dx:
+                        f_adx = ((f_adx * (i_period - 1)) + f_dx) / i_period
+                    f_rtn = f_adx
+        if b_commit:
+            self.i_count += 1
+            self.t_prev = (f_high, f_low, f_close)
+            self.f_pdm, self.f_mdm, self.f_tr = f_pdm, f_mdm, f_tr
+            self.f_sumdx, self.f_adx = f_sumdx, f_adx
+        return f_rtn
+
+
+class SAR(object):
+    '''
+    Parabolic SAR
+    '''
+    i_outputs = 1
+
+    def __init__(self, f_acceleration=0.02, f_maximum=0.2):
+        '''
+        Initialize a SAR object
+
+        :param f_acceleration*: float. acceleration factor
+        :param f_maximum*: float. maximum of the acceleration factor
+        '''
+        if f_acceleration > f_maximum:
+            f_acceleration = f_maximum
+        self.f_acceleration = f_acceleration
+        self.f_maximum = f_maximum
+        self.t_first = None  # high and low of the first bar
+        self.t_state = None  # is long, sar, ep, af, prev high, prev low
+
+    def update(self, f_high, f_low, b_commit=True):
+        '''
+        Return the value of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_high: float.
+        :param f_low: float.
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        if self.t_first is None:
+            if b_commit:
+                self.t_first = (f_high, f_low)
+            return NAN
+        f_acc = self.f_acceleration
+        f_max = self.f_maximum
+        if self.t_state is None:
+            # the first direction is given by the minus DM of the 2nd bar
+            f_high0, f_low0 = self.t_first
+            f_diffp = f_high - f_high0
+            f_diffm = f_low0 - f_low
+            b_long = not (f_diffm > 0 and f_diffp < f_diffm)
+            if b_long:
+                f_ep, f_sar = f_high, f_low0
+            else:
+                f_ep, f_sar = f_low, f_high0
+            f_af = f_acc
+            f_phigh, f_plow = f_high, f_low
+        else:
+            b_long, f_sar, f_ep, f_af, f_phigh, f_plow = self.t_state
+        if b_long:
+            if f_low <= f_sar:
+                b_long = False
+                f_sar = max(f_ep, f_phigh, f_high)
+                f_rtn = f_sar
+                f_af = f_acc
+                f_ep = f_low
+                f_sar = f_sar + f_af * (f_ep - f_sar)
+                f_sar = max(f_sar, f_phigh, f_high)
+            else:
+                f_rtn = f_sar
+                if f_high > f_ep:
+                    f_ep = f_high
+                    f_af = min(f_af + f_acc, f_max)
+                f_sar = f_sar + f_af * (f_ep - f_sar)
+                f_sar = min(f_sar, f_plow, f_low)
+        else:
+            if f_high >= f_sar:
+                b_long = True
+                f_sar = min(f_ep, f_plow, f_low)
+                f_rtn = f_sar
+                f_af = f_acc
+                f_ep = f_high
+                f_sar = f_sar + f_af * (f_ep - f_sar)
+                f_sar = min(f_sar, f_plow, f_low)
+            else:
+                f_rtn = f_sar
+                if f_low < f_ep:
+                    f_ep = f_low
+                    f_af = min(f_af + f_acc, f_max)
+                f_sar = f_sar + f_af * (f_ep - f_sar)
+                f_sar = max(f_sar, f_phigh, f_high)
+        if b_commit:
+            self.t_state = (b_long, f_sar, f_ep, f_af, f_high, f_low)
+        return f_rtn
+
+
+class STOCH(object):
+    '''
+    Stochastic oscillator. Return the slow K and the slow D, or the fast K
+    and the fast D if i_slowd_period is None (STOCHF)
+    '''
+    i_outputs = 2
+
+    def __init__(self, i_fastk_period, i_slowk_period, i_slowk_matype,
+                 i_slowd_period=None, i_slowd_matype=0):
+        '''
+        Initialize a STOCH object
+
+        :param i_fastk_period: integer.
+        :param i_slowk_period: integer. period of the fast D on STOCHF
+        :param i_slowk_matype: integer. type of the fast D on STOCHF
+        :param i_slowd_period*: integer.
+        :param i_slowd_matype*: integer.
+        '''
+        self.i_period = i_fastk_period
+        self.highest = RollingExtreme(i_fastk_period, True)
+        self.lowest = RollingExtreme(i_fastk_period, False)
+        self.i_count = 0
+        self.ma1 = get_ma(i_slowk_period, i_slowk_matype)
+        self.ma2 = None
+        if i_slowd_period:
+            self.ma2 = get_ma(i_slowd_period, i_slowd_matype)
+
+    def update(self, f_high, f_low, f_close, b_commit=True):
+        '''
+        Return the values of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_high: float.
+        :param f_low: float.
+        :param f_close: float.
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        f_fastk = NAN
+        if self.i_count >= self.i_period - 1:
+            f_lowest = self.lowest.get(f_low)
+            f_diff = (self.highest.get(f_high) - f_lowest) / 100.
+            f_fastk = 0.
+            if f_diff != 0.:
+                f_fastk = (f_close - f_lowest) / f_diff
+        if b_commit:
+            self.i_count += 1
+            self.highest.push(f_high)
+            self.lowest.push(f_low)
+        f_k = self.ma1.update(f_fastk, b_commit)
+        if not self.ma2:
+            if f_k != f_k:
+                return NAN, NAN
+            return f_fastk, f_k
+        f_d = self.ma2.update(f_k, b_commit)
+        if f_d != f_d:
+            return NAN, NAN
+        return f_k, f_d
+
+
+class MACD(object):
+    '''
+    Moving average convergence/divergence with controllable MA types, as the
+    MACDEXT of TA-Lib. Return the MACD, the signal and the histogram
+    '''
+    i_outputs = 3
+
+    def __init__(self, i_fast_period, i_fast_matype, i_slow_period,
+                 i_slow_matype, i_signal_period, i_signal_matype):
+        '''
+        Initialize a MACD object
+
+        :param i_fast_period: integer.
+        :param i_fast_matype: integer.
+        :param i_slow_period: integer.
+        :param i_slow_matype: integer.
+        :param i_signal_period: integer.
+        :param i_signal_matype: integer.
+        '''
+        if i_slow_period < i_fast_period:
+            i_slow_period, i_fast_period = i_fast_period, i_slow_period
+            i_slow_matype, i_fast_matype = i_fast_matype, i_slow_matype
+        self.fast = get_ma(i_fast_period, i_fast_matype)
+        self.slow = get_ma(i_slow_period, i_slow_matype)
+        self.signal = get_ma(i_signal_period, i_signal_matype)
+        # both averages start at the bar that the slowest one is ready
+        i_largest = max(self.fast.lookback, self.slow.lookback)
+        self.i_fast_start = i_largest - self.fast.lookback
+        self.i_slow_start = i_largest - self.slow.lookback
+        self.i_count = 0
+
+    def update(self, f_value, b_commit=True):
+        '''
+        Return the values of the indicator at a new bar. Just change the state
+        if b_commit is True
+
+        :param f_value: float. value of the input at the bar
+        :param b_commit*: boolean. If the bar is closed
+        '''
+        f_fast = f_slow = NAN
+        if self.i_count >= self.i_fast_start:
+            f_fast = self.fast.update(f_value, b_commit)
+        if self.i_count >= self.i_slow_start:
+            f_slow = self.slow.update(f_value, b_commit)
+        if b_commit:
+            self.i_count += 1
+        f_macd = f_fast - f_slow
+        f_signal = self.signal.update(f_macd, b_commit)
+        if f_signal != f_signal:
+            return NAN, NAN, NAN
+        return f_macd, f_signal, f_macd - f_signal
+
+
+class Smoothed(object):
+    '''
+    Simple moving average of each output of other indicator, as the SA*
+    indicators of Neutrino
+    '''
+    def __init__(self, indicator, i_period):
+        '''
+        Initialize a Smoothed object
+
+        :param indicator: object. indicator to be smoothed
+        :param i_period: integer. period of the moving average
+        '''
+        self.indicator = indicator
+        self.i_outputs = indicator.i_outputs
+        self.l_ma = [SMA(i_period) for _ in range(self.i_outputs)]
+
+    def update(self, *args, **kwargs):
+        '''
+        Return the values of the indicator at a new bar. Just change the state
+        if b_commit is True
+        '''
+        b_commit = kwargs.get('b_commit', True)
+        t_values = self.indicator.update(*args, **kwargs)
+        if self.i_outputs == 1:
+            return self.l_ma[0].update(t_values, b_commit)
+        return tuple(ma.update(f_value, b_commit)
+                     for ma, f_value in zip(self.l_ma, t_values))
+
+
+def make_indicator(s_ta_key, d_conf, i_timeperiod, s_input=None):
+    '''
+    Return the streaming indicator and the list of candle series used as its
+    inputs. Raise NotImplementedError if the configuration is not streamed
+
+    :param s_ta_key: string. name of the indicator on the neutrino API
+    :param d_conf: dictionary. configuration of the indicator
+    :param i_timeperiod: integer. number of bars of the indicator
+    :param s_input*: string. input of the indicators that accept one
+    '''
+    l_input = None
+    if s_input:
+        if s_input not in SERIES_MAP:
+            raise NotImplementedError('input {} is not streamed'.format(
+                s_input))
+        l_input = [SERIES_MAP[s_input]]
+    i_saperiod = to_int(d_conf.get('sa_period'), 30)
+    if s_ta_key == 'SMA':
+        return SMA(i_timeperiod), l_input
+    elif s_ta_key == 'EMA':
+        return EMA(i_timeperiod), l_input
+    elif s_ta_key == 'MOM':
+        return MOM(i_timeperiod), l_input
+    elif s_ta_key == 'SAMOM':
+        return Smoothed(MOM(i_timeperiod), i_saperiod), l_input
+    elif s_ta_key == 'STDDEV':
+        f_nbdev = to_float(d_conf.get('nbdev'), 1.)
+        return STDDEV(i_timeperiod, f_nbdev), l_input
+    elif s_ta_key == 'RSI':
+        return RSI(i_timeperiod), l_input
+    elif s_ta_key == 'OBV':
+        return OBV(), l_input + ['VOLUME']
+    elif s_ta_key in ('BBANDS', 'SABBANDS'):
+        obj = BBANDS(i_timeperiod,
+                     to_float(d_conf.get('nbdevup'), 2.),
+                     to_float(d_conf.get('nbdevdn'), 2.),
+                     to_int(d_conf.get('matype'), 0))
+        if s_ta_key == 'SABBANDS':
+            obj = Smoothed(obj, i_saperiod)
+        return obj, ['LST']
+    elif s_ta_key == 'TRANGE':
+        return TRANGE(), HLC
+    elif s_ta_key == 'SATR':
+        return Smoothed(TRANGE(), i_timeperiod), HLC
+    elif s_ta_key == 'ATR':
+        return ATR(i_timeperiod), HLC
+    elif s_ta_key in ('ADX', 'PLUS_DI', 'MINUS_DI'):
+        return DMI(i_timeperiod, s_ta_key), HLC
+    elif s_ta_key == 'SAADX':
+        return Smoothed(DMI(i_timeperiod, 'ADX'), i_saperiod), HLC
+    elif s_ta_key == 'SAR':
+        return SAR(to_float(d_conf.get('acceleration'), 0.02),
+                   to_float(d_conf.get('maximum'), 0.2)), ['MAX', 'MIN']
+    elif s_ta_key == 'STOCH':
+        return STOCH(to_int(d_conf.get('fast_k_ma_period'), 5),
+                     to_int(d_conf.get('slow_k_ma_period'), 3),
+                     to_int(d_conf.get('slow_k_ma_type'), 0),
+                     to_int(d_conf.get('slow_d_ma_period'), 3),
+                     to_int(d_conf.get('slow_d_ma_type'), 0)), HLC
+    elif s_ta_key == 'STOCHF':
+        return STOCH(to_int(d_conf.get('fast_k_ma_period'), 5),
+                     to_int(d_conf.get('fast_d_ma_period'), 3),
+                     to_int(d_conf.get('fast_d_ma_type'), 0)), HLC
+    elif s_ta_key == 'MACD':
+        return MACD(to_int(d_conf.get('fast_ma_period'), 12),
+                    to_int(d_conf.get('fast_ma_type'), 0),
+                    to_int(d_conf.get('slow_ma_period'), 26),
+                    to_int(d_conf.get('slow_ma_type'), 0),
+                    to_int(d_conf.get('signal_ma_period'), 9),
+                    to_int(d_conf.get('signal_ma_type'), 0)), ['LST']
+    raise NotImplementedError('{} is not streamed'.format(s_ta_key))
+
+
+class StreamingIndicator(object):
+    '''
+    Keep an indicator in sync with the ElapsedList objects of a candle. The
+    closed bars are committed to the indicator just once, and the last bar,
+    that can still be modified, is recomputed from the committed state. The
+    values are kept in an array with room for two windows, so the history of
+    the indicator is returned as a view with the same length of the candle.
+    TA-Lib just uses the bars in memory, so the recursive indicators (EMA,
+    RSI, ATR, ADX, SAR, OBV, MACD) would not match it if they kept the state
+    from the first bar after the candle drops its oldest bars. OBV, for one,
+    would keep the dropped volumes as a constant offset. So the indicator is
+    rebuilt from the oldest bar in memory each time the candle drops a bar.
+    The updates of the last bar are still O(1)
+    '''
+    def __init__(self, s_ta_key, d_conf, i_timeperiod, s_input, i_count):
+        '''
+        Initialize a StreamingIndicator object. Raise NotImplementedError if
+        the configuration is not streamed
+
+        :param s_ta_key: string. name of the indicator on the neutrino API
+        :param d_conf: dictionary. configuration of the indicator
+        :param i_timeperiod: integer. number of bars of the indicator
+        :param s_input: string. input of the indicators that accept one
+        :param i_count: integer. maximum number of bars of the candle
+        '''
+        self.t_conf = (s_ta_key, d_conf, i_timeperiod, s_input)
+        self.indicator, self.l_series = make_indicator(*self.t_conf)
+        self.i_count = i_count
+        self.i_outputs = self.indicator.i_outputs
+        self.na_out = np.full((self.i_outputs, 2 * i_count), np.nan)
+        self.i_end = 0  # column of the last bar
+        self.i_bars = 0  # bars committed since the start of the candle
+        self.i_first = 0  # bars dropped by the candle before the first one
+
+    def _rebuild(self, i_first):
+        '''
+        Restart the indicator from the first bar kept in memory
+
+        :param i_first: integer. number of bars already dropped by the candle
+        '''
+        self.indicator = make_indicator(*self.t_conf)[0]
+        self.na_out[:] = np.nan
+        self.i_end = 0
+        self.i_bars = i_first
+        self.i_first = i_first
+
+    def _get_bar(self, l_series, i_offset):
+        '''
+        Return a tuple with the inputs of a bar
+
+        :param l_series: list. values of the ElapsedList objects used as input
+        :param i_offset: integer. bars before the last one
+        '''
+        return tuple(float(na_values[-1 - i_offset]) for na_values in l_series)
+
+    def update(self, d_instr_data):
+        '''
+        Commit the bars closed since the last call and return the history of
+        the indicator as an array of shape (outputs, bars). Return None if
+        the candle has less than 2 bars
+
+        :param d_instr_data: dictionary. data of the candle
+        '''
+        obj_lst = d_instr_data['LST']
+        i_len = obj_lst.count
+        if i_len < 2:
+            return None
+        i_total = obj_lst.i_bars
+        i_first = i_total - i_len
+        if self.i_bars > i_total - 1 or self.i_first != i_first:
+            self._rebuild(i_first)
+        l_series = [d_instr_data[s_key].l for s_key in self.l_series]
+        indicator = self.indicator
+        na_out = self.na_out
+        i_size = na_out.shape[1]
+        while self.i_bars < i_total - 1:
+            t_bar = self._get_bar(l_series, i_total - 1 - self.i_bars)
+            na_out[:, self.i_end] = indicator.update(*t_bar, b_commit=True)
+            self.i_bars += 1
+            self.i_end += 1
+            if self.i_end == i_size:
+                # keep just the last window
+                i_keep = self.i_count - 1
+                na_out[:, :i_keep] = na_out[:, self.i_end - i_keep:self.i_end]
+                self.i_end = i_keep
+        t_bar = self._get_bar(l_series, 0)
+        na_out[:, self.i_end] = indicator.update(*t_bar, b_commit=False)
+        return na_out[:, self.i_end + 1 - i_len:self.i_end + 1]
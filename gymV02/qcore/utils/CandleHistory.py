@@ -47,7 +47,8 @@ class CandleHistory(object):
     # CandleHistory
     def POpenAsNumpy(self):
         _, d_data = self._tab
-        return d_data['LST'].get_last_values_as_array()
+        # NOTE the same shift used by POpen
+        return np.roll(d_data['LST'].get_last_values_as_array(), 1)
 
     # CandleHistory
     def POpenLength(self):
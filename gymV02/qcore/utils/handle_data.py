@@ -53,11 +53,81 @@ def fill_orderinfo(order):
                      order.userData['id'], order.isAlive(), order.isPending())
 
 
+def iter_trades(trades, i_first):
+    '''
+    Iterate the trades passed as TradeInfo tuples, from the index passed. A
+    trade tape is read in bulk, instead of trade by trade
+
+    :param trades: neutrino trades. trades of an instrument
+    :param i_first: integer. index of the first trade
+    '''
+    if hasattr(trades, 'trades_since'):
+        t_trades = trades.trades_since()
+        l_values = [na_aux[i_first:].tolist() for na_aux in t_trades]
+        for f_price, i_qty, i_agr, i_id, i_time in zip(*l_values):
+            yield TradeInfo(f_price, i_qty, 'ND', 'ND', i_time,
+                            '+' if i_agr > 0 else '-', i_id)
+        return
+    for idx in range(i_first, len(trades)):
+        obj_trade = trades[idx]
+        yield TradeInfo(obj_trade.price, obj_trade.quantity,
+                        obj_trade.buyer, obj_trade.seller, obj_trade.time,
+                        obj_trade.status, obj_trade.tradeID)
+
+
 '''
 End help functions
 '''
 
 
+class CandleColumn(object):
+    '''
+    Growable numpy column that keeps the history of a candle information. The
+    last bar is replaced and the new ones are appended in place
+    '''
+    def __init__(self, i_width=None, i_size=64):
+        '''
+        Instatiate a CandleColumn object
+
+        :param i_width: integer. number of values by bar. None for scalars
+        :param i_size: integer. initial capacity of the buffer, in bars
+        '''
+        self.i_width = i_width
+        t_shape = (i_size,) if i_width is None else (i_size, i_width)
+        self.na_buffer = np.full(t_shape, np.nan)
+        self.i_len = 0
+
+    def __len__(self):
+        return self.i_len
+
+    def set_tail(self, na_values):
+        '''
+        Replace the last bar by the first value passed and append the others
+
+        :param na_values: numpy array. the values from the last bar on
+        '''
+        i_pos = max(0, self.i_len - 1)
+        i_end = i_pos + len(na_values)
+        if i_end > self.na_buffer.shape[0]:
+            t_shape = list(self.na_buffer.shape)
+            t_shape[0] = max(2 * t_shape[0], i_end)
+            na_aux = np.full(tuple(t_shape), np.nan)
+            na_aux[:self.i_len] = self.na_buffer[:self.i_len]
+            self.na_buffer = na_aux
+        self.na_buffer[i_pos:i_end] = na_values
+        self.i_len = i_end
+
+    @property
+    def values(self):
+        '''
+        Return the values as a read-only view of the buffer. It should not be
+        kept between updates
+        '''
+        na_rtn = self.na_buffer[:self.i_len]
+        na_rtn.flags.writeable = False
+        return na_rtn
+
+
 class CandlesHandler(object):
     '''
     Candles Data Handler
@@ -91,7 +161,16 @@ class CandlesHandler(object):
             self._alias = {}
             self._key_to_alias = {}
         else:
+            # an alias just unsubscribes the indicator it refers to
+            s_target = None
+            if b_t and not isinstance(this_conf, dict):
+                s_target = this_candle._alias.get(this_conf, None)
             for d_conf in this_candle.l_to_subscribe:
+                if s_target:
+                    s_name = '{}:{}:{}'.format(
+                        d_conf['what'], d_conf['symbol'], d_conf['conf'])
+                    if s_name != s_target:
+                        continue
                 if str(d_conf['what']) != 'CANDLE' and b_t:
                     if isinstance(this_conf, dict):
                         if sum(
@@ -220,7 +299,8 @@ class CandlesHandler(object):
 
         :param this_candle: CandleData object. Candle to retrive information
         :param s_alias: string. alias to the indicator desired
-        :return: numpy array. The values of the information required
+        :return: numpy array. Read-only view of the values required. It
+            should not be kept between updates
         '''
         l_basic = ['HIGH', 'LOW', 'CLOSE', 'OPEN', 'QTY', 'VOLUME', 'TS',
                    'QTY_BUYER', 'QTY_SELLER', 'CUMQTY_SELLER', 'CUMQTY_BUYER',
@@ -236,12 +316,14 @@ class CandlesHandler(object):
             s_info = s_alias
 
         d_data = this_candle.d_candle_data[s_name]
+        if not d_data['data']:
+            return None
         if s_info2 == 'CANDLE':
             if len(d_data['data'][s_info]) > 0:
-                return np.array(d_data['data'][s_info])
+                return d_data['data'][s_info].values
         else:
             if len(d_data['data']) > 0:
-                return np.array(d_data['data'])
+                return d_data['data'].values
         return None
 
     def update(self, hist):
@@ -362,17 +444,17 @@ class CandleData(object):
                     s_name += ';time_period={:0.0f}'.format(f_timeperiod)
 
         d_data = self.d_candle_data[s_name]
+        if not d_data['data']:
+            return None
         if s_info2 == 'CANDLE':
-            if not d_data['data']:
-                return None
-            if not d_data['data'][s_info]:
-                return None
-            if len(d_data['data'][s_info]) >= abs(i_idx):
-                return d_data['data'][s_info][i_idx]
+            obj_col = d_data['data'][s_info]
         else:
-            if d_data['data'] and len(d_data['data']) >= abs(i_idx):
-                return d_data['data'][i_idx][i_inner_idx]
-        return None
+            obj_col = d_data['data']
+        if not len(obj_col) or len(obj_col) < abs(i_idx):
+            return None
+        if s_info2 == 'CANDLE':
+            return obj_col.na_buffer[:obj_col.i_len][i_idx]
+        return obj_col.na_buffer[:obj_col.i_len][i_idx][i_inner_idx]
 
     def add_indicator(self, **kwargs):
         '''
@@ -544,48 +626,42 @@ class CandleData(object):
 
         if s_name not in self.d_candle_data or not i_len:
             return False
+        # the values from i_begin_idx on replace the last bar and append the
+        # new ones to the columns, so the cost does not grow with the history
         if 'CANDLE' in s_name:
             l_keys = ['HIGH', 'LOW', 'CLOSE', 'OPEN', 'QTY', 'VOLUME', 'TS',
                       'QTY_BUYER', 'QTY_SELLER', 'CUMQTY', 'CUMQTY_BUYER',
                       'CUMQTY_SELLER']
-            l_funvalues = [hist.PMax, hist.PMin, hist.PClose, hist.POpen,
-                           hist.Quantity, hist.Volume, hist.Timestamps,
-                           hist.QuantityBuy, hist.QuantitySell,
-                           hist.QuantityAccumulated,
-                           hist.QuantityBuyAccumulated,
-                           hist.QuantitySellAccumulated]
+            l_funvalues = [hist.PMaxAsNumpy, hist.PMinAsNumpy,
+                           hist.PCloseAsNumpy, hist.POpenAsNumpy,
+                           hist.QuantityAsNumpy, hist.VolumeAsNumpy,
+                           hist.TimestampsAsNumpy, hist.QuantityBuyAsNumpy,
+                           hist.QuantitySellAsNumpy,
+                           hist.QuantityAccumulatedAsNumpy,
+                           hist.QuantityBuyAccumulatedAsNumpy,
+                           hist.QuantitySellAccumulatedAsNumpy]
+            d_columns = self.d_candle_data[s_name]['data']
+            if not d_columns:
+                d_columns = dict((s_key, CandleColumn()) for s_key in l_keys)
+                self.d_candle_data[s_name]['data'] = d_columns
             for s_key, func in zip(l_keys, l_funvalues):
-                l_data = [func(i) for i in range(i_begin_idx, i_len)]
-                try:
-                    # if b_replace:
-                    l_aux = self.d_candle_data[s_name]['data'][s_key]
-                    l_aux = l_aux[:-1] + l_data
-                    if s_key == 'TS':
-                        self.i_count = len(l_aux)
-                    self.d_candle_data[s_name]['data'][s_key] = l_aux
-                    # else:
-                    #     self.d_candle_data[s_name]['data'][s_key] += l_data
-                except KeyError:
-                    self.d_candle_data[s_name]['data'][s_key] = l_data
-                except TypeError:
-                    self.d_candle_data[s_name]['data'] = {}
-                    self.d_candle_data[s_name]['data'][s_key] = l_data
+                d_columns[s_key].set_tail(func()[i_begin_idx:i_len])
+            self.i_count = len(d_columns['TS'])
         else:
             i_len2 = hist.Result(0).IndicatorLength()
             i_len3 = hist.ResultLength()
-            if i_len2 != i_len:
-                l_data = [[None] for i in range(i_begin_idx, i_len)]
-            else:
+            obj_col = self.d_candle_data[s_name]['data']
+            if not obj_col:
+                obj_col = CandleColumn(i_width=i_len3)
+                self.d_candle_data[s_name]['data'] = obj_col
+            i_new = max(0, i_len - i_begin_idx)
+            na_data = np.full((i_new, obj_col.i_width), np.nan)
+            if i_len2 == i_len:
                 # TODO: include treatmet to hist.Result(0).IndicatorLength == 0
-                # pdb.set_trace()
-                l_data = [[hist.Result(j).Indicator(i) for j in xrange(i_len3)]
-                           for i in range(i_begin_idx, i_len)]
-            try:
-                l_aux = self.d_candle_data[s_name]['data']
-                l_aux = l_aux[:-1] + l_data
-                self.d_candle_data[s_name]['data'] = l_aux
-            except TypeError:
-                self.d_candle_data[s_name]['data'] = l_data
+                for j in range(i_len3):
+                    na_aux = hist.Result(j).IndicatorAsNumpy()
+                    na_data[:, j] = na_aux[i_begin_idx:i_len]
+            obj_col.set_tail(na_data)
 
         # return self.d_candle_data[s_name]['ID'] == self._last_idx
         b_all_updated = self.data_updated == self.count
@@ -644,8 +720,11 @@ class BookSideHandler(object):
         :return: iterator (or list) of TradeInfo tuples.
         '''
         book_side = self.get_book_side(instrument, book=book)
+        # byPrice reads from the depth snapshot cached by the book side
+        if book_side is None:
+            return [PriceLevelInfo(None, 0)]
         price_group = neutrino.byPrice(book_side, i_depth)
-        if not book_side or not price_group:
+        if not price_group:
             return [PriceLevelInfo(None, 0)]
         i_len = len(price_group)
         if not i_len:
@@ -871,21 +950,13 @@ class BookHandler(object):
         i_iterate = len(trades) - summary.tradeCount
 
         if b_aslist:
-            l = [TradeInfo(trades[idx].price, trades[idx].quantity,
-                           trades[idx].buyer, trades[idx].seller,
-                           trades[idx].time, trades[idx].status,
-                           trades[idx].tradeID)
-                 for idx in range(max(0, i_iterate), len(trades))]
+            l = list(iter_trades(trades, max(0, i_iterate)))
             if l:
                 instrument.last_trade = l[-1]
             return l
 
         def iter_func(trades, i_iterate, instrument):
-            for idx in range(max(0, i_iterate), len(trades)):
-                obj_rtn = TradeInfo(trades[idx].price, trades[idx].quantity,
-                                    trades[idx].buyer, trades[idx].seller,
-                                    trades[idx].time, trades[idx].status,
-                                    trades[idx].tradeID)
+            for obj_rtn in iter_trades(trades, max(0, i_iterate)):
                 instrument.last_trade = obj_rtn
                 yield obj_rtn
         return iter_func(trades, i_iterate, instrument)
@@ -913,11 +984,11 @@ class BookHandler(object):
         idx = len(trades)
         if not idx:
             return None
-        idx -= 1
-        obj_rtn = TradeInfo(trades[idx].price, trades[idx].quantity,
-                            trades[idx].buyer, trades[idx].seller,
-                            trades[idx].time, trades[idx].status,
-                            trades[idx].tradeID)
+        obj_trade = trades[idx - 1]
+        obj_rtn = TradeInfo(obj_trade.price, obj_trade.quantity,
+                            obj_trade.buyer, obj_trade.seller,
+                            obj_trade.time, obj_trade.status,
+                            obj_trade.tradeID)
         instrument.last_trade = obj_rtn
         return obj_rtn.price
 
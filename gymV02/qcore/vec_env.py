@@ -0,0 +1,248 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Implement a vectorized environment that holds many independent replays in the
+same process, so a policy can choose the actions of all of them in a batch.
+As the neutrino API resolves everything through globals of its module, the
+neutrino context is switched to the one of each sub-environment before it is
+used
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import numpy as np
+
+import neutrinogym.neutrino as neutrino
+from neutrinogym.neutrino import fx, oms_client
+from neutrinogym.envs import make
+from . import agent as qcore_agent
+from . import data_feeder
+from .utils.handle_orders import OrderHandler
+from .utils.handle_data import BookHandler, CandlesHandler
+
+
+'''
+Begin help functions
+'''
+
+# globals of the neutrino module and class attributes of fx and oms_client
+# that are bound to the Env in use
+MODULE_ATTRS = ('ENV', 'BOVESPA', 'CALLBACKS')
+FX_ATTRS = ('legs', 'online', 'config_file', 'now_val', 'pending_callbacks',
+            'symbols_callbacks', 'time_callbacks', 'initial_time',
+            'trade_callback_used')
+OMS_ATTRS = ('_ready', '_id_mapping')
+# globals of the data_feeder set by Env.setParameters
+FEEDER_ATTRS = ('TA_STREAMING', 'TA_CHECK')
+# handlers shared by all agents in qcore.agent
+HANDLERS = (('orders', OrderHandler), ('books', BookHandler),
+            ('candles', CandlesHandler))
+
+
+class NeutrinoContext(object):
+    '''
+    Hold the global state of the neutrino module, of the handlers of the
+    agents, of the technical indicators and of the random numbers used by a
+    single Env
+    '''
+    def __init__(self):
+        '''
+        Initialize a NeutrinoContext object with the default state
+        '''
+        self.d_module = {'ENV': None, 'BOVESPA': False, 'CALLBACKS': {}}
+        self.d_fx = {'legs': {},
+                     'online': True,
+                     'config_file': 'twap.conf',
+                     'now_val': 0,
+                     'pending_callbacks': {},
+                     'symbols_callbacks': {},
+                     'time_callbacks': {},
+                     'initial_time': 0,
+                     'trade_callback_used': {}}
+        self.d_oms = {'_ready': False, '_id_mapping': {}}
+        self.d_handlers = dict((s_name, dict(cls().__dict__)) for
+                               s_name, cls in HANDLERS)
+        self.d_feeder = dict((s_attr, getattr(data_feeder, s_attr)) for
+                             s_attr in FEEDER_ATTRS)
+        self.t_random = np.random.get_state()
+
+    def save(self):
+        '''
+        Keep the current global state in this context
+        '''
+        for s_attr in MODULE_ATTRS:
+            self.d_module[s_attr] = getattr(neutrino, s_attr)
+        for s_attr in FX_ATTRS:
+            self.d_fx[s_attr] = getattr(fx, s_attr)
+        for s_attr in OMS_ATTRS:
+            self.d_oms[s_attr] = getattr(oms_client, s_attr)
+        for s_name, _ in HANDLERS:
+            self.d_handlers[s_name] = dict(
+                getattr(qcore_agent, s_name).__dict__)
+        for s_attr in FEEDER_ATTRS:
+            self.d_feeder[s_attr] = getattr(data_feeder, s_attr)
+        self.t_random = np.random.get_state()
+
+    def load(self):
+        '''
+        Replace the current global state by the one in this context
+        '''
+        for s_attr in MODULE_ATTRS:
+            setattr(neutrino, s_attr, self.d_module[s_attr])
+        for s_attr in FX_ATTRS:
+            setattr(fx, s_attr, self.d_fx[s_attr])
+        for s_attr in OMS_ATTRS:
+            setattr(oms_client, s_attr, self.d_oms[s_attr])
+        # the handlers are imported by the agents, so update them in place
+        for s_name, _ in HANDLERS:
+            obj_handler = getattr(qcore_agent, s_name)
+            obj_handler.__dict__.clear()
+            obj_handler.__dict__.update(self.d_handlers[s_name])
+        for s_attr in FEEDER_ATTRS:
+            setattr(data_feeder, s_attr, self.d_feeder[s_attr])
+        np.random.set_state(self.t_random)
+
+'''
+End help functions
+'''
+
+
+class VecEnv(object):
+    '''
+    Hold N independent environments, each one with its own agent, and step
+    all of them at once. Observations and rewards are returned as NumPy
+    arrays stacked by environment
+    '''
+    def __init__(self, l_env_params, agent_factory, l_agent_params=None,
+                 s_env='LevelTwo', b_auto_reset=True):
+        '''
+        Initialize a VecEnv object. Create all environments and agents
+
+        :param l_env_params: list. Parameters of Env.setParameters of each
+            environment (different dates, instruments or start times)
+        :param agent_factory: callable. Return a new agent from the parameters
+            of each environment
+        :param l_agent_params*: list. parameters of the agent of each
+            environment. Use None for all if not set
+        :param s_env*: string. Name of the environment in envs.IMPLEMENTED_ENVS
+        :param b_auto_reset*: boolean. Reset the environments that are done
+            in the same step
+        '''
+        if not l_agent_params:
+            l_agent_params = [None] * len(l_env_params)
+        self.num_envs = len(l_env_params)
+        self.b_auto_reset = b_auto_reset
+        self.na_done = np.zeros(self.num_envs, dtype=bool)
+        self.train_mode = False
+        self.l_envs = []
+        self.l_agents = []
+        self.l_contexts = []
+        self.l_observations = [None] * self.num_envs
+        self.i_active = None
+        # the context in use before the VecEnv is restored by close()
+        self._outer_context = NeutrinoContext()
+        self._outer_context.save()
+        for d_params, agent_params in zip(l_env_params, l_agent_params):
+            self.l_contexts.append(NeutrinoContext())
+            self._activate(len(self.l_contexts) - 1)
+            env = make(s_env)
+            env.setParameters(**d_params)
+            self.l_envs.append(env)
+            self.l_agents.append(agent_factory(agent_params))
+
+    def _activate(self, i_env):
+        '''
+        Switch the neutrino context to the environment passed
+
+        :param i_env: integer. Index of the environment
+        '''
+        if self.i_active == i_env:
+            return
+        if self.i_active is not None:
+            self.l_contexts[self.i_active].save()
+        self.l_contexts[i_env].load()
+        self.i_active = i_env
+
+    def _get_features(self):
+        '''
+        Return the features of the last observations stacked
+        '''
+        return np.asarray([obs.features for obs in self.l_observations])
+
+    def _reset_env(self, i_env):
+        '''
+        Reset the environment and the agent passed
+
+        :param i_env: integer. Index of the environment
+        '''
+        self._activate(i_env)
+        env = self.l_envs[i_env]
+        self.l_observations[i_env] = env.reset(self.train_mode)
+        env.resetAgent(self.l_agents[i_env], hold_pos=False)
+        self.na_done[i_env] = False
+
+    def reset(self, train_mode=False):
+        '''
+        Reset all environments. Return the features of the first observations
+
+        :param train_mode*: boolean. Passed to Env.reset
+        '''
+        self.train_mode = train_mode
+        for i_env in range(self.num_envs):
+            self._reset_env(i_env)
+        return self._get_features()
+
+    def step(self, actions=None):
+        '''
+        Perform a step in every environment. The action chosen to each one is
+        set as the last_actions of the brain of its agent before the callback.
+        Return the features, rewards and done flags, stacked, and a list of
+        infos. If not b_auto_reset, the environments already done are not
+        stepped again until reset, and keep returning a zero reward
+
+        :param actions*: sequence. one action by environment
+        '''
+        na_reward = np.zeros(self.num_envs)
+        na_done = np.zeros(self.num_envs, dtype=bool)
+        l_infos = []
+        for i_env in range(self.num_envs):
+            if self.na_done[i_env]:
+                na_done[i_env] = True
+                l_infos.append({})
+                continue
+            self._activate(i_env)
+            env = self.l_envs[i_env]
+            agent = self.l_agents[i_env]
+            if actions is not None and agent.brain:
+                agent.brain.last_actions = actions[i_env]
+            agent_actions = env.callBack(agent, self.l_observations[i_env])
+            d_info = {}
+            try:
+                obs, f_reward, b_done, d_info = env.step(agent_actions)
+                self.l_observations[i_env] = obs
+            except StopIteration:
+                f_reward, b_done = 0., True
+            na_reward[i_env] = f_reward
+            na_done[i_env] = b_done
+            if b_done and self.b_auto_reset:
+                d_info = dict(d_info)
+                d_info['terminal_features'] = \
+                    self.l_observations[i_env].features
+                self._reset_env(i_env)
+            else:
+                self.na_done[i_env] = b_done
+            l_infos.append(d_info)
+        return self._get_features(), na_reward, na_done, l_infos
+
+    def close(self):
+        '''
+        Close all environments and restore the neutrino context in use before
+        the VecEnv was created
+        '''
+        for i_env, env in enumerate(self.l_envs):
+            self._activate(i_env)
+            env.close()
+        self._outer_context.load()
+        self.i_active = None
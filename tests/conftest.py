@@ -0,0 +1,145 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Fixtures shared by the tests. The data used is created by the synthetic
+order flow of the benchmarks folder
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import contextlib
+import io
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from benchmarks import synthetic_data
+from benchmarks import run_benchmarks
+from neutrinogym import neutrino
+
+
+'''
+Begin help functions
+'''
+
+# days and instruments of the synthetic data
+TEST_DATES = ['20210219', '20210222']
+TEST_INSTRUMENTS = ['DOLH21']
+# a lighter order flow, so each test replays its episodes quickly
+TEST_FLOW = {'f_order_rate': 2., 's_end': '11:00:00'}
+
+
+def get_env_params(s_folder, d_params=None):
+    '''
+    Return the parameters of Env.setParameters used by the tests. All the
+    optional features are disabled, unless changed by d_params
+
+    :param s_folder: string. root of the data folder
+    :param d_params*: dictionary. parameters to change
+    '''
+    d_rtn = {'init': TEST_DATES[0],
+             'end': TEST_DATES[-1],
+             'datafolder': s_folder,
+             'instruments': TEST_INSTRUMENTS,
+             'starttime': '10:00:00',
+             'endtime': '10:20:00',
+             'logfolder': s_folder,
+             'b_randstart': False,
+             'i_seed': 0,
+             'b_use_cache': False,
+             'b_bulk_parse': False,
+             'b_use_event_log': False,
+             'b_use_snapshots': False,
+             'b_event_clock': False,
+             'b_use_candle_store': False,
+             'b_perf_stats': False}
+    d_rtn.update(d_params or {})
+    return d_rtn
+
+
+def replay_episodes(s_folder, d_params=None, s_agent='DemoBook',
+                    i_episodes=1):
+    '''
+    Run the episodes of an example agent. Return a list with the time and
+    the best prices of each book after each step and, at the end of each
+    episode, what the agent printed
+
+    :param s_folder: string. root of the data folder
+    :param d_params*: dictionary. parameters of Env.setParameters to change
+    :param s_agent*: string. name of the class in the examples folder
+    :param i_episodes*: integer. number of episodes to run
+    '''
+    env = run_benchmarks.make('LevelTwo')
+    env.setParameters(**get_env_params(s_folder, d_params))
+    agent = run_benchmarks.make_demo_agent(s_agent, TEST_INSTRUMENTS)
+    l_rtn = []
+    for _ in range(i_episodes):
+        observation = env.reset()
+        env.resetAgent(agent, hold_pos=False)
+        obj_stdout = io.StringIO()
+        b_done = False
+        while not b_done:
+            with contextlib.redirect_stdout(obj_stdout):
+                actions = env.callBack(agent, observation)
+            try:
+                observation, _, b_done, _ = env.step(actions)
+            except StopIteration:
+                b_done = True
+            l_aux = [round(neutrino.fx.now(b_old=True), 6)]
+            for s_instr in TEST_INSTRUMENTS:
+                book_obj = env.get_order_book(s_instr)
+                l_aux += [book_obj.best_bid, book_obj.best_ask]
+            l_rtn.append(tuple(l_aux))
+        l_rtn.append(obj_stdout.getvalue())
+    env.close()
+    return l_rtn
+
+'''
+End help functions
+'''
+
+
+@pytest.fixture(scope='session')
+def data_folder(tmp_path_factory):
+    '''
+    Return the root of a data folder with the synthetic BID/ASK files
+    '''
+    s_folder = str(tmp_path_factory.mktemp('data'))
+    synthetic_data.make_synthetic_data(s_folder, TEST_DATES,
+                                       TEST_INSTRUMENTS, 0, TEST_FLOW)
+    os.makedirs(os.path.join(s_folder, 'log'))
+    return s_folder
+
+
+@pytest.fixture(scope='session')
+def book_files(data_folder):
+    '''
+    Return a list with the BID/ASK files of the last day of the data folder
+    '''
+    s_date = TEST_DATES[-1]
+    return [os.path.join(data_folder, s_date, '{}_{}_{}_new.zip'.format(
+        s_date, s_side, s_instr)) for s_instr in TEST_INSTRUMENTS
+        for s_side in ['BID', 'ASK']]
+
+
+@pytest.fixture(scope='session')
+def replay(data_folder):
+    '''
+    Return a function that runs the episodes of an example agent over the
+    data folder and caches the results of the same parameters
+    '''
+    d_cache = {}
+
+    def _replay(d_params=None, s_agent='DemoBook', i_episodes=1):
+        t_key = (tuple(sorted((d_params or {}).items())), s_agent,
+                 i_episodes)
+        if t_key not in d_cache:
+            d_cache[t_key] = replay_episodes(data_folder, d_params, s_agent,
+                                             i_episodes)
+        return d_cache[t_key]
+    return _replay
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that the index of the agents' orders by price key follows the orders
+included, moved and removed from a side of the book
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+from neutrinogym.lob import book
+
+
+'''
+Begin help functions
+'''
+
+
+def get_order_msg(i_order_id, f_price, i_agent_id):
+    '''
+    Return the fields of a resting order, as in Order.d_msg
+
+    :param i_order_id: integer. id of the order
+    :param f_price: float. price of the order
+    :param i_agent_id: integer. 10 to the orders of the historical agent
+    '''
+    return {'seq_order_number': str(i_order_id),
+            'secondary_order_id': '0',
+            'priority_indicator': i_order_id,
+            'order_id': i_order_id,
+            'order_side': 'BID',
+            'order_status': 'New',
+            'order_price': f_price,
+            'org_total_qty_order': 5,
+            'traded_qty_order': 0,
+            'priority_seconds': 36000.,
+            'agent_id': i_agent_id,
+            'member': 0,
+            'order_date': '2021-02-19',
+            'is_today': True,
+            'instrument_symbol': 'DOLH21',
+            'action': 'history',
+            'idx': '0'}
+
+'''
+End help functions
+'''
+
+
+def test_agent_orders_indexed_by_key():
+    bookside = book.BookSide('BID', None)
+    bookside.restore_order(get_order_msg(1, 5000., 10))
+    assert not bookside.has_agent_orders()
+    assert not bookside.has_agent_orders(5000.)
+    bookside.restore_order(get_order_msg(2, 5000., 11))
+    bookside.restore_order(get_order_msg(3, 5000.5, 11))
+    assert bookside.has_agent_orders()
+    assert bookside.has_agent_orders(5000.)
+    assert bookside.has_agent_orders(5000.5)
+    # an order moved to another price leaves its old price level
+    order_obj = bookside.d_order_map[3]
+    order_obj.key = 5001.
+    bookside._index_agent_order(order_obj)
+    assert not bookside.has_agent_orders(5000.5)
+    assert bookside.has_agent_orders(5001.)
+    bookside._unindex_agent_order(2)
+    bookside._unindex_agent_order(2)
+    assert not bookside.has_agent_orders(5000.)
+    bookside._unindex_agent_order(3)
+    assert not bookside.has_agent_orders()
+    assert not bookside.d_agent_keys
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that the rows read from the cache files and from the zipped files
+parsed in chunks are equal to the ones parsed line by line
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import os
+import zipfile
+import numpy as np
+import pytest
+from neutrinogym.lob import book_cache
+from neutrinogym.lob import parser_data
+
+
+'''
+Begin help functions
+'''
+
+
+def get_line_rows(s_fname):
+    '''
+    Return a list with the rows of the file passed parsed by the LineParser
+
+    :param s_fname: string. path to the zipped file
+    '''
+    s_side = 'ASK' if '_ASK_' in os.path.basename(s_fname) else 'BID'
+    obj_parser = parser_data.LineParser(s_side)
+    l_rtn = []
+    with zipfile.ZipFile(s_fname, 'r') as archive:
+        fr = archive.open(archive.infolist()[0])
+        for row in fr:
+            d_row = obj_parser(row)
+            if obj_parser.last_identification == 'MSG':
+                l_rtn.append(d_row)
+        fr.close()
+    return l_rtn
+
+
+def get_reader_rows(fr):
+    '''
+    Return a list with all the rows returned by the reader passed
+
+    :param fr: ArrayBookReader object. the reader to consume
+    '''
+    l_rtn = []
+    while True:
+        d_row = fr.readline()
+        if d_row == '':
+            break
+        l_rtn.append(d_row)
+    fr.close()
+    return l_rtn
+
+
+def add_leading_zeros(s_fname, s_fname_new):
+    '''
+    Copy the zipped file passed including leading zeros in the ids
+
+    :param s_fname: string. path to the zipped file
+    :param s_fname_new: string. path to the new zipped file
+    '''
+    with zipfile.ZipFile(s_fname, 'r') as archive:
+        s_arcname = archive.infolist()[0].filename
+        l_rows = archive.read(s_arcname).split(b'\n')
+    for i, row in enumerate(l_rows):
+        l_fields = row.split(b';')
+        if len(l_fields) >= 15:
+            l_fields[3] = b'00' + l_fields[3]
+            l_fields[4] = b'00' + l_fields[4]
+            l_rows[i] = b';'.join(l_fields)
+    with zipfile.ZipFile(s_fname_new, 'w') as zf:
+        zf.writestr(s_arcname, b'\n'.join(l_rows))
+    return s_fname_new
+
+'''
+End help functions
+'''
+
+
+def test_chunk_reader_equals_line_parser(book_files):
+    for s_fname in book_files:
+        s_side = 'ASK' if '_ASK_' in s_fname else 'BID'
+        l_expected = get_line_rows(s_fname)
+        fr = book_cache.ZipChunkReader(s_fname, s_side, 'DOLH21',
+                                       i_chunk_bytes=2**12)
+        assert get_reader_rows(fr) == l_expected
+
+
+def test_cache_reader_equals_line_parser(book_files, tmp_path):
+    for s_fname in book_files:
+        s_copy = str(tmp_path / os.path.basename(s_fname))
+        with open(s_fname, 'rb') as fr, open(s_copy, 'wb') as fw:
+            fw.write(fr.read())
+        s_cache = book_cache.build_cache(s_copy)
+        assert book_cache.has_cache(s_copy)
+        fr = book_cache.BookCacheReader(s_cache, 'DOLH21', i_chunk=100)
+        assert get_reader_rows(fr) == get_line_rows(s_copy)
+
+
+def test_cache_keeps_leading_zeros(book_files, tmp_path):
+    s_fname = add_leading_zeros(
+        book_files[0], str(tmp_path / os.path.basename(book_files[0])))
+    l_expected = get_line_rows(s_fname)
+    assert l_expected[0]['seq_order_number'].startswith('00')
+    fr = book_cache.BookCacheReader(book_cache.build_cache(s_fname), 'DOLH21')
+    assert get_reader_rows(fr) == l_expected
+
+
+def test_old_cache_layout_is_ignored(book_files, tmp_path):
+    s_fname = str(tmp_path / os.path.basename(book_files[0]))
+    with open(book_files[0], 'rb') as fr, open(s_fname, 'wb') as fw:
+        fw.write(fr.read())
+    np.save(book_cache.get_cache_path(s_fname), np.zeros(1, dtype='i8'))
+    assert not book_cache.has_cache(s_fname)
+
+
+def test_array_reader_is_abstract():
+    with pytest.raises(TypeError):
+        book_cache.ArrayBookReader('DOLH21')
+
+
+def test_bulk_parse_replays_as_line_parser(replay):
+    l_expected = replay()
+    assert len(l_expected) > 100
+    assert replay({'b_bulk_parse': True}) == l_expected
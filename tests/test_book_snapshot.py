@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that starting a replay from a book snapshot gives the same books as
+replaying the event log from its first row
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import json
+import os
+from neutrinogym.lob import book_snapshot
+from conftest import TEST_DATES, TEST_INSTRUMENTS
+from test_event_log import get_file_format
+
+
+'''
+Begin help functions
+'''
+
+# a start time between two snapshots, so the restore is followed by a replay
+START_TIME = '10:05:30'
+
+'''
+End help functions
+'''
+
+
+def test_snapshot_restore_replays_as_full_log(data_folder, replay,
+                                             monkeypatch):
+    for s_date in TEST_DATES:
+        s_snap = book_snapshot.build_snapshots(
+            get_file_format(data_folder, s_date), TEST_INSTRUMENTS)
+        with open(os.path.splitext(s_snap)[0] + '.json', 'r') as fr:
+            l_times = [d_snap['time'] for d_snap in json.load(fr)['snapshots']]
+        assert 36300. in l_times
+    d_params = {'b_use_event_log': True, 'starttime': START_TIME}
+    l_expected = replay(d_params)
+    # count the restores, so the test fails if the snapshots are ignored
+    l_restored = []
+    func_restore = book_snapshot.restore_books
+    monkeypatch.setattr(book_snapshot, 'restore_books', lambda *args: (
+        l_restored.append(args[1]['time']), func_restore(*args)))
+    d_params['b_use_snapshots'] = True
+    assert replay(d_params) == l_expected
+    assert l_restored and set(l_restored) == set([36300.])
+    # the trade buffers start empty after a restore, so compare just books
+    d_params['b_use_snapshots'] = False
+    l_expected = replay(d_params, 'DemoTrades')
+    d_params['b_use_snapshots'] = True
+    l_snap = replay(d_params, 'DemoTrades')
+    assert [t for t in l_snap if not isinstance(t, str)] == \
+        [t for t in l_expected if not isinstance(t, str)]
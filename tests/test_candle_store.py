@@ -0,0 +1,43 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that a candle store is reused only when it has all the intervals and
+indicators requested
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+from neutrinogym.qcore import candle_store
+from conftest import TEST_DATES, TEST_INSTRUMENTS
+from test_event_log import get_file_format
+
+
+def test_store_rebuilt_for_missing_candles(data_folder):
+    s_file = get_file_format(data_folder, TEST_DATES[0])
+    s_store = candle_store.build_candle_store(s_file, TEST_INSTRUMENTS,
+                                              b_overwrite=True)
+    store = candle_store.CandleStore(s_store)
+    assert store.has_candle(TEST_INSTRUMENTS[0], 60)
+    assert not store.has_candle(TEST_INSTRUMENTS[0], 300)
+    store.close()
+    # a new interval or indicator is not served by the old store
+    l_indicators = ['SMA:input=close;time_period=5']
+    s_log = candle_store.event_log.get_event_log_path(s_file)
+    assert candle_store.has_store(s_store, s_log, TEST_INSTRUMENTS, [60])
+    assert not candle_store.has_store(s_store, s_log, TEST_INSTRUMENTS,
+                                      [60, 300])
+    assert not candle_store.has_store(s_store, s_log, TEST_INSTRUMENTS,
+                                      [60], l_indicators)
+    candle_store.build_candle_store(s_file, l_intervals=[60, 300],
+                                    l_indicators=l_indicators)
+    store = candle_store.CandleStore(s_store)
+    assert store.has_candle(TEST_INSTRUMENTS[0], 300)
+    s_name = 'SMA:{}:input=close;time_period=5;interval=300'.format(
+        TEST_INSTRUMENTS[0])
+    assert store.get_indicator(s_name, 300) is not None
+    store.close()
+    # a store with more candles than requested is reused
+    assert candle_store.has_store(s_store, s_log, TEST_INSTRUMENTS, [300],
+                                  l_indicators)
@@ -0,0 +1,110 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that updating a candle once by each of its own buckets, rolled up from
+the base buckets, gives the same candle as updating it by each base bucket
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import random
+import numpy as np
+from neutrinogym.qcore import data_feeder
+
+
+'''
+Begin help functions
+'''
+
+# indicators of the candles, in the format of the neutrino API
+INDICATORS = ['SMA:DOLH21:time_period=5', 'EMA:DOLH21:time_period=5',
+              'ATR:DOLH21:time_period=5']
+# intervals of the candles of the instrument, in seconds
+INTERVALS = [15, 60, 300]
+
+
+def make_candle(f_interval):
+    '''
+    Return the data of an empty candle, with all INDICATORS
+
+    :param f_interval: float. interval of the candle, in seconds
+    '''
+    d_candle = {'ID': 0, 'INDICATORS': list(INDICATORS),
+                'INTERVAL': f_interval}
+    for s_field in data_feeder.CANDLE_FIELDS:
+        d_candle[s_field] = data_feeder.ElapsedList(
+            f_elapsed_time=f_interval, i_count=50, s_type=s_field)
+    return d_candle
+
+
+def make_steps(i_base):
+    '''
+    Return a list with the base buckets of the trades of each step
+
+    :param i_base: integer. base interval, in seconds
+    '''
+    obj_rand = random.Random(0)
+    l_rtn = []
+    f_time = 36000.
+    f_price = 5000.
+    i_id = 0
+    for _ in range(300):
+        l_step = []
+        for _ in range(obj_rand.randint(0, 6)):
+            f_time += obj_rand.choice([0.5, 3., 10., 40.])
+            f_price += obj_rand.choice([-1., -0.5, 0., 0.5, 1.])
+            i_id += 1
+            i_bucket = int(f_time / i_base)
+            t_trade = (f_time, i_id, f_price, obj_rand.randint(1, 10),
+                       obj_rand.choice(['+', '-']))
+            if l_step and l_step[-1].i_bucket == i_bucket:
+                l_step[-1].add(*t_trade)
+            else:
+                l_step.append(data_feeder.TradeBucket(i_bucket, *t_trade))
+        l_rtn.append(l_step)
+    return l_rtn
+
+
+def update_candle(d_candle, l_buckets):
+    '''
+    Update the candle and its indicators with the buckets passed
+
+    :param d_candle: dictionary. data of the candle
+    :param l_buckets: list. TradeBucket objects
+    '''
+    for bucket in l_buckets:
+        d_candle, b_update = data_feeder.update_bucket(d_candle, bucket)
+        d_candle = data_feeder.update_ta(b_update, d_candle)
+    return d_candle
+
+'''
+End help functions
+'''
+
+
+def test_rolled_up_buckets_give_same_candles(monkeypatch):
+    monkeypatch.setattr(data_feeder, 'TA_STREAMING', True)
+    i_base = data_feeder.get_base_interval(dict(
+        (i_interval, {'INTERVAL': i_interval}) for i_interval in INTERVALS))
+    assert i_base == 15
+    l_steps = make_steps(i_base)
+    for i_interval in INTERVALS[1:]:
+        d_base = make_candle(i_interval)
+        d_rolled = make_candle(i_interval)
+        i_updates = 0
+        for l_step in l_steps:
+            d_base = update_candle(d_base, l_step)
+            l_rolled = data_feeder.roll_up_buckets(l_step, i_interval)
+            i_updates += len(l_rolled)
+            d_rolled = update_candle(d_rolled, l_rolled)
+            for s_key in data_feeder.CANDLE_FIELDS:
+                assert np.array_equal(d_base[s_key].l, d_rolled[s_key].l,
+                                      equal_nan=True)
+            for s_key in INDICATORS:
+                if s_key in d_base:
+                    assert np.allclose(d_base[s_key], d_rolled[s_key],
+                                       equal_nan=True)
+        # each candle was updated less often than with the base buckets
+        assert i_updates < sum(len(l_step) for l_step in l_steps)
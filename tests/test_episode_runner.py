@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that the episode runner reports the trial data filled by the
+environment, when it is wrapped by an EnvWrapper that computes them
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+from benchmarks import run_benchmarks
+from neutrinogym.qcore import EnvWrapper
+from neutrinogym.qcore import episode_runner
+from conftest import TEST_DATES, TEST_INSTRUMENTS, get_env_params
+
+
+'''
+Begin help functions
+'''
+
+# the PnL reported by the StepCounterEnv at the end of each episode
+WRAPPER_PNL = 123.5
+
+
+class StepCounterEnv(EnvWrapper):
+    '''
+    An environment that counts the steps of the episode and fills its trial
+    data when the episode is over
+    '''
+    def reset(self, train_mode=False):
+        self.i_steps = 0
+        return self.env.reset(train_mode=train_mode)
+
+    def step(self, actions=None):
+        self.i_steps += 1
+        try:
+            t_rtn = self.env.step(actions)
+        except StopIteration:
+            self._fill_trial_data()
+            raise
+        if t_rtn[2]:
+            self._fill_trial_data()
+        return t_rtn
+
+    def _fill_trial_data(self):
+        self.d_trial_data['final_pnl'].append(WRAPPER_PNL)
+        self.d_trial_data['max_pnl'].append(WRAPPER_PNL)
+        self.d_trial_data['min_pnl'].append(WRAPPER_PNL)
+        self.d_trial_data['final_duration'].append(self.i_steps)
+
+
+def make_dummy(agent_params):
+    return run_benchmarks.make_demo_agent('DemoDummy', TEST_INSTRUMENTS)
+
+'''
+End help functions
+'''
+
+
+def test_runner_reports_env_trial_data(data_folder):
+    d_env_params = get_env_params(data_folder, {})
+    for s_key in ['init', 'end']:
+        d_env_params.pop(s_key, None)
+    obj_results = episode_runner.run_episodes(
+        TEST_DATES[:1], make_dummy, d_env_params, i_workers=1,
+        env_wrapper=StepCounterEnv)
+    d_trial_data = obj_results.d_trial_data
+    assert d_trial_data['final_pnl'] == [WRAPPER_PNL]
+    assert d_trial_data['max_pnl'] == [WRAPPER_PNL]
+    assert d_trial_data['final_duration'][0] > 0
+    # not filled by the wrapper, so it still comes from the runner
+    assert d_trial_data['final_reward'] == [0.]
+    # without a wrapper, the PnL is marked to the mid price
+    obj_results = episode_runner.run_episodes(
+        TEST_DATES[:1], make_dummy, d_env_params, i_workers=1)
+    assert obj_results.d_trial_data['final_pnl'] == [0.]
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that the EventClock, that skips the stop times without anything to
+process, shows the agents the same books and callbacks as a clock that
+yields every stop of its grids
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import importlib
+import sys
+from benchmarks import run_benchmarks
+from neutrinogym import neutrino
+from neutrinogym.lob import matching_engine
+from conftest import TEST_INSTRUMENTS, get_env_params
+
+
+'''
+Begin help functions
+'''
+
+
+class FixedGridClock(matching_engine.EventClock):
+    '''
+    An EventClock that never skips a stop, as if something changed in the
+    books before every step
+    '''
+    def notify(self, f_next_event, b_processed, f_next_callback=None):
+        super(FixedGridClock, self).notify(float('-inf'), True)
+
+
+class TimedScheduler(object):
+    '''
+    An agent that keeps the market time when each of its scheduled callbacks
+    is called
+    '''
+    def initialize(self, symbols):
+        self.l_calls = []
+        self.instruments = {}
+        for symbol in symbols:
+            self.instruments[symbol] = neutrino.market(self).add(symbol)
+        neutrino.utils(self).every(self.every_function_1, 1.234)
+        neutrino.utils(self).every(self.every_function_2, 0.500)
+        neutrino.utils(self).at(self.at_function_1, 10, 10)
+
+    def _keep_call(self, s_func):
+        self.l_calls.append((neutrino.fx.now(b_old=True), s_func))
+
+    def every_function_1(self):
+        self._keep_call('every_function_1')
+
+    def every_function_2(self):
+        self._keep_call('every_function_2')
+
+    def at_function_1(self):
+        self._keep_call('at_function_1')
+
+    def on_data(self, update):
+        pass
+
+
+def replay_scheduler(s_folder, d_params=None):
+    '''
+    Run an episode of the TimedScheduler agent. Return a list with the market
+    time and the name of each scheduled callback called, and a list with the
+    time and best prices of the books after each step, without repeating the
+    consecutive steps that did not change them
+
+    :param s_folder: string. root of the data folder
+    :param d_params*: dictionary. parameters of Env.setParameters to change
+    '''
+    env = run_benchmarks.make('LevelTwo')
+    env.setParameters(**get_env_params(s_folder, d_params))
+    agent = run_benchmarks.make_demo_agent('TimedScheduler', TEST_INSTRUMENTS)
+    l_states = []
+    observation = env.reset()
+    env.resetAgent(agent, hold_pos=False)
+    b_done = False
+    while not b_done:
+        actions = env.callBack(agent, observation)
+        try:
+            observation, _, b_done, _ = env.step(actions)
+        except StopIteration:
+            b_done = True
+        l_aux = [round(neutrino.fx.now(b_old=True), 6)]
+        for s_instr in TEST_INSTRUMENTS:
+            book_obj = env.get_order_book(s_instr)
+            l_aux += [book_obj.best_bid, book_obj.best_ask]
+        if not l_states or l_states[-1] != tuple(l_aux):
+            l_states.append(tuple(l_aux))
+    env.close()
+    return agent.agent.l_calls, l_states
+
+'''
+End help functions
+'''
+
+
+def test_clock_stops_at_callbacks_due():
+    clock = matching_engine.EventClock(36000., 37000., milis=100)
+    assert clock.next() == (36000., neutrino.Source.MARKET)
+    assert clock.next() == (36000.02, neutrino.Source.IDLE)
+    # the next event is far, but a callback is due before it
+    clock.notify(36100., False, 36050.001)
+    f_time, s_source = clock.next()
+    assert s_source == neutrino.Source.IDLE
+    assert abs(f_time - 36050.02) < 1e-6
+    # without callbacks, jump to the next event
+    clock.notify(36100., False, None)
+    assert clock.next() == (36100., neutrino.Source.IDLE)
+    assert clock.next() == (36100., neutrino.Source.MARKET)
+    # a callback of unknown time keeps all IDLE stops
+    clock.notify(36200., False, float('-inf'))
+    f_time, s_source = clock.next()
+    assert s_source == neutrino.Source.IDLE
+    assert abs(f_time - 36100.02) < 1e-6
+
+
+def test_event_clock_replays_as_fixed_clock(data_folder, monkeypatch):
+    # the examples import the API as neutrino, as make_demo_agent does
+    sys.modules.setdefault('neutrino', neutrino)
+    examples = importlib.import_module('examples')
+    monkeypatch.setattr(examples, 'TimedScheduler', TimedScheduler,
+                        raising=False)
+    d_params = {'b_event_clock': True}
+    l_calls, l_states = replay_scheduler(data_folder, d_params)
+    assert l_calls
+    monkeypatch.setattr(matching_engine, 'EventClock', FixedGridClock)
+    l_calls2, l_states2 = replay_scheduler(data_folder, d_params)
+    assert l_calls == l_calls2
+    assert l_states == l_states2
@@ -0,0 +1,172 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that replaying the event log gives the same books as merging the
+BID/ASK files while replaying
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import os
+import shutil
+import zipfile
+from benchmarks import run_benchmarks
+from neutrinogym.lob import event_log
+from conftest import (TEST_DATES, TEST_INSTRUMENTS, get_env_params,
+                      replay_episodes)
+
+
+'''
+Begin help functions
+'''
+
+
+def get_file_format(s_folder, s_date):
+    '''
+    Return the format of the name of the zip files of the day passed
+
+    :param s_folder: string. root of the data folder
+    :param s_date: string. date in the format YYYYMMDD
+    '''
+    return os.path.join(s_folder, s_date, s_date + '_{}_{}_new.zip')
+
+
+def build_event_logs(s_folder):
+    '''
+    Create the event log of all days of the data folder passed
+
+    :param s_folder: string. root of the data folder
+    '''
+    for s_date in TEST_DATES:
+        event_log.build_event_log(get_file_format(s_folder, s_date),
+                                  TEST_INSTRUMENTS, i_chunk=1000)
+
+
+def add_zero_prices(s_fname, i_step=50):
+    '''
+    Include rows with zero price in the zipped file passed. After some orders
+    are created, a copy of the row with zero price replaces it (that should
+    be handled as a cancel), and a new order with zero price is sent (that
+    should be ignored)
+
+    :param s_fname: string. path to the zipped file
+    :param i_step*: integer. Change one of each i_step new orders
+    '''
+    with zipfile.ZipFile(s_fname, 'r') as archive:
+        s_arcname = archive.infolist()[0].filename
+        l_rows = archive.read(s_arcname).split(b'\n')
+    l_new = []
+    i_count = 0
+    for row in l_rows:
+        l_new.append(row)
+        l_fields = row.split(b';')
+        if len(l_fields) < 15 or l_fields[13] != b'0':
+            continue
+        i_count += 1
+        if i_count % i_step:
+            continue
+        l_aux = list(l_fields)
+        l_aux[5], l_aux[8], l_aux[13] = b'5', b'0.000000', b'5'
+        l_new.append(b';'.join(l_aux))
+        l_aux = list(l_fields)
+        l_aux[3] = b'9' + l_aux[3]
+        l_aux[8] = b'0.000000'
+        l_new.append(b';'.join(l_aux))
+    with zipfile.ZipFile(s_fname, 'w') as zf:
+        zf.writestr(s_arcname, b'\n'.join(l_new))
+    return s_fname
+
+
+def get_book_state(book_obj):
+    '''
+    Return a tuple with the time of the book passed and the orders resting
+    in each side, with their price keys, quantities and priority times
+
+    :param book_obj: LimitOrderBook object.
+    '''
+    l_rtn = [book_obj.f_time, book_obj.s_time]
+    for bookside in [book_obj.book_bid, book_obj.book_ask]:
+        l_rtn.append(tuple(sorted(
+            (i_id, order_obj.key, order_obj.i_qty, order_obj.f_ptime)
+            for i_id, order_obj in bookside.d_order_map.items())))
+    return tuple(l_rtn)
+
+
+def replay_books(s_folder, d_params=None):
+    '''
+    Run an episode of an agent that does not trade. Return a list with the
+    state of the books after each step, as get_book_state
+
+    :param s_folder: string. root of the data folder
+    :param d_params*: dictionary. parameters of Env.setParameters to change
+    '''
+    env = run_benchmarks.make('LevelTwo')
+    env.setParameters(**get_env_params(s_folder, d_params))
+    agent = run_benchmarks.make_demo_agent('DemoDummy', TEST_INSTRUMENTS)
+    observation = env.reset()
+    env.resetAgent(agent, hold_pos=False)
+    l_rtn = []
+    b_done = False
+    while not b_done:
+        actions = env.callBack(agent, observation)
+        try:
+            observation, _, b_done, _ = env.step(actions)
+        except StopIteration:
+            b_done = True
+        l_rtn.append(tuple(get_book_state(env.get_order_book(s_instr, False))
+                           for s_instr in TEST_INSTRUMENTS))
+    env.close()
+    return l_rtn
+
+'''
+End help functions
+'''
+
+
+def test_event_log_replays_as_live_merge(data_folder, replay):
+    build_event_logs(data_folder)
+    l_expected = replay()
+    assert replay({'b_use_event_log': True}) == l_expected
+
+
+def test_event_log_with_zero_prices(data_folder, tmp_path):
+    s_folder = str(tmp_path / 'data')
+    shutil.copytree(data_folder, s_folder)
+    for s_date in TEST_DATES:
+        for s_side in ['BID', 'ASK']:
+            s_fname = get_file_format(s_folder, s_date).format(
+                s_side, TEST_INSTRUMENTS[0])
+            add_zero_prices(s_fname)
+    build_event_logs(s_folder)
+    # there are more rows in the files than in the log
+    s_log = event_log.get_event_log_path(get_file_format(s_folder,
+                                                         TEST_DATES[-1]))
+    na_log = event_log.np.load(s_log)
+    assert (na_log['order_price'] > 0.).all()
+    l_expected = replay_episodes(s_folder)
+    assert l_expected != replay_episodes(data_folder)
+    assert replay_episodes(s_folder, {'b_use_event_log': True}) == l_expected
+
+
+def test_event_log_cancels_zero_price_replaces(data_folder, tmp_path):
+    s_folder = str(tmp_path / 'data')
+    shutil.copytree(data_folder, s_folder)
+    for s_date in TEST_DATES:
+        for s_side in ['BID', 'ASK']:
+            s_fname = get_file_format(s_folder, s_date).format(
+                s_side, TEST_INSTRUMENTS[0])
+            add_zero_prices(s_fname, i_step=10)
+    build_event_logs(s_folder)
+    # the replaces with zero price are in the log as cancels of the orders
+    s_log = event_log.get_event_log_path(get_file_format(s_folder,
+                                                         TEST_DATES[0]))
+    na_log = event_log.np.load(s_log)
+    na_cancel = na_log[na_log['order_status'] == event_log._I_CANCELED]
+    assert (na_cancel['execution_type'] == event_log._I_UPDATE).any()
+    assert all(s_time.count(b':') == 2 for s_time in
+               na_log['priority_time'])
+    # the books match the ones of the files merged while replaying
+    l_expected = replay_books(s_folder)
+    assert replay_books(s_folder, {'b_use_event_log': True}) == l_expected
@@ -0,0 +1,88 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check the files created by parser_data.extract_data
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import os
+import zipfile
+from neutrinogym.lob import parser_data
+
+
+'''
+Begin help functions
+'''
+
+HEADER = b'RH;OFER_CPA;2021-02-22;2021-02-22;5\n'
+TRAILER = b'RT;OFER_CPA;2021-02-22;2021-02-22;7\n'
+ROWS = [b'2021-02-22;DOLH21              ;1;7000000000003;100000000003;0;'
+        b'09:38:47.0000000;1000000003;4889.000000;15;0;2021-02-22;'
+        b'2021-02-22 09:38:47.000000;0;0;72\n',
+        b'2021-02-22;WDOH21              ;1;7000000000004;100000000004;0;'
+        b'09:38:45.0000000;1000000004;4888.000000;15;0;2021-02-22;'
+        b'2021-02-22 09:38:45.000000;0;0;72\n',
+        b'2021-02-22;DOLH21              ;1;7000000000002;100000000002;0;'
+        b'09:38:46.0000000;1000000002;4888.000000;35;0;2021-02-22;'
+        b'2021-02-22 09:38:46.000000;0;0;13\n',
+        b'2021-02-22;DOLH21              ;1;7000000000001;100000000001;0;'
+        b'14:55:27.0000000;1000000001;4889.000000;15;0;2021-02-19;'
+        b'2021-02-19 14:55:27.000000;0;0;72\n']
+
+
+def write_original(s_folder, l_rows):
+    '''
+    Write the rows passed as an original file of B3. Return its path
+
+    :param s_folder: string. root of the data folder
+    :param l_rows: list. rows of the file
+    '''
+    s_path = os.path.join(s_folder, 'original')
+    os.makedirs(s_path)
+    s_fname = os.path.join(s_path, 'OFER_CPA_20210222.zip')
+    with zipfile.ZipFile(s_fname, 'w') as zf:
+        zf.writestr('OFER_CPA_20210222.TXT', b''.join(l_rows))
+    return s_fname
+
+
+def read_rows(s_fname):
+    '''
+    Return the rows of the zipped file passed
+
+    :param s_fname: string. path to the zipped file
+    '''
+    with zipfile.ZipFile(s_fname, 'r') as archive:
+        return archive.open(archive.infolist()[0]).readlines()
+
+'''
+End help functions
+'''
+
+
+def test_extract_data_sorts_by_date_time_and_id(tmp_path):
+    s_fname = write_original(str(tmp_path), [HEADER] + ROWS + [TRAILER])
+    l_files = parser_data.extract_data('20210222', s_fname, 'BID',
+                                       ['DOLH21'], i_threads=1)
+    assert [os.path.basename(s) for s in l_files] == [
+        '20210222_BID_DOLH21.zip']
+    assert read_rows(l_files[0]) == [HEADER, ROWS[3], ROWS[2], ROWS[0],
+                                     TRAILER]
+
+
+def test_extract_data_keeps_file_order(tmp_path):
+    s_fname = write_original(str(tmp_path), [HEADER] + ROWS + [TRAILER])
+    l_files = parser_data.extract_data('20210222', s_fname, 'BID',
+                                       ['DOLH21', 'WDOH21'], b_sort=False)
+    assert read_rows(l_files[0]) == [HEADER, ROWS[0], ROWS[2], ROWS[3],
+                                     TRAILER]
+    assert read_rows(l_files[1]) == [HEADER, ROWS[1], TRAILER]
+
+
+def test_extract_data_without_trailer_at_the_end(tmp_path):
+    s_fname = write_original(str(tmp_path), [HEADER, TRAILER] + ROWS)
+    l_files = parser_data.extract_data('20210222', s_fname, 'BID',
+                                       ['DOLH21'])
+    assert read_rows(l_files[0]) == [HEADER, ROWS[3], ROWS[2], ROWS[0]]
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that each environment keeps its own performance counters, off by
+default, and that the rows read are counted apart from the calls that read
+them
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+from benchmarks import run_benchmarks
+from conftest import TEST_INSTRUMENTS, get_env_params
+
+
+'''
+Begin help functions
+'''
+
+
+def make_env(s_folder, d_params=None):
+    '''
+    Return an environment and an agent ready to start an episode
+
+    :param s_folder: string. root of the data folder
+    :param d_params*: dictionary. parameters of Env.setParameters to change
+    '''
+    env = run_benchmarks.make('LevelTwo')
+    env.setParameters(**get_env_params(s_folder, d_params))
+    agent = run_benchmarks.make_demo_agent('DemoDummy', TEST_INSTRUMENTS)
+    return env, agent
+
+
+def play_episode(env, agent):
+    '''
+    Run an episode of the agent. Return the counts of each stage
+
+    :param env: Env object.
+    :param agent: Agent object.
+    '''
+    observation = env.reset()
+    env.resetAgent(agent, hold_pos=False)
+    b_done = False
+    while not b_done:
+        actions = env.callBack(agent, observation)
+        try:
+            observation, _, b_done, _ = env.step(actions)
+        except StopIteration:
+            b_done = True
+    d_stages = env.get_perf_stats()['stages']
+    return dict((s_stage, d_aux['count']) for s_stage, d_aux in
+                d_stages.items())
+
+'''
+End help functions
+'''
+
+
+def test_perf_counters_by_env(data_folder):
+    env, agent = make_env(data_folder, {'b_perf_stats': True})
+    d_counts = play_episode(env, agent)
+    env.close()
+    # the counters are off by default and are not shared by the envs
+    env2, agent2 = make_env(data_folder)
+    assert play_episode(env2, agent2) == {}
+    env2.close()
+    assert env.get_perf_stats()['stages']['read']['count'] == \
+        d_counts['read']
+    # each call to _readline reads up to one row of each side
+    assert 0 < d_counts['read'] <= 2 * d_counts['readline']
+    assert d_counts['book_update'] == d_counts['translator']
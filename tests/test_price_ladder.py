@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that the PriceLadder gives the same answers as the FastRBTree it
+replaces, alone and as the price tree of the books of a replay
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import random
+import pytest
+from bintrees import FastRBTree
+from neutrinogym.lob import price_ladder
+
+
+'''
+Begin help functions
+'''
+
+
+def assert_same_tree(ladder, tree):
+    '''
+    Check that the PriceLadder and the FastRBTree passed hold the same levels
+
+    :param ladder: PriceLadder object.
+    :param tree: FastRBTree object.
+    '''
+    assert ladder.count == tree.count
+    assert list(ladder.items()) == list(tree.items())
+    assert list(ladder.items(reverse=True)) == list(tree.items(reverse=True))
+    assert ladder.nlargest(5) == tree.nlargest(5)
+    assert ladder.nsmallest(5) == tree.nsmallest(5)
+    if tree.count:
+        assert ladder.max_item() == tree.max_item()
+        assert ladder.min_item() == tree.min_item()
+
+'''
+End help functions
+'''
+
+
+@pytest.mark.parametrize('b_max_is_best', [True, False])
+def test_ladder_matches_tree(b_max_is_best):
+    # a small array, so keys are often kept in the far tree and the anchor
+    # moves around
+    ladder = price_ladder.PriceLadder(b_max_is_best, i_size=16)
+    tree = FastRBTree()
+    obj_rand = random.Random(0)
+    for _ in range(3000):
+        i_key = obj_rand.randint(0, 80)
+        if i_key in tree:
+            assert ladder.get(i_key) == tree.get(i_key)
+            ladder.remove(i_key)
+            tree.remove(i_key)
+        else:
+            assert ladder.get(i_key) is None
+            ladder.insert(i_key, 'level {}'.format(i_key))
+            tree.insert(i_key, 'level {}'.format(i_key))
+        i_start = obj_rand.randint(-5, 85)
+        f_end = i_start + obj_rand.randint(0, 30) + 0.5
+        for b_reverse in [False, True]:
+            assert list(ladder.item_slice(i_start, f_end, b_reverse)) == \
+                list(tree.item_slice(i_start, f_end, b_reverse))
+        assert_same_tree(ladder, tree)
+
+
+def test_ladder_rejects_float_keys():
+    ladder = price_ladder.PriceLadder(True)
+    with pytest.raises(price_ladder.InvalidKeyException):
+        ladder.insert(5005.5, 'level')
+
+
+def test_ladder_replays_as_tree(replay):
+    l_expected = replay({'b_int_prices': True})
+    assert l_expected == replay()
+    assert replay({'b_int_prices': True, 'b_price_ladder': True}) == \
+        l_expected
@@ -0,0 +1,129 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that the indicators updated by streaming_ta match TA-Lib, before and
+after the candle drops its oldest bars
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import random
+import numpy as np
+from neutrinogym.qcore import data_feeder
+
+
+'''
+Begin help functions
+'''
+
+# indicators of the candle, in the format of the neutrino API
+INDICATORS = ['SMA:DOLH21:time_period=5',
+              'EMA:DOLH21:time_period=5',
+              'MOM:DOLH21:time_period=5',
+              'STDDEV:DOLH21:time_period=5;nbdev=1',
+              'RSI:DOLH21:time_period=5',
+              'OBV:DOLH21:time_period=5',
+              'BBANDS:DOLH21:time_period=5;nbdevup=2;nbdevdn=2;matype=0',
+              'ATR:DOLH21:time_period=5',
+              'ADX:DOLH21:time_period=5',
+              'PLUS_DI:DOLH21:time_period=5',
+              'MINUS_DI:DOLH21:time_period=5',
+              'SAR:DOLH21:time_period=5;acceleration=0.02;maximum=0.2',
+              'STOCH:DOLH21:time_period=5;fast_k_ma_period=5;'
+              'slow_k_ma_period=3;slow_k_ma_type=0;slow_d_ma_period=3;'
+              'slow_d_ma_type=0',
+              'MACD:DOLH21:time_period=5;fast_ma_period=4;fast_ma_type=1;'
+              'slow_ma_period=8;slow_ma_type=1;signal_ma_period=3;'
+              'signal_ma_type=1']
+# bars kept in memory by the candle
+CANDLE_COUNT = 30
+
+
+def make_candle():
+    '''
+    Return the data of an empty candle of 1 minute, with all INDICATORS
+    '''
+    d_candle = {'ID': 0, 'INDICATORS': list(INDICATORS), 'INTERVAL': 60.}
+    for s_field in data_feeder.CANDLE_FIELDS:
+        d_candle[s_field] = data_feeder.ElapsedList(
+            f_elapsed_time=60., i_count=CANDLE_COUNT, s_type=s_field)
+    return d_candle
+
+
+def feed_bars(d_candle, i_bars, func_bar=None):
+    '''
+    Update the candle with random trades and return it. Call func_bar after
+    each bar
+
+    :param d_candle: dictionary. data of the candle
+    :param i_bars: integer. number of bars to include
+    :param func_bar*: function. called with the number of the bar
+    '''
+    obj_rand = random.Random(0)
+    f_price = 5000.
+    i_id = 0
+    for i_bar in range(i_bars):
+        # a few trades by bar, so the last bar is updated before it closes
+        for f_offset in sorted(obj_rand.sample(range(60), 3)):
+            i_id += 1
+            f_price += obj_rand.choice([-1., -0.5, 0., 0.5, 1.])
+            bucket = data_feeder.TradeBucket(
+                i_bar, 36000. + i_bar * 60. + f_offset, i_id, f_price,
+                obj_rand.randint(1, 10), obj_rand.choice(['+', '-']))
+            d_candle, b_update = data_feeder.update_bucket(d_candle, bucket)
+            d_candle = data_feeder.update_ta(b_update, d_candle)
+        if func_bar:
+            func_bar(i_bar)
+    return d_candle
+
+'''
+End help functions
+'''
+
+
+def test_streaming_ta_matches_talib(monkeypatch):
+    l_checks = []
+    func_check = data_feeder.check_ta
+
+    def _check_ta(s_name, na_stream, na_talib):
+        l_checks.append(func_check(s_name, na_stream, na_talib))
+        return l_checks[-1]
+
+    monkeypatch.setattr(data_feeder, 'check_ta', _check_ta)
+    monkeypatch.setattr(data_feeder, 'TA_STREAMING', True)
+    monkeypatch.setattr(data_feeder, 'TA_CHECK', True)
+    l_drops = []
+
+    def _count_checks(i_bar):
+        if not l_drops and d_candle['LST'].i_bars > CANDLE_COUNT:
+            l_drops.append(len(l_checks))
+
+    d_candle = make_candle()
+    d_candle = feed_bars(d_candle, 3 * CANDLE_COUNT, _count_checks)
+    assert all(l_checks)
+    assert 0 < l_drops[0] < len(l_checks)
+
+
+def test_streaming_ta_delivers_talib_after_drops(monkeypatch):
+    monkeypatch.setattr(data_feeder, 'TA_STREAMING', True)
+    monkeypatch.setattr(data_feeder, 'TA_CHECK', False)
+    l_names = [s_name for s_name in INDICATORS
+               if s_name.split(':')[0] in ('OBV', 'ADX', 'SAR', 'RSI')]
+    l_compared = []
+
+    def _compare(i_bar):
+        if d_candle['LST'].i_bars <= CANDLE_COUNT:
+            return
+        d_arrays = data_feeder.get_arrays(d_candle)
+        for s_name in l_names:
+            na_talib = data_feeder.get_spec(s_name).compute(d_arrays)
+            na_talib = np.asarray(na_talib, dtype='float64')
+            assert np.allclose(d_candle[s_name], na_talib, rtol=1e-6,
+                               atol=1e-6, equal_nan=True), s_name
+        l_compared.append(i_bar)
+
+    d_candle = make_candle()
+    d_candle = feed_bars(d_candle, 3 * CANDLE_COUNT, _compare)
+    assert len(l_compared) > CANDLE_COUNT
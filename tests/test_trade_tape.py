@@ -0,0 +1,162 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that the trade tape of the books gives the same trades as the deque of
+messages it replaced, read one by one or in bulk by trades_since
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+import random
+from collections import deque
+import numpy as np
+from neutrinogym.lob import book
+from neutrinogym.qcore import data_feeder
+from neutrinogym.neutrino import TradeInfo
+
+
+'''
+Begin help functions
+'''
+
+
+class LegacyTradeBuffer(object):
+    '''
+    The TradeBuffer that kept the messages of the trades in a deque and
+    parsed each one when it was accessed
+    '''
+    _status_map = {'Buy Order': '-', 'Sell Order': '+'}
+
+    def __init__(self, maxcount=512):
+        self.maxcount = maxcount
+        self.l = deque([], maxlen=maxcount)
+        self.b_erase_data = False
+        self.last_trade_id = 0
+
+    def unload_buffer(self):
+        if self.b_erase_data:
+            self.l = deque([], maxlen=self.maxcount)
+        self.b_erase_data = False
+
+    def append(self, item):
+        if self.b_erase_data:
+            self.l = deque([], maxlen=self.maxcount)
+        if item and item['order_qty']:
+            item['trade_id'] = self.last_trade_id
+            self.last_trade_id += 1
+            self.l.append(item)
+        self.b_erase_data = False
+
+    def __len__(self):
+        return len(self.l)
+
+    def __getitem__(self, key):
+        self.b_erase_data = True
+        d_msg = self.l[key]
+        s_aux = d_msg['priority_time']
+        f_time = int(''.join(s_aux.replace('.', '').split(':'))[:-3])
+        return TradeInfo(d_msg['order_price'], d_msg['order_qty'], 'ND',
+                         'ND', d_msg['order_date'], f_time,
+                         self._status_map[d_msg['order_side']],
+                         d_msg['trade_id'], d_msg['trade_id'], f_time)
+
+
+def legacy_trade_time(i_time):
+    '''
+    Return the time of a trade in seconds since midnight, parsing it as a
+    string as get_trade_time used to do
+
+    :param i_time: integer. time as HHMMSSssss
+    '''
+    s = '{0:010d}'.format(i_time)
+    s = s[:-4] + '.' + s[-4:]
+    return float(s[:2])*60**2+float(s[2:4])*60 + float(s[4:])
+
+
+def make_trade(obj_rand, f_time):
+    '''
+    Return the message of a trade, as the ones kept by the TradeBuffer
+
+    :param obj_rand: Random object.
+    :param f_time: float. time of the trade, in seconds
+    '''
+    i_secs = int(f_time)
+    s_time = '{:02d}:{:02d}:{:02d}.{:07d}'.format(
+        i_secs // 3600, i_secs // 60 % 60, i_secs % 60,
+        int(round((f_time - i_secs) * 1e7)))
+    return {'order_price': 5000. + obj_rand.randint(-20, 20) * 0.5,
+            'order_qty': obj_rand.choice([0, 1, 5, 10, 25]),
+            'order_side': obj_rand.choice(['Buy Order', 'Sell Order']),
+            'order_date': '2021-02-19',
+            'priority_time': s_time}
+
+'''
+End help functions
+'''
+
+
+def test_tape_matches_legacy_buffer():
+    obj_rand = random.Random(0)
+    tape = book.TradeBuffer(maxcount=16)
+    legacy = LegacyTradeBuffer(maxcount=16)
+    f_time = 36000.
+    i_last_id = -1
+    for _ in range(2000):
+        f_rand = obj_rand.random()
+        if f_rand < 0.7:
+            f_time += obj_rand.choice([0.0001, 0.25, 1.5, 7.])
+            d_msg = make_trade(obj_rand, f_time)
+            tape.append(dict(d_msg))
+            legacy.append(dict(d_msg))
+        elif f_rand < 0.8:
+            tape.unload_buffer()
+            legacy.unload_buffer()
+        elif f_rand < 0.9:
+            # the trades read one by one, as the v3 trades API
+            assert len(tape) == len(legacy)
+            assert [tape[idx] for idx in range(len(tape))] == \
+                [legacy[idx] for idx in range(len(legacy))]
+        else:
+            # the trades read in bulk, as make_updates
+            l_legacy = list(legacy.l)
+            legacy.b_erase_data = True
+            trades = tape.trades_since(i_last_id)
+            l_new = [d_msg for d_msg in l_legacy
+                     if d_msg['trade_id'] > i_last_id]
+            assert trades.trade_id.tolist() == [
+                d_msg['trade_id'] for d_msg in l_new]
+            assert trades.price.tolist() == [
+                d_msg['order_price'] for d_msg in l_new]
+            assert trades.qty.tolist() == [
+                d_msg['order_qty'] for d_msg in l_new]
+            na_time = data_feeder.get_trade_time(trades.time)
+            assert np.allclose(na_time, [legacy_trade_time(int(i_time))
+                                         for i_time in trades.time])
+            if len(trades.trade_id):
+                i_last_id = int(trades.trade_id[-1])
+    assert tape.last_trade_id == legacy.last_trade_id
+
+
+def test_bulk_buckets_match_trade_by_trade():
+    obj_rand = random.Random(1)
+    tape = book.TradeBuffer(maxcount=512)
+    legacy = LegacyTradeBuffer(maxcount=512)
+    f_time = 36000.
+    for _ in range(400):
+        f_time += obj_rand.choice([0.0001, 0.25, 1.5, 7.])
+        d_msg = make_trade(obj_rand, f_time)
+        tape.append(dict(d_msg))
+        legacy.append(dict(d_msg))
+    for i_base in [None, 1, 15, 60]:
+        l_bulk = data_feeder.aggregate_trade_arrays(tape.trades_since(-1),
+                                                    i_base)
+        l_legacy = data_feeder.aggregate_trades(legacy, 0, -1, i_base)
+        assert len(l_bulk) == len(l_legacy)
+        for bucket, bucket2 in zip(l_bulk, l_legacy):
+            for s_attr in data_feeder.TradeBucket.__slots__:
+                if s_attr == 'i_bucket' and not i_base:
+                    continue
+                assert abs(getattr(bucket, s_attr) -
+                           getattr(bucket2, s_attr)) < 1e-6, s_attr
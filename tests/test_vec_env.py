@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Check that each replay held by a VecEnv shows its agent the same books as
+the replay of the same day run alone
+
+@author: ucaiado
+
+Created on 10/18/2026
+"""
+# import libraries
+from benchmarks import run_benchmarks
+from neutrinogym.qcore.vec_env import VecEnv
+from conftest import TEST_DATES, TEST_INSTRUMENTS, get_env_params
+
+
+'''
+Begin help functions
+'''
+
+
+def make_demo_book(agent_params):
+    return run_benchmarks.make_demo_agent('DemoBook', TEST_INSTRUMENTS)
+
+
+def get_books(env):
+    '''
+    Return a tuple with the market time and the best prices of the books of
+    the environment passed
+
+    :param env: Env object.
+    '''
+    l_aux = [round(env.order_matching.f_time, 6)]
+    for s_instr in TEST_INSTRUMENTS:
+        book_obj = env.get_order_book(s_instr)
+        l_aux += [book_obj.best_bid, book_obj.best_ask]
+    return tuple(l_aux)
+
+'''
+End help functions
+'''
+
+
+def test_vec_env_replays_as_single_envs(data_folder, replay):
+    l_env_params = [get_env_params(data_folder, {'init': s_date,
+                                                 'end': s_date})
+                    for s_date in TEST_DATES]
+    vec_env = VecEnv(l_env_params, make_demo_book, b_auto_reset=False)
+    vec_env.reset()
+    l_states = [[] for _ in TEST_DATES]
+    na_done = vec_env.na_done.copy()
+    # the replays of each day have different sizes, so the envs done wait
+    # for the others without being stepped again
+    while not na_done.all():
+        l_active = [i_env for i_env in range(vec_env.num_envs)
+                    if not na_done[i_env]]
+        _, _, na_done, _ = vec_env.step()
+        for i_env in l_active:
+            l_states[i_env].append(get_books(vec_env.l_envs[i_env]))
+    vec_env.close()
+    for s_date, l_state in zip(TEST_DATES, l_states):
+        l_expected = replay({'init': s_date, 'end': s_date})
+        assert l_state == [t for t in l_expected if not isinstance(t, str)]